@@ -0,0 +1,180 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+def normalize_question(question: str) -> str:
+    """问题归一化：合并空白、大小写折叠、去掉结尾标点"""
+    return " ".join(str(question).split()).casefold().rstrip("?？。.!！ ")
+
+
+def make_key(*parts: Any) -> str:
+    """由多个部分拼出稳定的缓存键"""
+    raw = "\x1f".join(str(p) for p in parts)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def context_hash(context: str) -> str:
+    """知识图谱上下文的摘要，作为缓存键的一部分"""
+    return hashlib.sha1(context.encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """带 TTL 的有界内存 LRU 缓存（线程安全）"""
+
+    def __init__(self, max_size: int = 1024, ttl: float = 3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.time() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SQLiteCache:
+    """磁盘缓存层，服务重启后依然有效"""
+
+    def __init__(self, path: str, ttl: float = 86400):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS answer_cache ("
+            "key TEXT PRIMARY KEY, version TEXT, expires_at REAL, value TEXT)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str, version: str) -> Optional[Any]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM answer_cache WHERE key = ? AND version = ?",
+                (key, version),
+            ).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return json.loads(row[0])
+
+    def set(self, key: str, version: str, value: Any):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answer_cache (key, version, expires_at, value) VALUES (?, ?, ?, ?)",
+                (key, version, time.time() + self.ttl, json.dumps(value, ensure_ascii=False)),
+            )
+            self._conn.commit()
+
+    def purge(self, keep_version: str):
+        """删除其他图谱版本及已过期的条目"""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM answer_cache WHERE version != ? OR expires_at < ?",
+                (keep_version, time.time()),
+            )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM answer_cache").fetchone()[0]
+
+
+class AnswerCache:
+    """问答 / 学习路径的分层缓存：内存 LRU + 可选 SQLite，按图谱版本自动失效"""
+
+    def __init__(self, max_size: int = 1024, ttl: float = 3600,
+                 db_path: Optional[str] = None, db_ttl: float = 86400):
+        self.memory = LRUCache(max_size, ttl)
+        self.disk = SQLiteCache(db_path, db_ttl) if db_path else None
+        self.version = ""
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "sets": 0, "invalidations": 0}
+        self._stats_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "AnswerCache":
+        """从环境变量读取配置，ANSWER_CACHE_DB 为空时不启用磁盘层"""
+        return cls(
+            max_size=int(os.getenv("ANSWER_CACHE_SIZE", "1024")),
+            ttl=float(os.getenv("ANSWER_CACHE_TTL", "3600")),
+            db_path=os.getenv("ANSWER_CACHE_DB") or None,
+            db_ttl=float(os.getenv("ANSWER_CACHE_DB_TTL", "86400")),
+        )
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def set_version(self, version: str):
+        """图谱版本变化时清空旧条目"""
+        if version == self.version:
+            return
+        self.version = version
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.purge(version)
+        self._count("invalidations")
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.memory.get(key)
+        if value is not None:
+            self._count("memory_hits")
+            return value
+        if self.disk is not None:
+            value = self.disk.get(key, self.version)
+            if value is not None:
+                self._count("disk_hits")
+                # 回填内存层
+                self.memory.set(key, value)
+                return value
+        self._count("misses")
+        return None
+
+    def set(self, key: str, value: Any):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, self.version, value)
+        self._count("sets")
+
+    def stats(self) -> Dict:
+        """命中率等计数，供运维查看"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        total = hits + stats["misses"]
+        stats.update({
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+            "memory_size": len(self.memory),
+            "disk_size": len(self.disk) if self.disk is not None else None,
+            "graph_version": self.version,
+        })
+        return stats
@@ -0,0 +1,7 @@
+"""性能基准：合成图谱生成、模拟大模型服务与基准测试脚本（在 backend 目录下以模块方式运行）
+
+    python -m benchmarks.generate_graph --edges 100000 --out /tmp/graph-100k.csv
+    python -m benchmarks.mock_llm --port 8765 --latency 0.3 --error-rate 0.05
+    python -m benchmarks.harness --edges 1000 10000 100000 --out results.json
+    python -m benchmarks.harness --compare old.json new.json
+"""
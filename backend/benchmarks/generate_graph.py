@@ -0,0 +1,132 @@
+"""合成知识图谱 CSV：边数从 1k 到 1M 以上，度分布偏斜（少数枢纽节点连接大量边），节点名中英文混合
+
+列与 data/frontend_knowledge.csv 相同（source,relation,target,weight）；同一 seed 生成的文件逐字节相同。
+
+    python -m benchmarks.generate_graph --edges 1000000 --out /tmp/graph-1m.csv
+"""
+import argparse
+import csv
+import os
+import time
+from typing import List
+
+import numpy as np
+
+from learning_path import ASSOCIATIVE_RELATIONS, PREREQUISITE_RELATIONS
+
+ASCII_TERMS = [
+    "HTML", "CSS", "JavaScript", "TypeScript", "React", "Vue", "Angular", "Svelte", "Node.js", "Webpack",
+    "Vite", "Rollup", "Babel", "ESLint", "Jest", "Vitest", "Redux", "Pinia", "Vuex", "Sass", "Less",
+    "Tailwind", "DOM", "BOM", "Canvas", "WebGL", "SVG", "HTTP", "WebSocket", "GraphQL", "REST", "JSON",
+    "Promise", "Fetch", "Service Worker", "PWA", "SSR", "Next.js", "Nuxt", "Electron", "Flexbox", "Grid",
+    "V8", "npm", "pnpm", "Docker", "Git", "Three.js", "D3", "RxJS",
+]
+CJK_TERMS = [
+    "组件", "状态管理", "路由", "渲染", "虚拟DOM", "响应式", "生命周期", "钩子", "指令", "插件", "打包", "构建工具",
+    "模块化", "类型系统", "事件循环", "闭包", "原型链", "作用域", "性能优化", "懒加载", "缓存", "跨域", "安全",
+    "单元测试", "部署", "动画", "布局", "选择器", "盒模型", "浏览器", "兼容性", "国际化", "无障碍", "调试", "编译",
+    "热更新", "微前端", "服务端渲染", "静态生成", "异步编程",
+]
+# 与原始数据相近的关系分布：层级关系为主，夹杂前置 / 关联关系（学习路径规划会用到）
+HIERARCHY_RELATIONS = [
+    "核心特性", "类型", "选择器类型", "优化手段", "语法", "内置工具", "钩子函数", "特性", "核心版本", "技术方案",
+    "开发者工具", "全局属性", "错误处理", "方法", "高级类型", "核心组成", "核心函数", "标准", "构建工具", "安全机制",
+]
+RELATIONS = HIERARCHY_RELATIONS + sorted(PREREQUISITE_RELATIONS) + sorted(ASSOCIATIVE_RELATIONS)
+# 原始数据中权重 1~5 的占比
+WEIGHT_PROBS = np.array([16, 64, 149, 179, 250], dtype=np.float64)
+
+
+def make_names(count: int, rng: np.random.Generator) -> List[str]:
+    """节点名：前面是基础术语（作为枢纽），之后是术语组合加编号，保证唯一"""
+    base = ASCII_TERMS + CJK_TERMS
+    names = base[:count]
+    if count <= len(base):
+        return names
+    extra = count - len(base)
+    kinds = rng.integers(0, 4, extra)
+    a = rng.integers(0, len(ASCII_TERMS), (extra, 2))
+    c = rng.integers(0, len(CJK_TERMS), (extra, 2))
+    for i, (kind, (a1, a2), (c1, c2)) in enumerate(zip(kinds.tolist(), a.tolist(), c.tolist())):
+        n = i + 1
+        if kind == 0:
+            names.append(f"{ASCII_TERMS[a1]} {CJK_TERMS[c1]}{n}")
+        elif kind == 1:
+            names.append(f"{CJK_TERMS[c1]}与{CJK_TERMS[c2]}{n}")
+        elif kind == 2:
+            names.append(f"{ASCII_TERMS[a1].lower()}-{ASCII_TERMS[a2].lower().replace(' ', '-')}-{n}")
+        else:
+            names.append(f"{CJK_TERMS[c1]}({ASCII_TERMS[a2]}) v{n}")
+    return names
+
+
+def generate_edges(num_edges: int, seed: int = 0, skew: float = 1.0, avg_degree: float = 5.0):
+    """返回 (节点名, 源编号, 目标编号, 关系编号, 权重)，边无重复、无自环
+
+    源节点被选中的概率按排名服从幂律（第 k 名 ∝ 1 / k^skew），目标节点的指数减半，因此度分布是长尾的。
+    """
+    rng = np.random.default_rng(seed)
+    num_nodes = max(int(num_edges / avg_degree), 10)
+    ranks = np.arange(1, num_nodes + 1, dtype=np.float64)
+    out_popularity = 1.0 / ranks ** skew
+    out_popularity /= out_popularity.sum()
+    # 目标端的偏斜弱一些：被依赖的基础知识点多，但不像出度那样集中
+    in_popularity = 1.0 / ranks ** (skew / 2)
+    in_popularity /= in_popularity.sum()
+    # 完全图的边数也不够时无法去重到目标数
+    num_edges = min(num_edges, num_nodes * (num_nodes - 1))
+
+    keys = np.empty(0, dtype=np.int64)
+    while len(keys) < num_edges:
+        sample = int((num_edges - len(keys)) * 1.3) + 16
+        src = rng.choice(num_nodes, sample, p=out_popularity)
+        dst = rng.choice(num_nodes, sample, p=in_popularity)
+        candidate = np.concatenate([keys, (src * num_nodes + dst)[src != dst]])
+        _, first = np.unique(candidate, return_index=True)
+        # 去重时保持抽样顺序，截断后仍是随机子集
+        keys = candidate[np.sort(first)][:num_edges]
+
+    src, dst = np.divmod(keys, num_nodes)
+    relation_probs = 1.0 / np.arange(1, len(RELATIONS) + 1)
+    relations = rng.choice(len(RELATIONS), len(keys), p=relation_probs / relation_probs.sum())
+    weights = rng.choice(np.arange(1, 6), len(keys), p=WEIGHT_PROBS / WEIGHT_PROBS.sum())
+    return make_names(num_nodes, rng), src, dst, relations, weights
+
+
+def write_csv(path: str, num_edges: int, seed: int = 0, skew: float = 1.0) -> dict:
+    """生成并写出 CSV（先写临时文件再替换），返回规模信息"""
+    start = time.perf_counter()
+    names, src, dst, relations, weights = generate_edges(num_edges, seed=seed, skew=skew)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["source", "relation", "target", "weight"])
+        writer.writerows(
+            (names[u], RELATIONS[r], names[v], w)
+            for u, v, r, w in zip(src.tolist(), dst.tolist(), relations.tolist(), weights.tolist())
+        )
+    os.replace(tmp, path)
+    used = np.unique(np.concatenate([src, dst]))
+    return {
+        "path": path,
+        "edges": int(len(src)),
+        "nodes": int(len(used)),
+        "max_degree": int(np.bincount(np.concatenate([src, dst])).max()) if len(src) else 0,
+        "bytes": os.path.getsize(path),
+        "seed": seed,
+        "skew": skew,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="生成合成知识图谱 CSV")
+    parser.add_argument("--edges", type=int, default=100_000, help="边数")
+    parser.add_argument("--out", required=True, help="输出 CSV 路径")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skew", type=float, default=1.0, help="度分布偏斜程度（幂律指数，越大枢纽越集中）")
+    args = parser.parse_args()
+    info = write_csv(args.out, args.edges, seed=args.seed, skew=args.skew)
+    print(f"已生成 {info['path']}：{info['nodes']} 个节点，{info['edges']} 条边，"
+          f"最大度 {info['max_degree']}，耗时 {info['seconds']} s")
@@ -0,0 +1,620 @@
+"""基准测试：图谱加载耗时与内存、FrontendKnowledgeGraph 各方法的延迟、各接口在并发下的吞吐与延迟
+
+    python -m benchmarks.harness --edges 1000 10000 100000 --out bench-$(git rev-parse --short HEAD).json
+    python -m benchmarks.harness --compare bench-old.json bench-new.json
+
+每个规模依次：
+1. 生成（或复用 benchmarks/.data 下已生成的）合成图谱 CSV；
+2. 在新进程中加载图谱：无快照（解析 CSV）、有快照、开启 tracemalloc 各一次，记录耗时、RSS 与 Python 分配峰值，
+   以及后台计算（介数中心性、推荐预计算）完成的时间；
+3. 在本进程加载图谱，逐个调用公开方法，记录延迟分布（大模型相关方法走模拟服务）；
+4. 启动 uvicorn（--workers 大于 1 时使用 run.py 共享内存多进程部署），按 /openapi.json 中的全部路由并发压测。
+
+结果写成一个 JSON 文件（带提交号与运行参数），用 --compare 对比两次结果。
+压测客户端与服务端在同一台机器上，数值只适合同一环境下不同提交之间的对比。
+"""
+import argparse
+import asyncio
+import gc
+import json
+import multiprocessing
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+import httpx
+import numpy as np
+
+from benchmarks import generate_graph, mock_llm
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BACKEND_DIR, "benchmarks", ".data")
+# 被测服务的写接口令牌（未配置令牌时写接口关闭）
+ADMIN_TOKEN = "benchmark"
+
+QUESTION_TEMPLATES = ["{}是什么？", "{}有哪些核心特性？", "如何学习{}？", "{}和相关技术有什么区别？", "请介绍一下{}的用法"]
+
+# 不做压测的接口：采样分析会阻塞指定的秒数，且默认未开启
+SKIPPED_ROUTES = {"GET /api/debug/profile": "采样分析接口（按指定时长阻塞）"}
+# 不做基准的方法：生命周期与多进程部署相关，不在请求路径上
+SKIPPED_METHODS = {
+    "load_data": "见 load 部分",
+    "start_delta_watcher": "后台线程",
+    "stop_delta_watcher": "后台线程",
+    "publish_shared": "多进程部署",
+    "attach_shared": "多进程部署",
+}
+
+
+# ---------- 统计 ----------
+
+def summarize(latencies: List[float], wall: Optional[float] = None) -> Dict:
+    """延迟分布（毫秒）；给出 wall 时按总耗时计算吞吐，否则按串行调用计算"""
+    if not latencies:
+        return {"count": 0}
+    values = np.asarray(latencies) * 1000
+    total = wall if wall is not None else float(np.sum(latencies))
+    return {
+        "count": len(latencies),
+        "mean_ms": round(float(values.mean()), 4),
+        "p50_ms": round(float(np.percentile(values, 50)), 4),
+        "p90_ms": round(float(np.percentile(values, 90)), 4),
+        "p99_ms": round(float(np.percentile(values, 99)), 4),
+        "max_ms": round(float(values.max()), 4),
+        "throughput_per_s": round(len(latencies) / total, 2) if total > 0 else None,
+    }
+
+
+def _rss_mb() -> Optional[float]:
+    """当前进程的常驻内存（仅 Linux）"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 上单位为 KB，macOS 为字节
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+def _git_commit() -> Dict:
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], cwd=BACKEND_DIR, capture_output=True, text=True,
+                                  timeout=30).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return ""
+    return {"commit": git("rev-parse", "HEAD"), "subject": git("log", "-1", "--format=%s"),
+            "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_background(kg, timeout: float) -> float:
+    """等待后台计算（介数中心性、推荐预计算、布局）完成，返回等待时间"""
+    start = time.perf_counter()
+    for thread in (kg.rankings._betweenness_thread, kg.recommender._thread, kg.layout._thread):
+        if thread is not None:
+            thread.join(max(timeout - (time.perf_counter() - start), 0))
+    return time.perf_counter() - start
+
+
+# ---------- 1. 加载 ----------
+
+def _load_once(path: str, use_snapshot: bool, trace: bool, background_timeout: float, queue):
+    """在独立进程中加载一次图谱，内存数据不受之前的规模影响"""
+    from graph_loader import snapshot_path
+    from knowledge_graph import FrontendKnowledgeGraph
+
+    if not use_snapshot and os.path.exists(snapshot_path(path)):
+        os.remove(snapshot_path(path))
+    gc.collect()
+    rss_before = _rss_mb()
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    kg = FrontendKnowledgeGraph(path, shared_dir="")
+    result = {"init_s": round(time.perf_counter() - start, 4)}
+    if trace:
+        result["tracemalloc_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+        tracemalloc.stop()
+    else:
+        result["background_s"] = round(_wait_background(kg, background_timeout), 4)
+    rss_after = _rss_mb()
+    if rss_before is not None and rss_after is not None:
+        result["rss_mb"] = round(rss_after, 2)
+        result["rss_delta_mb"] = round(rss_after - rss_before, 2)
+    peak = _peak_rss_mb()
+    if peak is not None:
+        result["peak_rss_mb"] = round(peak, 2)
+    result["nodes"], result["edges"] = kg.store.num_nodes, kg.store.num_edges
+    queue.put(result)
+
+
+def measure_load(path: str, trace: bool, background_timeout: float) -> Dict:
+    """cold：解析 CSV（并写出快照）；warm：读取快照；traced：开启 tracemalloc 统计 Python 分配峰值"""
+    ctx = multiprocessing.get_context("spawn")
+    results = {}
+    runs = [("cold", False, False), ("warm", True, False)] + ([("traced", True, True)] if trace else [])
+    for name, use_snapshot, traced in runs:
+        queue = ctx.Queue()
+        process = ctx.Process(target=_load_once, args=(path, use_snapshot, traced, background_timeout, queue))
+        process.start()
+        try:
+            results[name] = queue.get(timeout=background_timeout + 600)
+        finally:
+            process.join()
+        print(f"  加载（{name}）：{results[name]}")
+    return results
+
+
+# ---------- 2. 方法 ----------
+
+class MethodBench:
+    """一个方法的基准：call(i) 调用第 i 次，最多 iterations 次或 max_seconds 秒（至少一次）"""
+
+    def __init__(self, name: str, call: Callable[[int], object], iterations: int):
+        self.name = name
+        self.call = call
+        self.iterations = iterations
+
+    def run(self, max_seconds: float) -> Dict:
+        latencies = []
+        deadline = time.perf_counter() + max_seconds
+        for i in range(self.iterations):
+            start = time.perf_counter()
+            self.call(i)
+            latencies.append(time.perf_counter() - start)
+            if time.perf_counter() > deadline:
+                break
+        return summarize(latencies)
+
+
+def method_benches(kg, entities: List[str], questions: List[str], loop, args) -> List[MethodBench]:
+    n, llm_n, heavy_n = args.samples, args.llm_samples, args.heavy_samples
+    pick = lambda i: entities[i % len(entities)]
+    question = lambda i: questions[i % len(questions)]
+    # 大模型相关的方法每次使用不同的问题，避免命中问答缓存；另测一组命中缓存的情形
+    fresh = lambda prefix: (lambda i: f"{question(i)}（{prefix}{i}）")
+
+    async def consume(i):
+        async for _ in kg.stream_answer(fresh("stream")(i)):
+            pass
+
+    answer = fresh("sync")
+    sample_text = "\n".join(f"- **{e}**：`code` 说明" for e in entities[:20])
+    benches = [
+        MethodBench("extract_entities", lambda i: kg.extract_entities(question(i)), n),
+        MethodBench("build_context[quick]", lambda i: kg.build_context(question(i)), n),
+        MethodBench("build_context[deep]", lambda i: kg.build_context(question(i), mode="deep"), n),
+        *[MethodBench(f"get_top_graph_data[{rank}]", lambda i, rank=rank: kg.get_top_graph_data(limit=60, rank_by=rank), n)
+          for rank in ("degree", "weighted_degree", "pagerank", "betweenness")],
+        MethodBench("get_neighborhood[depth=1]", lambda i: kg.get_neighborhood(pick(i)), n),
+        MethodBench("get_neighborhood[depth=2,max_nodes=200]",
+                    lambda i: kg.get_neighborhood(pick(i), depth=2, max_nodes=200), n),
+        MethodBench("get_cluster_view[top]", lambda i: kg.get_cluster_view(), n),
+        MethodBench("get_cluster_view[expand]", lambda i: kg.get_cluster_view(parent=f"c1:{i % 8}"), n),
+        MethodBench("search_entities", lambda i: kg.search_entities(pick(i)[:3]), n),
+        MethodBench("fuzzy_search", lambda i: kg.fuzzy_search(pick(i)[:3]), n),
+        MethodBench("query_relation", lambda i: kg.query_relation(pick(i)), n),
+        MethodBench("get_simple_recommendations", lambda i: kg.get_simple_recommendations(pick(i)), n),
+        MethodBench("get_batch_recommendations",
+                    lambda i: kg.get_batch_recommendations([pick(i + k) for k in range(5)]), n),
+        MethodBench("get_learning_path", lambda i: kg.get_learning_path(pick(i)), n),
+        MethodBench("render_markdown", lambda i: kg.render_markdown(sample_text), n),
+        MethodBench("collect_metrics", lambda i: kg.collect_metrics(), n),
+        MethodBench("compute_graph_version", lambda i: kg.compute_graph_version(), heavy_n),
+        MethodBench("get_graph_data", lambda i: kg.get_graph_data(), heavy_n),
+        # 每个版本只编码一次，之后直接返回
+        MethodBench("get_graph_payload", lambda i: kg.get_graph_payload(), heavy_n),
+        MethodBench("answer_question", lambda i: kg.answer_question(answer(i)), llm_n),
+        MethodBench("answer_question[cached]", lambda i: kg.answer_question(answer(i % 5)), llm_n),
+        MethodBench("answer_question_async",
+                    lambda i: loop.run_until_complete(kg.answer_question_async(fresh("async")(i))), llm_n),
+        MethodBench("stream_answer", lambda i: loop.run_until_complete(consume(i)), llm_n),
+        MethodBench("enrich_learning_path", lambda i: kg.enrich_learning_path(pick(i)), llm_n),
+        MethodBench("enrich_learning_path_async",
+                    lambda i: loop.run_until_complete(kg.enrich_learning_path_async(pick(i + llm_n))), llm_n),
+        MethodBench("rebuild_indexes", lambda i: kg.rebuild_indexes(), heavy_n),
+    ]
+
+    # 写入放在最后：每次新增一批边，生成新版本
+    from graph_updates import parse_change
+
+    def changes(i):
+        rng = random.Random(i)
+        batch = [parse_change({"op": "add", "source": rng.choice(entities), "target": f"基准节点{i}_{k}",
+                               "relation": "基准测试", "weight": 3}) for k in range(10)]
+        kg.apply_changes(batch)
+
+    benches.append(MethodBench("apply_changes[10 edges]", changes, heavy_n))
+    return benches
+
+
+def measure_methods(path: str, entities: List[str], args) -> Dict:
+    from knowledge_graph import FrontendKnowledgeGraph
+
+    kg = FrontendKnowledgeGraph(path, shared_dir="")
+    _wait_background(kg, args.background_timeout)
+    questions = _questions(entities)
+    loop = asyncio.new_event_loop()
+    results = {}
+    try:
+        for bench in method_benches(kg, entities, questions, loop, args):
+            # 逐个方法执行，失败时记录错误继续
+            try:
+                summary = bench.run(args.method_seconds)
+            except Exception as e:
+                summary = {"error": f"{type(e).__name__}: {e}"}
+            results[bench.name] = summary
+            print(f"  {bench.name}：{summary}")
+    finally:
+        loop.run_until_complete(kg.llm.aclose())
+        loop.close()
+
+    public = {name for name in dir(FrontendKnowledgeGraph)
+              if not name.startswith("_") and callable(getattr(FrontendKnowledgeGraph, name))}
+    covered = {name.split("[")[0] for name in results}
+    missing = sorted(public - covered - set(SKIPPED_METHODS) - {"edge_to_dict", "node_to_dict"})
+    return {"results": results, "skipped": SKIPPED_METHODS, "not_covered": missing}
+
+
+# ---------- 3. 接口 ----------
+
+class RouteBench:
+    """一个接口的压测：request(i) 返回 (method, url, 关键字参数)；前 warmup 个请求先串行发出，不计入结果"""
+
+    def __init__(self, key: str, request: Callable[[int], tuple], requests: int, stream: bool = False,
+                 warmup: int = 0):
+        self.key = key
+        self.request = request
+        self.requests = requests
+        self.stream = stream
+        self.warmup = warmup
+
+
+def route_benches(entities: List[str], questions: List[str], etag: str, args) -> List[RouteBench]:
+    n, llm_n, write_n = args.requests, args.llm_requests, args.write_requests
+    pick = lambda i: entities[i % len(entities)]
+    question = lambda i: questions[i % len(questions)]
+    return [
+        RouteBench("GET /api/graph/version", lambda i: ("GET", "/api/graph/version", {}), n),
+        RouteBench("GET /api/graph-data", lambda i: ("GET", "/api/graph-data", {"params": {"limit": 60}}), n),
+        RouteBench("GET /api/graph-data (304)", lambda i: ("GET", "/api/graph-data", {
+            "params": {"limit": 60}, "headers": {"If-None-Match": etag}}), n),
+        RouteBench("GET /api/graph-data/full", lambda i: ("GET", "/api/graph-data/full", {
+            "headers": {"Accept-Encoding": "gzip"}}), max(n // 10, 5)),
+        RouteBench("GET /api/graph-data/full (ndjson)", lambda i: ("GET", "/api/graph-data/full", {
+            "params": {"format": "ndjson", "fields": "id,weight"}}), max(n // 10, 5), stream=True),
+        RouteBench("GET /api/graph-data/full (page)", lambda i: ("GET", "/api/graph-data/full", {
+            "params": {"limit": 1000, "min_weight": 3}}), n),
+        RouteBench("GET /api/graph-data/clusters", lambda i: ("GET", "/api/graph-data/clusters", {}), n),
+        RouteBench("GET /api/graph-data/clusters (expand)", lambda i: (
+            "GET", "/api/graph-data/clusters", {"params": {"parent": f"c1:{i % 8}"}}), n),
+        RouteBench("GET /api/entities", lambda i: ("GET", "/api/entities", {}), max(n // 10, 5)),
+        RouteBench("GET /api/entities (page)", lambda i: ("GET", "/api/entities", {"params": {"limit": 500}}), n),
+        RouteBench("GET /api/graph-data/entity/{entity}", lambda i: ("GET", f"/api/graph-data/entity/{pick(i)}", {}), n),
+        RouteBench("GET /api/graph-data/entity/{entity} (depth=2)", lambda i: (
+            "GET", f"/api/graph-data/entity/{pick(i)}", {"params": {"depth": 2, "max_nodes": 200}}), n),
+        RouteBench("GET /api/graph-data/entity/fuzzy/{keyword}", lambda i: (
+            "GET", f"/api/graph-data/entity/fuzzy/{pick(i)[:3]}", {}), n),
+        RouteBench("GET /api/entities/autocomplete", lambda i: (
+            "GET", "/api/entities/autocomplete", {"params": {"q": pick(i)[:2]}}), n),
+        RouteBench("GET /api/recommendations/{entity}", lambda i: ("GET", f"/api/recommendations/{pick(i)}", {}), n),
+        RouteBench("POST /api/recommendations/batch", lambda i: (
+            "POST", "/api/recommendations/batch", {"json": {"entities": [pick(i + k) for k in range(5)]}}), n),
+        RouteBench("GET /api/learning-path/{entity}", lambda i: ("GET", f"/api/learning-path/{pick(i)}", {}), n),
+        RouteBench("GET /metrics", lambda i: ("GET", "/metrics", {}), n),
+        RouteBench("GET /api/cache/stats", lambda i: ("GET", "/api/cache/stats", {}), n),
+        RouteBench("GET /api/llm/stats", lambda i: ("GET", "/api/llm/stats", {}), n),
+        RouteBench("POST /api/qa", lambda i: ("POST", "/api/qa", {"json": {"question": f"{question(i)}（http{i}）"}}), llm_n),
+        RouteBench("POST /api/qa (cached)", lambda i: ("POST", "/api/qa", {"json": {"question": question(i % 5)}}),
+                   llm_n, warmup=5),
+        RouteBench("POST /api/qa/stream", lambda i: (
+            "POST", "/api/qa/stream", {"json": {"question": f"{question(i)}（sse{i}）"}}), llm_n, stream=True),
+        # 写入放在最后
+        RouteBench("POST /api/graph/changes", lambda i: ("POST", "/api/graph/changes", {"json": {"changes": [
+            {"op": "add", "source": pick(i), "target": f"压测节点{i}", "relation": "基准测试", "weight": 3}]},
+            "headers": {"X-Admin-Token": ADMIN_TOKEN}}), write_n),
+    ]
+
+
+async def _run_route(client: httpx.AsyncClient, bench: RouteBench, concurrency: int) -> Dict:
+    latencies, ttfb, statuses, errors = [], [], {}, []
+    received = 0
+    for i in range(bench.warmup):
+        method, url, kwargs = bench.request(i)
+        await client.request(method, url, **kwargs)
+    counter = iter(range(bench.requests))
+
+    async def worker():
+        nonlocal received
+        for i in counter:
+            method, url, kwargs = bench.request(i)
+            start = time.perf_counter()
+            try:
+                async with client.stream(method, url, **kwargs) as response:
+                    first = None
+                    async for chunk in response.aiter_raw():
+                        if first is None:
+                            first = time.perf_counter() - start
+                        received += len(chunk)
+                    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                latencies.append(time.perf_counter() - start)
+                if bench.stream and first is not None:
+                    ttfb.append(first)
+            except httpx.HTTPError as e:
+                errors.append(type(e).__name__)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, bench.requests))))
+    wall = time.perf_counter() - start
+    summary = summarize(latencies, wall)
+    summary.update({"concurrency": concurrency, "status": {str(k): v for k, v in sorted(statuses.items())},
+                    "errors": len(errors), "bytes": received})
+    if ttfb:
+        summary["ttfb"] = summarize(ttfb)
+    return summary
+
+
+async def _load_test(base_url: str, entities: List[str], args) -> Dict:
+    concurrency = args.concurrency
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=300) as client:
+        routes = set()
+        spec = (await client.get("/openapi.json")).json()
+        for path, operations in spec["paths"].items():
+            routes.update(f"{method.upper()} {path}" for method in operations)
+        etag = (await client.get("/api/graph-data", params={"limit": 60})).headers.get("etag", "")
+        benches = route_benches(entities, _questions(entities), etag, args)
+        results = {}
+        for bench in benches:
+            results[bench.key] = await _run_route(client, bench, concurrency)
+            print(f"  {bench.key}：{results[bench.key]}")
+    covered = {bench.key.split(" (")[0] for bench in benches}
+    return {"results": results, "skipped": SKIPPED_ROUTES,
+            "not_covered": sorted(routes - covered - set(SKIPPED_ROUTES))}
+
+
+def _start_server(path: str, port: int, llm_url: str, workers: int, work_dir: str) -> subprocess.Popen:
+    env = dict(os.environ, GRAPH_DATA_FILE=path, DEEPSEEK_API_URL=llm_url,
+               GRAPH_DELTA_FILE=os.path.join(work_dir, "delta.csv"),
+               GRAPH_SHARED_DIR="", ANSWER_CACHE_DB="", PROFILER_ENABLED="0",
+               GRAPH_ADMIN_TOKEN=ADMIN_TOKEN)
+    if workers > 1:
+        cmd = [sys.executable, "run.py", "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers),
+               "--data", path, "--shared-dir", os.path.join(work_dir, "shared")]
+    else:
+        cmd = [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+               "--log-level", "warning"]
+    return subprocess.Popen(cmd, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL)
+
+
+def _wait_ready(base_url: str, process: subprocess.Popen, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"服务进程提前退出（{process.returncode}）")
+        try:
+            if httpx.get(f"{base_url}/api/graph/version", timeout=5).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("等待服务启动超时")
+
+
+def measure_http(path: str, llm_url: str, settle: float, entities: List[str], args) -> Dict:
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    with tempfile.TemporaryDirectory(prefix="kg-bench-") as work_dir:
+        process = _start_server(path, port, llm_url, args.workers, work_dir)
+        try:
+            start = time.perf_counter()
+            _wait_ready(base_url, process, args.background_timeout + 600)
+            ready = time.perf_counter() - start
+            # 等后台计算结束（时长取自加载测试），压测的是稳定状态
+            time.sleep(settle)
+            result = asyncio.run(_load_test(base_url, entities, args))
+            result["startup_s"] = round(ready, 3)
+            result["workers"] = args.workers
+            return result
+        finally:
+            process.terminate()
+            try:
+                process.wait(30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+# ---------- 汇总 ----------
+
+def _graph_csv(edges: int, args) -> Dict:
+    path = os.path.join(args.data_dir, f"graph-{edges}-s{args.seed}-k{args.skew:g}.csv")
+    if os.path.exists(path):
+        print(f"复用已生成的图谱 {path}")
+        return {"path": path, "edges": edges, "bytes": os.path.getsize(path), "seed": args.seed,
+                "skew": args.skew, "reused": True}
+    info = generate_graph.write_csv(path, edges, seed=args.seed, skew=args.skew)
+    print(f"已生成 {path}：{info['nodes']} 个节点，{info['edges']} 条边，耗时 {info['seconds']} s")
+    return info
+
+
+def _start_mock(args) -> tuple:
+    port = _free_port()
+    cmd = [sys.executable, "-m", "benchmarks.mock_llm", "--port", str(port),
+           "--latency", str(args.latency), "--jitter", str(args.jitter), "--token-delay", str(args.token_delay),
+           "--tokens", str(args.tokens), "--error-rate", str(args.error_rate),
+           "--error-status", str(args.error_status), "--timeout-rate", str(args.timeout_rate),
+           "--hang", str(args.hang), "--abort-rate", str(args.abort_rate), "--llm-seed", str(args.llm_seed),
+           "--log-level", "critical"]
+    process = subprocess.Popen(cmd, cwd=BACKEND_DIR)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            httpx.get(f"{base_url}/stats", timeout=2)
+            break
+        except httpx.HTTPError:
+            if time.monotonic() > deadline or process.poll() is not None:
+                process.kill()
+                raise RuntimeError("模拟大模型服务启动失败")
+            time.sleep(0.1)
+    return process, base_url
+
+
+def run(args) -> Dict:
+    os.makedirs(args.data_dir, exist_ok=True)
+    mock_process, mock_url = _start_mock(args)
+    llm_url = f"{mock_url}/v1/chat/completions"
+    # 加载测试与方法测试在本进程（及其子进程）内创建图谱，同样使用模拟服务、不启用磁盘缓存与增量文件
+    os.environ.update(DEEPSEEK_API_URL=llm_url, DEEPSEEK_API_KEY=os.getenv("DEEPSEEK_API_KEY") or "bench",
+                      GRAPH_SHARED_DIR="", ANSWER_CACHE_DB="", GRAPH_DELTA_FILE="")
+    report = {
+        "meta": {
+            **_git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "numpy": np.__version__,
+            "args": {k: v for k, v in vars(args).items() if k not in ("compare", "out")},
+        },
+        "mock_llm": mock_llm.config_from_args(args).as_dict(),
+        "runs": [],
+    }
+    try:
+        for edges in args.edges:
+            print(f"== {edges} 条边 ==")
+            graph = _graph_csv(edges, args)
+            entry = {"edges": edges, "graph": graph}
+            entry["load"] = measure_load(graph["path"], not args.no_tracemalloc, args.background_timeout)
+            entities = _sample_entities(graph["path"], max(args.samples, 50), args.seed)
+            httpx.post(f"{mock_url}/stats/reset")
+            if not args.skip_methods:
+                entry["methods"] = measure_methods(graph["path"], entities, args)
+                entry["methods"]["mock_llm"] = httpx.get(f"{mock_url}/stats").json()
+                httpx.post(f"{mock_url}/stats/reset")
+                gc.collect()
+            if not args.skip_http:
+                settle = entry["load"]["warm"].get("background_s", 0.0)
+                entry["http"] = measure_http(graph["path"], llm_url, settle, entities, args)
+                entry["http"]["mock_llm"] = httpx.get(f"{mock_url}/stats").json()
+            report["runs"].append(entry)
+    finally:
+        mock_process.terminate()
+        mock_process.wait(30)
+    return report
+
+
+def _sample_entities(path: str, count: int, seed: int) -> List[str]:
+    """方法基准与接口压测共用的实体：读取快照中的节点表后随机抽取（同一 seed 结果相同）"""
+    from graph_loader import load_edge_arrays
+    nodes = load_edge_arrays(path).nodes
+    return [nodes[i] for i in random.Random(seed).sample(range(len(nodes)), min(len(nodes), count))]
+
+
+def _questions(entities: List[str]) -> List[str]:
+    return [QUESTION_TEMPLATES[i % len(QUESTION_TEMPLATES)].format(e) for i, e in enumerate(entities)]
+
+
+# ---------- 对比 ----------
+
+def _flatten(run: Dict) -> Dict[str, float]:
+    """取出可比较的数值：加载耗时与内存、各方法 / 接口的 p50、p99 与吞吐"""
+    values = {}
+    for phase, result in run.get("load", {}).items():
+        for key in ("init_s", "background_s", "rss_delta_mb", "peak_rss_mb", "tracemalloc_peak_mb"):
+            if key in result:
+                values[f"load.{phase}.{key}"] = result[key]
+    for section in ("methods", "http"):
+        for name, summary in run.get(section, {}).get("results", {}).items():
+            for key in ("p50_ms", "p99_ms", "throughput_per_s"):
+                if summary.get(key) is not None:
+                    values[f"{section}.{name}.{key}"] = summary[key]
+    return values
+
+
+def compare(base_path: str, new_path: str, threshold: float) -> int:
+    """逐项打印两次结果的变化，返回超过阈值的退化项数（吞吐下降、其余指标上升视为退化）"""
+    with open(base_path, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)
+    print(f"基准：{base['meta'].get('commit', '')[:10]} {base['meta'].get('subject', '')}")
+    print(f"对比：{new['meta'].get('commit', '')[:10]} {new['meta'].get('subject', '')}")
+    base_runs = {run["edges"]: run for run in base["runs"]}
+    regressions = 0
+    for run in new["runs"]:
+        old = base_runs.get(run["edges"])
+        if old is None:
+            continue
+        print(f"\n== {run['edges']} 条边 ==")
+        print(f"{'指标':<72}{'基准':>12}{'对比':>12}{'变化':>10}")
+        before, after = _flatten(old), _flatten(run)
+        for key in sorted(before.keys() & after.keys()):
+            a, b = before[key], after[key]
+            change = (b - a) / a if a else 0.0
+            worse = -change if key.endswith("throughput_per_s") else change
+            mark = " !" if worse > threshold else ""
+            regressions += bool(mark)
+            print(f"{key:<72}{a:>12.3f}{b:>12.3f}{change:>+10.1%}{mark}")
+    print(f"\n超过 {threshold:.0%} 的退化：{regressions} 项")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="知识图谱后端基准测试")
+    parser.add_argument("--edges", type=int, nargs="+", default=[1000, 10_000, 100_000], help="合成图谱的边数（可多个）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skew", type=float, default=1.0, help="度分布偏斜程度")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="合成图谱的存放目录（已存在则复用）")
+    parser.add_argument("--out", default=None, help="结果 JSON 路径（默认 bench-<提交号>.json）")
+    parser.add_argument("--samples", type=int, default=200, help="每个图谱方法的调用次数")
+    parser.add_argument("--heavy-samples", type=int, default=5, help="全图级方法（全量导出、重建索引、写入）的调用次数")
+    parser.add_argument("--llm-samples", type=int, default=10, help="大模型相关方法的调用次数")
+    parser.add_argument("--method-seconds", type=float, default=20, help="单个方法的时间上限（秒）")
+    parser.add_argument("--requests", type=int, default=500, help="每个只读接口的请求数")
+    parser.add_argument("--llm-requests", type=int, default=50, help="问答接口的请求数")
+    parser.add_argument("--write-requests", type=int, default=20, help="图谱写入接口的请求数")
+    parser.add_argument("--concurrency", type=int, default=16, help="并发连接数")
+    parser.add_argument("--workers", type=int, default=1, help="服务进程数（大于 1 时使用 run.py 共享图谱部署）")
+    parser.add_argument("--background-timeout", type=float, default=600, help="等待后台计算完成的上限（秒）")
+    parser.add_argument("--no-tracemalloc", action="store_true", help="跳过 tracemalloc 加载测试（大图谱时较慢）")
+    parser.add_argument("--skip-methods", action="store_true", help="跳过方法基准")
+    parser.add_argument("--skip-http", action="store_true", help="跳过接口压测")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="对比两个结果文件，不运行基准")
+    parser.add_argument("--threshold", type=float, default=0.1, help="对比时视为退化的变化比例")
+    mock_llm.add_arguments(parser)
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.threshold) else 0)
+
+    report = run(args)
+    out = args.out or f"bench-{(report['meta']['commit'] or 'unknown')[:10]}.json"
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已写入 {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""本地的 OpenAI 兼容模拟服务（代替 DeepSeek），延迟、流式速度与错误率均可配置
+
+    python -m benchmarks.mock_llm --port 8765 --latency 0.5 --jitter 0.2 --token-delay 0.02 --error-rate 0.05
+
+后端设置 DEEPSEEK_API_URL=http://127.0.0.1:8765/v1/chat/completions 即可使用。
+GET /stats 返回收到的请求数与注入的错误数，POST /stats/reset 清零。
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+from typing import Dict
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+class MockLLMConfig:
+    """latency 为首 token（非流式时为整个响应）前的等待，实际等待在 [latency, latency + jitter] 内均匀分布"""
+
+    def __init__(self, latency: float = 0.2, jitter: float = 0.0, token_delay: float = 0.01,
+                 tokens: int = 60, error_rate: float = 0.0, error_status: int = 500,
+                 timeout_rate: float = 0.0, hang: float = 120.0, abort_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.token_delay = token_delay
+        self.tokens = tokens
+        self.error_rate = error_rate
+        self.error_status = error_status
+        # 一部分请求长时间不响应，触发调用方超时
+        self.timeout_rate = timeout_rate
+        self.hang = hang
+        # 流式响应中途断开的比例
+        self.abort_rate = abort_rate
+        self.seed = seed
+
+    def as_dict(self) -> Dict:
+        return dict(vars(self))
+
+
+_WORDS = ["组件", "响应式", "渲染", "状态", "路由", "Hooks", "虚拟 DOM", "打包", "缓存", "异步", "模块", "类型"]
+
+
+def _answer_chunks(question: str, count: int, rng: random.Random):
+    """与真实回答形态相近的 Markdown：标题、列表与代码块，按 token 切成 count 段"""
+    topic = question.strip().splitlines()[-1][:20] if question.strip() else "前端"
+    chunks = [f"### 关于{topic}\n\n"]
+    for i in range(max(count - 4, 1)):
+        word = _WORDS[rng.randrange(len(_WORDS))]
+        chunks.append(f"- **{word}**：第 {i + 1} 点说明。\n" if i % 3 == 0 else f"{word}相关的细节，")
+    chunks.extend(["\n\n```js\n", "const x = 1;\n", "```\n"])
+    return chunks
+
+
+def _learning_path(prompt: str) -> str:
+    match = re.search(r"「(.+?)」", prompt)
+    entity = match.group(1) if match else "前端"
+    return json.dumps({
+        "prerequisites": [{"name": "HTML", "desc": f"学习 {entity} 之前需要掌握页面结构"}],
+        "core": {"name": entity, "desc": f"{entity} 的核心概念与常用 API"},
+        "next_steps": [{"name": "性能优化", "desc": f"掌握 {entity} 后进一步学习"}],
+    }, ensure_ascii=False)
+
+
+def create_app(config: MockLLMConfig) -> FastAPI:
+    app = FastAPI(title="模拟大模型服务")
+    rng = random.Random(config.seed)
+    lock = threading.Lock()
+    stats = {"requests": 0, "stream_requests": 0, "errors": 0, "timeouts": 0, "aborts": 0,
+             "in_flight": 0, "max_in_flight": 0}
+
+    def count(name: str, amount: int = 1):
+        with lock:
+            stats[name] += amount
+            if name == "in_flight":
+                stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+
+    def roll() -> float:
+        with lock:
+            return rng.random()
+
+    def delay() -> float:
+        return config.latency + (roll() * config.jitter if config.jitter else 0.0)
+
+    @app.get("/stats")
+    def get_stats():
+        with lock:
+            return dict(stats, config=config.as_dict())
+
+    @app.post("/stats/reset")
+    def reset_stats():
+        with lock:
+            for key in stats:
+                stats[key] = 0
+        return {"ok": True}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        messages = body.get("messages") or []
+        prompt = "\n".join(str(m.get("content", "")) for m in messages)
+        question = str(messages[-1].get("content", "")) if messages else ""
+        stream = bool(body.get("stream"))
+        count("requests")
+        if stream:
+            count("stream_requests")
+
+        # 错误注入：先判定超时，再判定错误状态码
+        dice = roll()
+        if dice < config.timeout_rate:
+            count("timeouts")
+            await asyncio.sleep(config.hang)
+        elif dice < config.timeout_rate + config.error_rate:
+            count("errors")
+            await asyncio.sleep(delay())
+            return JSONResponse({"error": {"message": "injected error", "type": "server_error"}},
+                                status_code=config.error_status)
+
+        with lock:
+            chunk_seed = rng.random()
+        if body.get("response_format"):
+            chunks = [_learning_path(prompt)]
+        else:
+            chunks = _answer_chunks(question, config.tokens, random.Random(chunk_seed))
+        usage = {"prompt_tokens": max(len(prompt) // 2, 1), "completion_tokens": len(chunks),
+                 "total_tokens": max(len(prompt) // 2, 1) + len(chunks)}
+        model = body.get("model", "mock")
+        created = int(time.time())
+
+        if not stream:
+            count("in_flight")
+            try:
+                await asyncio.sleep(delay() + config.token_delay * len(chunks))
+            finally:
+                count("in_flight", -1)
+            return {
+                "id": "mock-chat", "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(chunks)},
+                             "finish_reason": "stop"}],
+                "usage": usage,
+            }
+
+        abort_at = len(chunks) // 2 if roll() < config.abort_rate else None
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+
+        async def events():
+            count("in_flight")
+            try:
+                await asyncio.sleep(delay())
+                for i, chunk in enumerate(chunks):
+                    if i == abort_at:
+                        count("aborts")
+                        raise RuntimeError("injected stream abort")
+                    if i:
+                        await asyncio.sleep(config.token_delay)
+                    data = {"id": "mock-chat", "object": "chat.completion.chunk", "created": created, "model": model,
+                            "choices": [{"index": 0, "delta": {"content": chunk}, "finish_reason": None}]}
+                    yield f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+                if include_usage:
+                    yield f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n"
+                yield "data: [DONE]\n\n"
+            finally:
+                count("in_flight", -1)
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """模拟服务的参数（基准脚本复用同一组参数）"""
+    parser.add_argument("--latency", type=float, default=0.2, help="首 token 前的延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="延迟的随机增量上限（秒）")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="流式响应相邻 token 的间隔（秒）")
+    parser.add_argument("--tokens", type=int, default=60, help="每个回答的 token（分块）数")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回错误状态码的比例")
+    parser.add_argument("--error-status", type=int, default=500, help="注入错误的状态码（如 429 / 500 / 503）")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="长时间不响应的比例")
+    parser.add_argument("--hang", type=float, default=120.0, help="不响应的请求挂起多久（秒）")
+    parser.add_argument("--abort-rate", type=float, default=0.0, help="流式响应中途断开的比例")
+    parser.add_argument("--llm-seed", type=int, default=0, help="错误注入与回答内容的随机种子")
+
+
+def config_from_args(args) -> MockLLMConfig:
+    return MockLLMConfig(
+        latency=args.latency, jitter=args.jitter, token_delay=args.token_delay, tokens=args.tokens,
+        error_rate=args.error_rate, error_status=args.error_status, timeout_rate=args.timeout_rate,
+        hang=args.hang, abort_rate=args.abort_rate, seed=args.llm_seed,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OpenAI 兼容的模拟大模型服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--log-level", default="warning", help="uvicorn 日志级别（注入的流式中断会打印异常栈）")
+    add_arguments(parser)
+    args = parser.parse_args()
+    uvicorn.run(create_app(config_from_args(args)), host=args.host, port=args.port, log_level=args.log_level)
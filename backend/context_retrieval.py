@@ -0,0 +1,232 @@
+"""问答提示词的图谱上下文检索
+
+从问题中匹配到的全部实体出发，沿出边 / 入边扩展至多 max_hops 跳收集候选事实（边），
+按边权重、跳数与问题的字面重合度向量化打分，再在 token 预算内按得分贪心选取。
+枢纽节点（如 JavaScript）的上万条边只参与打分，不会全部进入提示词；提到多个实体的问题各实体都有覆盖。
+"""
+import math
+import re
+from typing import Dict, Sequence
+
+import numpy as np
+
+from graph_store import GraphStore
+
+_CJK = re.compile("[\u2e80-\u9fff\uf900-\ufaff\uff00-\uffef]")
+
+HEADER = "根据知识图谱，我获取到以下相关信息：\n"
+
+
+def estimate_tokens(text: str) -> int:
+    """估算 token 数：中文字符约 0.6 个 token，其他字符约 0.3 个（DeepSeek 文档给出的换算比例）"""
+    cjk = len(_CJK.findall(text))
+    return math.ceil(cjk * 0.6 + (len(text) - cjk) * 0.3)
+
+
+def format_fact(source: str, relation: str, target: str, weight: int) -> str:
+    return f"- {source} {relation} {target}（相关度：{weight}/10）\n"
+
+
+def _bigrams(text: str) -> set:
+    text = text.lower()
+    return {text[i:i + 2] for i in range(len(text) - 1)} if len(text) > 1 else {text}
+
+
+def _overlap(name: str, question_bigrams: set) -> float:
+    """名称的二元组出现在问题中的比例"""
+    grams = _bigrams(name)
+    return len(grams & question_bigrams) / len(grams) if grams else 0.0
+
+
+def _gather(indptr: np.ndarray, nodes: np.ndarray):
+    """若干节点在 CSR 中的全部位置：(所属节点的下标, 位置)"""
+    starts = indptr[nodes]
+    lengths = indptr[nodes + 1] - starts
+    owner = np.repeat(np.arange(len(nodes)), lengths)
+    offsets = np.arange(int(lengths.sum())) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return owner, starts[owner] + offsets
+
+
+class ContextRetriever:
+    """某一图谱版本上的上下文检索（无内部状态，按需创建）"""
+
+    def __init__(self, store: GraphStore, max_hops: int = 2, beam: int = 16, hop_decay: float = 0.5,
+                 max_seeds: int = 8, rerank: int = 256, diversity: float = 0.15, min_score: float = 0.2):
+        self.store = store
+        self.max_hops = max(1, max_hops)
+        # 每一跳只从边权重最高的 beam 个新节点继续扩展，避免枢纽节点的多跳邻域爆炸
+        self.beam = beam
+        self.hop_decay = hop_decay
+        self.max_seeds = max_seeds
+        # 初筛后参与名称重合度精排的候选数
+        self.rerank = rerank
+        # 同一实体下第 k 条事实的得分除以 (1 + diversity * k)，让多个实体都能分到预算
+        self.diversity = diversity
+        # 得分低于 min_score 的事实即使预算有余也不加入，避免用弱相关的关系填满预算
+        # （一跳、最高权重、与问题无重合的事实得分为 1）
+        self.min_score = min_score
+
+    def _edges_of(self, nodes: np.ndarray):
+        """节点的全部出边与入边：(所属节点的下标, 源, 目标, 关系编码, 权重, 另一端节点, 是否入边)"""
+        store = self.store
+        out_owner, out_pos = _gather(store.out_indptr, nodes)
+        in_owner, in_pos = _gather(store.in_indptr, nodes)
+        out_other = store.out_indices[out_pos].astype(np.int64)
+        in_other = store.in_indices[in_pos].astype(np.int64)
+        return (
+            np.concatenate([out_owner, in_owner]),
+            np.concatenate([nodes[out_owner], in_other]),
+            np.concatenate([out_other, nodes[in_owner]]),
+            np.concatenate([store.out_relations[out_pos], store.in_relations[in_pos]]).astype(np.int64),
+            np.concatenate([store.out_weights[out_pos], store.in_weights[in_pos]]).astype(np.float64),
+            np.concatenate([out_other, in_other]),
+            np.concatenate([np.zeros(len(out_pos), dtype=bool), np.ones(len(in_pos), dtype=bool)]),
+        )
+
+    def _next_frontier(self, other: np.ndarray, weight: np.ndarray, index: np.ndarray) -> np.ndarray:
+        """index 中边权重最高的 beam 个不同节点各自的最佳候选边（只在前 8 * beam 条边中挑选）"""
+        limit = self.beam * 8
+        if len(index) > limit:
+            index = index[np.argpartition(-weight[index], limit - 1)[:limit]]
+        order = index[np.argsort(-weight[index], kind="stable")]
+        _, first = np.unique(other[order], return_index=True)
+        return order[np.sort(first)][:self.beam]
+
+    def _candidates(self, seeds: np.ndarray) -> Dict[str, np.ndarray]:
+        """逐跳扩展收集候选边，每条边只收集一次"""
+        num_nodes = self.store.num_nodes
+        columns = {name: [] for name in ("src", "dst", "rel", "weight", "hop", "seed", "parent", "other")}
+        # 已展开（全部边都已收集）的节点，另一端是这些节点的边无需再收集
+        expanded = np.zeros(num_nodes, dtype=bool)
+        # 当前一跳的扩展起点：节点、所属种子、到达该节点的候选边下标（第一跳为 -1）
+        frontier, frontier_seed, frontier_parent = seeds, np.arange(len(seeds)), np.full(len(seeds), -1)
+        total = 0
+        for hop in range(1, self.max_hops + 1):
+            in_frontier = np.zeros(num_nodes, dtype=bool)
+            in_frontier[frontier] = True
+            owner, src, dst, rel, weight, other, incoming = self._edges_of(frontier)
+            # 两端都是本跳起点的边在出边、入边中各出现一次，只保留出边
+            keep = np.nonzero(~expanded[other] & ~(incoming & in_frontier[other]))[0]
+            expanded[frontier] = True
+            if len(keep) == 0:
+                break
+            owner, src, dst, rel, weight, other = (a[keep] for a in (owner, src, dst, rel, weight, other))
+            for name, values in (("src", src), ("dst", dst), ("rel", rel), ("weight", weight),
+                                 ("hop", np.full(len(keep), hop)), ("seed", frontier_seed[owner]),
+                                 ("parent", frontier_parent[owner]), ("other", other)):
+                columns[name].append(values)
+            if hop == self.max_hops:
+                break
+            # 下一跳：从本跳新到达的节点中取边权重最高的 beam 个继续扩展
+            fresh = np.nonzero(~expanded[other])[0]
+            if len(fresh) == 0:
+                break
+            best = self._next_frontier(other, weight, fresh)
+            frontier, frontier_seed = other[best], frontier_seed[owner[best]]
+            frontier_parent = total + best
+            total += len(keep)
+        return {name: np.concatenate(values) if values else np.empty(0, dtype=np.int64)
+                for name, values in columns.items()}
+
+    def _score(self, question: str, cand: Dict[str, np.ndarray], seeds: np.ndarray) -> np.ndarray:
+        """向量化打分：权重 × 跳数衰减 ×（1 + 关系名重合 + 两端均为问题实体），再对初筛结果按名称重合度精排"""
+        question_bigrams = _bigrams(question)
+        relations = self.store.relations
+        table = np.zeros(len(relations))
+        for code in np.flatnonzero(np.bincount(cand["rel"], minlength=len(relations))).tolist():
+            table[code] = _overlap(relations[code], question_bigrams)
+        relation_overlap = table[cand["rel"]]
+        weight = cand["weight"] / max(float(cand["weight"].max()), 1.0)
+        both_seeds = np.isin(cand["other"], seeds).astype(np.float64)
+        score = weight * self.hop_decay ** (cand["hop"] - 1) * (1.0 + relation_overlap + both_seeds)
+
+        # 精排：只对初筛的前 rerank 个候选计算另一端节点名与问题的重合度
+        if len(score) > self.rerank:
+            top = np.argpartition(-score, self.rerank - 1)[:self.rerank]
+            final = np.zeros_like(score)
+        else:
+            top = np.arange(len(score))
+            final = score.copy()
+        names = self.store.nodes
+        overlap = np.array([_overlap(names[int(n)], question_bigrams) for n in cand["other"][top].tolist()])
+        final[top] = score[top] * (1.0 + overlap)
+
+        # 多样性：精排候选按种子分组，组内名次越靠后得分折扣越大
+        seed = cand["seed"][top]
+        order = np.lexsort((-final[top], seed))
+        group_start = np.searchsorted(seed[order], seed[order], side="left")
+        rank = np.empty(len(order), dtype=np.float64)
+        rank[order] = np.arange(len(order)) - group_start
+        final[top] /= 1.0 + self.diversity * rank
+        return final
+
+    def retrieve(self, question: str, entities: Sequence[str], budget: int) -> Dict:
+        """返回选中的事实、拼好的上下文文本及其估算 token 数"""
+        store = self.store
+        ids = [store.id_of(name) for name in entities]
+        seeds = np.array([i for i in ids if i is not None][:self.max_seeds], dtype=np.int64)
+        result = {"facts": [], "text": "", "tokens": 0, "budget": budget, "candidates": 0, "truncated": False}
+        header_cost = estimate_tokens(HEADER)
+        if len(seeds) == 0 or budget <= header_cost:
+            return result
+        cand = self._candidates(seeds)
+        result["candidates"] = len(cand["src"])
+        if not result["candidates"]:
+            return result
+        score = self._score(question, cand, seeds)
+
+        names, relations = store.nodes, store.relations
+        lines: Dict[int, str] = {}
+        costs: Dict[int, int] = {}
+
+        def line_of(c: int) -> str:
+            if c not in lines:
+                lines[c] = format_fact(names[int(cand["src"][c])], relations[int(cand["rel"][c])],
+                                       names[int(cand["dst"][c])], int(cand["weight"][c]))
+                costs[c] = estimate_tokens(lines[c])
+            return lines[c]
+
+        # 按得分贪心装入预算；多跳事实连同它的上一跳一起装入，保证关系链完整
+        selected: Dict[int, None] = {}
+        used = header_cost
+        eligible = np.flatnonzero(score >= max(self.min_score, 1e-12))
+        # 全部候选中最短的一条事实（候选数不超过 rerank），装入任何关系链至少需要这么多
+        for c in eligible.tolist():
+            line_of(c)
+        min_cost = min((costs[c] for c in eligible.tolist()), default=0)
+        for c in eligible[np.argsort(-score[eligible], kind="stable")].tolist():
+            chain = []
+            node = c
+            while node >= 0 and node not in selected:
+                chain.append(node)
+                node = int(cand["parent"][node])
+            for item in chain:
+                line_of(item)
+            cost = sum(costs[item] for item in chain)
+            if used + cost > budget:
+                result["truncated"] = True
+                # 剩余预算连最短的一条事实都放不下时结束
+                if budget - used < min_cost:
+                    break
+                continue
+            for item in reversed(chain):
+                selected[item] = None
+            used += cost
+
+        # 输出顺序：按实体在问题中的顺序、跳数、得分
+        chosen = sorted(selected, key=lambda c: (int(cand["seed"][c]), int(cand["hop"][c]), -score[c]))
+        result["facts"] = [
+            {
+                "source": names[int(cand["src"][c])],
+                "relation": relations[int(cand["rel"][c])],
+                "target": names[int(cand["dst"][c])],
+                "weight": int(cand["weight"][c]),
+                "hops": int(cand["hop"][c]),
+                "score": round(float(score[c]), 4),
+            }
+            for c in chosen
+        ]
+        if chosen:
+            result["text"] = HEADER + "".join(lines[c] for c in chosen)
+            result["tokens"] = used
+        return result
@@ -0,0 +1,191 @@
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from graph_loader import encode_strings
+from shared_graph import StringTable
+
+
+def _fold_with_offsets(text: str) -> Tuple[str, List[int]]:
+    """大小写折叠，同时记录折叠后每个字符对应的原文下标（casefold 可能改变长度）"""
+    folded_chars = []
+    offsets = []
+    for i, ch in enumerate(text):
+        folded = ch.casefold()
+        folded_chars.append(folded)
+        offsets.extend([i] * len(folded))
+    return "".join(folded_chars), offsets
+
+
+class EntityMatcher:
+    """基于 Aho-Corasick 自动机的多模式实体匹配器
+
+    构建一次后，单次扫描即可找出文本中出现的全部实体及其位置，
+    匹配不区分大小写，重叠的匹配按最长优先消解。
+    """
+
+    def __init__(self, entities: Iterable[str] = ()):
+        # goto[state] -> {字符: 下一个状态}
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # 以该状态结尾的模式（折叠后的实体名），没有则为 None
+        self._pattern: List = [None]
+        # 沿 fail 链最近的、带有模式的状态（输出链），没有则为 0
+        self._dict_link: List[int] = [0]
+        # 折叠后的实体名 -> 原始实体名
+        self._canonical: Dict[str, str] = {}
+        self._arrays: Optional[Dict[str, np.ndarray]] = None
+        for entity in entities:
+            self._add(str(entity))
+        self._build()
+
+    def __len__(self) -> int:
+        return len(self._canonical)
+
+    def _add(self, entity: str):
+        key = entity.strip().casefold()
+        # 空名称或大小写折叠后重名的实体只保留第一个
+        if not key or key in self._canonical:
+            return
+        self._canonical[key] = entity
+        state = 0
+        for ch in key:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._pattern.append(None)
+                self._dict_link.append(0)
+                self._goto[state][ch] = nxt
+            state = nxt
+        self._pattern[state] = key
+
+    def _build(self):
+        """BFS 计算失败指针和输出链"""
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                fail_state = self._goto[f].get(ch, 0)
+                self._fail[nxt] = fail_state
+                self._dict_link[nxt] = fail_state if self._pattern[fail_state] is not None else self._dict_link[fail_state]
+
+    def shared_arrays(self) -> Dict[str, np.ndarray]:
+        """自动机的扁平数组形式（每个状态的转移按字符编码排序），供发布到共享内存"""
+        if self._arrays is None:
+            goto = self._goto
+            counts = [len(g) for g in goto]
+            total = sum(counts)
+            states = np.repeat(np.arange(len(goto), dtype=np.int64), counts)
+            chars = np.fromiter((ord(ch) for g in goto for ch in g), dtype=np.int32, count=total)
+            targets = np.fromiter((nxt for g in goto for nxt in g.values()), dtype=np.int32, count=total)
+            order = np.lexsort((chars, states))
+            indptr = np.zeros(len(goto) + 1, dtype=np.int64)
+            np.cumsum(counts, out=indptr[1:])
+            names = list(self._canonical.values())
+            slot = {key: i for i, key in enumerate(self._canonical)}
+            name_blob, name_offsets = encode_strings(names)
+            self._arrays = {
+                "matcher_indptr": indptr,
+                "matcher_chars": chars[order],
+                "matcher_next": targets[order],
+                "matcher_fail": np.array(self._fail, dtype=np.int32),
+                "matcher_dict_link": np.array(self._dict_link, dtype=np.int32),
+                "matcher_pattern": np.array([-1 if key is None else slot[key] for key in self._pattern], dtype=np.int32),
+                "matcher_pattern_len": np.array([0 if key is None else len(key) for key in self._pattern], dtype=np.int32),
+                "matcher_name_blob": name_blob,
+                "matcher_name_offsets": name_offsets,
+            }
+        return self._arrays
+
+    def find_all(self, text: str) -> List[Tuple[int, int, str]]:
+        """返回所有（可能重叠的）匹配：(起始下标, 结束下标, 原始实体名)，下标基于原文"""
+        if not text or not self._canonical:
+            return []
+        folded, offsets = _fold_with_offsets(text)
+        goto, fail, pattern, dict_link = self._goto, self._fail, self._pattern, self._dict_link
+        matches = []
+        state = 0
+        for i, ch in enumerate(folded):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            out = state if pattern[state] is not None else dict_link[state]
+            while out:
+                key = pattern[out]
+                start = offsets[i - len(key) + 1]
+                end = offsets[i] + 1
+                matches.append((start, end, self._canonical[key]))
+                out = dict_link[out]
+        return matches
+
+    def extract(self, text: str) -> List[Dict]:
+        """抽取文本中的实体，重叠时保留最长匹配，结果按出现位置排序"""
+        candidates = self.find_all(text)
+        # 长的优先，同长度时靠前的优先
+        candidates.sort(key=lambda m: (m[0] - m[1], m[0]))
+        taken = []
+        occupied = bytearray(len(text))
+        for start, end, entity in candidates:
+            if any(occupied[start:end]):
+                continue
+            occupied[start:end] = b"\x01" * (end - start)
+            taken.append((start, end, entity))
+        taken.sort()
+        return [{"entity": entity, "start": start, "end": end} for start, end, entity in taken]
+
+
+class SharedEntityMatcher(EntityMatcher):
+    """EntityMatcher 的只读数组形式（可直接建立在共享内存上），匹配结果与原实现一致"""
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self._arrays = {name: array for name, array in arrays.items() if name.startswith("matcher_")}
+        self._indptr = arrays["matcher_indptr"]
+        self._chars = arrays["matcher_chars"]
+        self._next = arrays["matcher_next"]
+        self._fail = arrays["matcher_fail"]
+        self._dict_link = arrays["matcher_dict_link"]
+        self._pattern = arrays["matcher_pattern"]
+        self._pattern_len = arrays["matcher_pattern_len"]
+        self._names = StringTable(arrays["matcher_name_blob"], arrays["matcher_name_offsets"])
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def shared_arrays(self) -> Dict[str, np.ndarray]:
+        return self._arrays
+
+    def _step(self, state: int, code: int) -> int:
+        """状态 state 读入字符 code 后的状态，没有转移时返回 -1"""
+        lo, hi = int(self._indptr[state]), int(self._indptr[state + 1])
+        j = bisect_left(self._chars, code, lo, hi)
+        return int(self._next[j]) if j < hi and self._chars[j] == code else -1
+
+    def find_all(self, text: str) -> List[Tuple[int, int, str]]:
+        if not text or not len(self):
+            return []
+        folded, offsets = _fold_with_offsets(text)
+        fail, pattern, pattern_len, dict_link = self._fail, self._pattern, self._pattern_len, self._dict_link
+        matches = []
+        state = 0
+        for i, ch in enumerate(folded):
+            code = ord(ch)
+            nxt = self._step(state, code)
+            while nxt < 0 and state:
+                state = int(fail[state])
+                nxt = self._step(state, code)
+            state = max(nxt, 0)
+            out = state if pattern[state] >= 0 else int(dict_link[state])
+            while out:
+                start = offsets[i - int(pattern_len[out]) + 1]
+                matches.append((start, offsets[i] + 1, self._names[int(pattern[out])]))
+                out = int(dict_link[out])
+        return matches
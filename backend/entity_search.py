@@ -0,0 +1,213 @@
+import heapq
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from graph_loader import encode_strings
+from shared_graph import NameIndex, StringTable, hash_names
+
+
+def normalize_name(name: str) -> str:
+    """名称归一化：合并空白并大小写折叠，中英文混合名称同样适用"""
+    return " ".join(str(name).split()).casefold()
+
+
+def ngrams(text: str) -> List[str]:
+    """按字符切分的二元组；单字符文本返回其本身"""
+    if len(text) < 2:
+        return [text] if text else []
+    return [text[i:i + 2] for i in range(len(text) - 1)]
+
+
+class EntitySearchIndex:
+    """实体名称的 n-gram 倒排索引，支持分级排序的模糊搜索
+
+    排序：完全匹配 > 前缀匹配 > 子串匹配 > 容错匹配（二元组 Dice 相似度）。
+    """
+
+    # 容错匹配的最小查询长度与相似度阈值
+    FUZZY_MIN_LENGTH = 3
+    FUZZY_THRESHOLD = 0.5
+
+    def __init__(self, names: Iterable[str] = ()):
+        self._names: List[str] = []
+        self._keys: List[str] = []
+        # 每个名称的二元组个数（容错匹配计算相似度用）
+        self._gram_counts: List[int] = []
+        self._exact: Dict[str, int] = {}
+        # 二元组 -> 实体编号列表
+        self._bigrams: Dict[str, List[int]] = {}
+        # 单字符 -> 实体编号列表（用于一个字的查询）
+        self._chars: Dict[str, List[int]] = {}
+        self._arrays: Optional[Dict[str, np.ndarray]] = None
+        for name in names:
+            self._add(str(name))
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def _add(self, name: str):
+        key = normalize_name(name)
+        if not key or key in self._exact:
+            return
+        idx = len(self._names)
+        self._names.append(name)
+        self._keys.append(key)
+        self._exact[key] = idx
+        grams = set(ngrams(key)) if len(key) > 1 else set()
+        self._gram_counts.append(len(grams))
+        for gram in grams:
+            self._bigrams.setdefault(gram, []).append(idx)
+        for ch in set(key):
+            self._chars.setdefault(ch, []).append(idx)
+
+    def with_names(self, names: Iterable[str]) -> "EntitySearchIndex":
+        """追加实体后的新索引（写时复制：只复制受影响的倒排列表，原索引不变）"""
+        names = [str(name) for name in names]
+        index = EntitySearchIndex()
+        index._names = list(self._names)
+        index._keys = list(self._keys)
+        index._gram_counts = list(self._gram_counts)
+        index._exact = dict(self._exact)
+        index._bigrams = dict(self._bigrams)
+        index._chars = dict(self._chars)
+        for name in names:
+            key = normalize_name(name)
+            for gram in ngrams(key) if len(key) > 1 else ():
+                if gram in self._bigrams and index._bigrams[gram] is self._bigrams[gram]:
+                    index._bigrams[gram] = list(self._bigrams[gram])
+            for ch in key:
+                if ch in self._chars and index._chars[ch] is self._chars[ch]:
+                    index._chars[ch] = list(self._chars[ch])
+        for name in names:
+            index._add(name)
+        return index
+
+    def shared_arrays(self) -> Dict[str, np.ndarray]:
+        """索引的扁平数组形式（倒排列表按 CSR 保存），供发布到共享内存"""
+        if self._arrays is None:
+            name_blob, name_offsets = encode_strings(self._names)
+            key_blob, key_offsets = encode_strings(self._keys)
+            hashes = hash_names(self._keys)
+            order = np.argsort(hashes, kind="stable")
+            arrays = {
+                "search_name_blob": name_blob, "search_name_offsets": name_offsets,
+                "search_key_blob": key_blob, "search_key_offsets": key_offsets,
+                "search_key_hashes": hashes[order], "search_key_order": order.astype(np.int64),
+                "search_gram_counts": np.array(self._gram_counts, dtype=np.int32),
+            }
+            for prefix, postings in (("search_bigram", self._bigrams), ("search_char", self._chars)):
+                arrays.update(PostingTable.encode(prefix, postings))
+            self._arrays = arrays
+        return self._arrays
+
+    def _substring_candidates(self, query: str) -> List[int]:
+        """取最短的倒排列表作为候选，再逐个校验子串"""
+        if len(query) == 1:
+            return self._chars.get(query, [])
+        postings = [self._bigrams.get(gram) for gram in set(ngrams(query))]
+        if not all(postings):
+            return []
+        return min(postings, key=len)
+
+    def _scored(self, query: str) -> List[Tuple[float, str, str]]:
+        results = []
+        matched = set()
+        exact = self._exact.get(query)
+        if exact is not None:
+            matched.add(exact)
+            results.append((4.0, "exact", self._names[exact]))
+        for idx in self._substring_candidates(query):
+            if idx in matched:
+                continue
+            key = self._keys[idx]
+            pos = key.find(query)
+            if pos < 0:
+                continue
+            matched.add(idx)
+            coverage = len(query) / len(key)
+            if pos == 0:
+                results.append((3 + coverage, "prefix", self._names[idx]))
+            else:
+                results.append((2 + coverage, "substring", self._names[idx]))
+        if len(query) >= self.FUZZY_MIN_LENGTH:
+            query_grams = set(ngrams(query))
+            shared = Counter()
+            for gram in query_grams:
+                shared.update(self._bigrams.get(gram, ()))
+            for idx, count in shared.items():
+                if idx in matched:
+                    continue
+                dice = 2 * count / (len(query_grams) + int(self._gram_counts[idx]))
+                if dice >= self.FUZZY_THRESHOLD:
+                    results.append((1 + dice, "fuzzy", self._names[idx]))
+        return results
+
+    def search(self, keyword: str, limit: int = 20, offset: int = 0) -> Tuple[int, List[Dict]]:
+        """返回 (匹配总数, 当前页结果)，结果按得分降序，同分时名称短的优先"""
+        query = normalize_name(keyword)
+        if not query:
+            return 0, []
+        results = self._scored(query)
+        top = heapq.nsmallest(offset + limit, results, key=lambda r: (-r[0], len(r[2]), r[2]))
+        page = [
+            {"entity": name, "score": round(score, 4), "match": match}
+            for score, match, name in top[offset:offset + limit]
+        ]
+        return len(results), page
+
+
+class PostingTable:
+    """只读倒排表：键（一个或两个字符）编码为整数后排序，倒排列表按 CSR 拼接"""
+
+    def __init__(self, codes: np.ndarray, indptr: np.ndarray, postings: np.ndarray):
+        self._codes = codes
+        self._indptr = indptr
+        self._postings = postings
+
+    @staticmethod
+    def code(key: str) -> int:
+        value = 0
+        for ch in key:
+            value = (value << 21) | ord(ch)
+        return value
+
+    @classmethod
+    def encode(cls, prefix: str, table: Dict[str, List[int]]) -> Dict[str, np.ndarray]:
+        keys = sorted(table, key=cls.code)
+        indptr = np.zeros(len(keys) + 1, dtype=np.int64)
+        np.cumsum([len(table[k]) for k in keys], out=indptr[1:])
+        return {
+            f"{prefix}_codes": np.array([cls.code(k) for k in keys], dtype=np.uint64),
+            f"{prefix}_indptr": indptr,
+            f"{prefix}_postings": np.array([i for k in keys for i in table[k]], dtype=np.int32),
+        }
+
+    @classmethod
+    def from_arrays(cls, prefix: str, arrays: Dict[str, np.ndarray]) -> "PostingTable":
+        return cls(arrays[f"{prefix}_codes"], arrays[f"{prefix}_indptr"], arrays[f"{prefix}_postings"])
+
+    def get(self, key: str, default=None):
+        code = np.uint64(self.code(key))
+        j = int(np.searchsorted(self._codes, code))
+        if j < len(self._codes) and self._codes[j] == code:
+            return self._postings[self._indptr[j]:self._indptr[j + 1]].tolist()
+        return default
+
+
+class SharedEntitySearchIndex(EntitySearchIndex):
+    """EntitySearchIndex 的只读数组形式（可直接建立在共享内存上），搜索结果与原实现一致"""
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self._arrays = {name: array for name, array in arrays.items() if name.startswith("search_")}
+        self._names = StringTable(arrays["search_name_blob"], arrays["search_name_offsets"])
+        self._keys = StringTable(arrays["search_key_blob"], arrays["search_key_offsets"])
+        self._gram_counts = arrays["search_gram_counts"]
+        self._exact = NameIndex(self._keys, arrays["search_key_hashes"], arrays["search_key_order"])
+        self._bigrams = PostingTable.from_arrays("search_bigram", arrays)
+        self._chars = PostingTable.from_arrays("search_char", arrays)
+
+    def with_names(self, names: Iterable[str]) -> "EntitySearchIndex":
+        """追加实体后的新索引：共享数组是只读的，在本进程内存中重建一份普通索引"""
+        return EntitySearchIndex([*self._names, *names])
@@ -0,0 +1,267 @@
+"""全量图谱 / 实体列表的流式、分页导出
+
+直接按 CSR 顺序分块遍历节点（编号顺序）与边（出边数组顺序），每块只编码当前的若干条记录，
+单个导出请求的内存占用与图谱规模无关。关系、权重筛选在服务端按块向量化完成；
+有筛选条件时只导出至少有一条边满足条件的节点。
+
+分页游标记录图谱版本、所在部分（节点 / 边）与下一条记录的位置，定位是 O(1) 的；
+图谱版本变化后旧游标失效，需要从头开始。
+"""
+import base64
+import hashlib
+import json
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from graph_snapshot import dumps
+from graph_state import GraphState
+
+NODE_FIELDS = ("id", "label", "x", "y")
+EDGE_FIELDS = ("from", "to", "label", "weight", "relation")
+NODES, EDGES = 0, 1
+
+
+class CursorError(ValueError):
+    """游标无效，或与当前查询条件不一致"""
+
+
+class StaleCursorError(CursorError):
+    """游标所属的图谱版本已被替换"""
+
+
+def parse_fields(fields: Optional[str]) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """字段投影：逗号分隔，同时作用于节点与边；id 与 from / to 总是保留"""
+    if not fields:
+        return NODE_FIELDS, EDGE_FIELDS
+    names = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = names - set(NODE_FIELDS) - set(EDGE_FIELDS)
+    if unknown:
+        raise ValueError(f"未知字段：{', '.join(sorted(unknown))}")
+    node_fields = tuple(name for name in NODE_FIELDS if name == "id" or name in names)
+    edge_fields = tuple(name for name in EDGE_FIELDS if name in ("from", "to") or name in names)
+    return node_fields, edge_fields
+
+
+class GraphExporter:
+    """某一图谱版本上的导出（按需创建，本身只保存查询条件）"""
+
+    def __init__(self, state: GraphState, relations: Optional[Sequence[str]] = None,
+                 min_weight: Optional[int] = None, max_weight: Optional[int] = None,
+                 fields: Optional[str] = None, chunk_size: int = 2048):
+        self.state = state
+        self.store = state.store
+        self.relation_names = sorted(set(relations)) if relations else None
+        codes = self.store.relation_codes(relations)
+        self.relation_codes = np.array(sorted(codes), dtype=np.int64) if codes is not None else None
+        self.min_weight = min_weight
+        self.max_weight = max_weight
+        self.node_fields, self.edge_fields = parse_fields(fields)
+        self.chunk_size = chunk_size
+
+    @property
+    def filtered(self) -> bool:
+        return self.relation_codes is not None or self.min_weight is not None or self.max_weight is not None
+
+    # ---------- 游标 ----------
+
+    def _query_key(self) -> str:
+        """查询条件的摘要，防止换了条件继续使用旧游标"""
+        query = [self.relation_names, self.min_weight, self.max_weight, self.node_fields, self.edge_fields]
+        return hashlib.sha1(json.dumps(query, ensure_ascii=False).encode("utf-8")).hexdigest()[:8]
+
+    def encode_cursor(self, section: int, position: int) -> str:
+        raw = f"{self.state.version}:{self._query_key()}:{section}:{position}".encode("ascii")
+        return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+    def decode_cursor(self, cursor: Optional[str]) -> Tuple[int, int]:
+        """游标为空时从头开始，返回 (部分, 位置)"""
+        if not cursor:
+            return NODES, 0
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("ascii")
+            version, key, section, position = raw.split(":")
+            section, position = int(section), int(position)
+        except (ValueError, UnicodeDecodeError):
+            raise CursorError("无效的分页游标")
+        if version != self.state.version:
+            raise StaleCursorError("图谱已更新，请从头重新分页")
+        if key != self._query_key():
+            raise CursorError("分页游标与查询条件不一致")
+        if section not in (NODES, EDGES) or position < 0:
+            raise CursorError("无效的分页游标")
+        return section, position
+
+    # ---------- 分块遍历 ----------
+
+    def _edge_mask(self, relations: np.ndarray, weights: np.ndarray) -> Optional[np.ndarray]:
+        if not self.filtered:
+            return None
+        mask = np.ones(len(relations), dtype=bool)
+        if self.relation_codes is not None:
+            mask &= np.isin(relations, self.relation_codes)
+        if self.min_weight is not None:
+            mask &= weights >= self.min_weight
+        if self.max_weight is not None:
+            mask &= weights <= self.max_weight
+        return mask
+
+    def _matching_nodes(self, start: int, end: int) -> np.ndarray:
+        """[start, end) 中至少有一条边满足筛选条件的节点编号"""
+        store = self.store
+        hits = np.zeros(end - start, dtype=np.int64)
+        for indptr, relations, weights in ((store.out_indptr, store.out_relations, store.out_weights),
+                                           (store.in_indptr, store.in_relations, store.in_weights)):
+            lo, hi = int(indptr[start]), int(indptr[end])
+            mask = self._edge_mask(relations[lo:hi], weights[lo:hi])
+            owner = np.repeat(np.arange(end - start), np.diff(indptr[start:end + 1]))
+            hits += np.bincount(owner[mask], minlength=end - start)
+        return start + np.nonzero(hits)[0]
+
+    def iter_nodes(self, start: int = 0) -> Iterator[Tuple[np.ndarray, List[Dict]]]:
+        """逐块产出 (节点编号, 节点记录)；布局算完后节点带 x / y 坐标"""
+        names = self.store.nodes
+        with_label = "label" in self.node_fields
+        positions = self.state.layout.positions
+        with_xy = positions is not None and ("x" in self.node_fields or "y" in self.node_fields)
+        for chunk_start in range(start, self.store.num_nodes, self.chunk_size):
+            chunk_end = min(chunk_start + self.chunk_size, self.store.num_nodes)
+            if self.filtered:
+                ids = self._matching_nodes(chunk_start, chunk_end)
+                chunk = [str(names[i]) for i in ids.tolist()]
+            else:
+                ids = np.arange(chunk_start, chunk_end)
+                chunk = [str(name) for name in names[chunk_start:chunk_end]]
+            if not chunk:
+                continue
+            records = [{"id": name, "label": name} for name in chunk] if with_label else [{"id": name} for name in chunk]
+            if with_xy:
+                for record, (x, y) in zip(records, positions[ids].tolist()):
+                    if "x" in self.node_fields:
+                        record["x"] = round(x, 1)
+                    if "y" in self.node_fields:
+                        record["y"] = round(y, 1)
+            yield ids, records
+
+    def iter_edges(self, start: int = 0) -> Iterator[Tuple[np.ndarray, List[Dict]]]:
+        """逐块产出 (边在出边数组中的位置, 边记录)，字段与 FrontendKnowledgeGraph.edge_to_dict 一致"""
+        store = self.store
+        names, relation_names = store.nodes, store.relations
+        fields = self.edge_fields
+        for chunk_start in range(start, store.num_edges, self.chunk_size):
+            chunk_end = min(chunk_start + self.chunk_size, store.num_edges)
+            positions = np.arange(chunk_start, chunk_end)
+            relations = store.out_relations[chunk_start:chunk_end]
+            weights = store.out_weights[chunk_start:chunk_end]
+            mask = self._edge_mask(relations, weights)
+            if mask is not None:
+                positions, relations, weights = positions[mask], relations[mask], weights[mask]
+                if not len(positions):
+                    continue
+            sources = np.searchsorted(store.out_indptr, positions, side="right") - 1
+            targets = store.out_indices[positions]
+            columns = {
+                "from": [str(names[i]) for i in sources.tolist()],
+                "to": [str(names[i]) for i in targets.tolist()],
+            }
+            if "label" in fields or "relation" in fields:
+                labels = [relation_names[r] for r in relations.tolist()]
+                for name in ("label", "relation"):
+                    if name in fields:
+                        columns[name] = labels
+            if "weight" in fields:
+                columns["weight"] = weights.tolist()
+            keys = [name for name in EDGE_FIELDS if name in columns]
+            yield positions, [dict(zip(keys, values)) for values in zip(*(columns[k] for k in keys))]
+
+    def iter_records(self, section: int = NODES, position: int = 0
+                     ) -> Iterator[Tuple[int, np.ndarray, List[Dict]]]:
+        """从游标位置开始，依次产出节点块与边块：(部分, 位置, 记录)"""
+        if section == NODES:
+            for positions, records in self.iter_nodes(position):
+                yield NODES, positions, records
+            position = 0
+        for positions, records in self.iter_edges(position):
+            yield EDGES, positions, records
+
+    # ---------- 输出 ----------
+
+    def page(self, cursor: Optional[str], limit: int, sections: Iterable[int] = (NODES, EDGES)) -> Dict:
+        """一页记录（最多 limit 条，节点在前、边在后）及下一页的游标（没有更多时为 None）"""
+        sections = set(sections)
+        section, position = self.decode_cursor(cursor)
+        result = {"nodes": [], "edges": [], "next_cursor": None, "version": self.state.version}
+        remaining = limit
+        for part, positions, records in self.iter_records(section, position):
+            if part not in sections:
+                # 只要节点时，节点遍历结束即结束
+                break
+            take = min(remaining, len(records))
+            result["nodes" if part == NODES else "edges"].extend(records[:take])
+            remaining -= take
+            if remaining == 0:
+                next_position = int(positions[take - 1]) + 1
+                if self._has_more(part, next_position, sections):
+                    result["next_cursor"] = self.encode_cursor(part, next_position)
+                break
+        return result
+
+    def _has_more(self, section: int, position: int, sections) -> bool:
+        for part, _, _ in self.iter_records(section, position):
+            return part in sections
+        return False
+
+    def json_chunks(self) -> Iterator[bytes]:
+        """完整的 {"code":200,"data":{"nodes":[...],"edges":[...]},"msg":"success"} 响应，逐块编码"""
+        yield b'{"code":200,"data":{"nodes":['
+        yield from self._joined(self.iter_nodes())
+        yield b'],"edges":['
+        yield from self._joined(self.iter_edges())
+        yield b']},"msg":"success"}'
+
+    def entity_json_chunks(self) -> Iterator[bytes]:
+        """实体名称列表 {"code":200,"data":[...],"msg":"success"}，逐块编码"""
+        yield b'{"code":200,"data":['
+        yield from self._joined((ids, [r["id"] for r in records]) for ids, records in self.iter_nodes())
+        yield b'],"msg":"success"}'
+
+    @staticmethod
+    def _joined(chunks) -> Iterator[bytes]:
+        first = True
+        for _, records in chunks:
+            body = dumps(records)[1:-1]
+            yield body if first else b"," + body
+            first = False
+
+    def ndjson_lines(self, cursor: Optional[str] = None, limit: Optional[int] = None,
+                     entities_only: bool = False) -> Iterator[bytes]:
+        """NDJSON：首行 meta，之后每行一条记录（type 为 node / edge；entities_only 时每行一个实体名），
+        末行 end 给出条数与下一页游标（未限制条数时为 None）"""
+        section, position = self.decode_cursor(cursor)
+        store = self.store
+        yield dumps({"type": "meta", "version": self.state.version, "nodes": store.num_nodes,
+                     "edges": store.num_edges, "filtered": self.filtered}) + b"\n"
+        sections = {NODES} if entities_only else {NODES, EDGES}
+        counts = {NODES: 0, EDGES: 0}
+        remaining = limit
+        next_cursor = None
+        for part, positions, records in self.iter_records(section, position):
+            if part not in sections:
+                break
+            if remaining is not None:
+                records = records[:remaining]
+                remaining -= len(records)
+            if entities_only:
+                lines = [dumps(record["id"]) for record in records]
+            else:
+                kind = "node" if part == NODES else "edge"
+                lines = [dumps({"type": kind, **record}) for record in records]
+            counts[part] += len(lines)
+            yield b"\n".join(lines) + b"\n"
+            if remaining == 0:
+                next_position = int(positions[len(records) - 1]) + 1
+                if self._has_more(part, next_position, sections):
+                    next_cursor = self.encode_cursor(part, next_position)
+                break
+        yield dumps({"type": "end", "nodes": counts[NODES], "edges": counts[EDGES],
+                     "next_cursor": next_cursor}) + b"\n"
@@ -0,0 +1,549 @@
+"""服务端预计算的图谱布局与社区聚类层级
+
+每个图谱版本在后台线程计算一次：
+1. 社区层级：在无向加权图上做限制规模的标签传播得到第 1 层社区，再把社区收缩为节点重复进行，
+   直到顶层不超过 top_clusters 个簇；每个簇的直接下级不超过 max_cluster_size 个，展开一个簇的代价有上界。
+2. 布局：多层力导向（Fruchterman-Reingold）。先排布顶层簇，再逐层把下级放在上级位置附近（向日葵螺旋）
+   并做少量迭代微调。斥力在节点较少时精确计算，较多时按网格质心近似，全部为向量化运算。
+
+前端拿到坐标后可以关闭物理引擎直接绘制；簇视图把同一簇的节点聚合为超级节点（附带边数），按需逐层展开。
+图谱增量更新时已有节点的坐标与所属簇保持不变，新节点放在已有邻居附近，布局不会整体跳动。
+"""
+import math
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import connected_components
+from scipy.spatial import cKDTree
+
+from graph_store import GraphStore
+
+GOLDEN_ANGLE = math.pi * (3 - math.sqrt(5))
+
+
+def _undirected(store: GraphStore):
+    """无向边（每条有向边正反各一次）：(源, 目标, 归一化权重)"""
+    src = np.repeat(np.arange(store.num_nodes, dtype=np.int64), store.out_degree)
+    dst = store.out_indices.astype(np.int64)
+    weight = store.out_weights.astype(np.float64)
+    weight = weight / max(float(weight.max()), 1.0) if len(weight) else weight
+    keep = src != dst
+    src, dst, weight = src[keep], dst[keep], weight[keep]
+    return np.concatenate([src, dst]), np.concatenate([dst, src]), np.concatenate([weight, weight])
+
+
+def _compact(labels: np.ndarray) -> np.ndarray:
+    """标签重新编号为 0..k-1（按首次出现的节点顺序）"""
+    _, first, inverse = np.unique(labels, return_index=True, return_inverse=True)
+    rank = np.empty(len(first), dtype=np.int64)
+    rank[np.argsort(first, kind="stable")] = np.arange(len(first))
+    return rank[inverse]
+
+
+def label_propagation(n: int, src: np.ndarray, dst: np.ndarray, weight: np.ndarray, max_size: int,
+                      max_iter: int = 20, seed: int = 0) -> np.ndarray:
+    """限制规模的加权标签传播，返回 0..k-1 的社区编号
+
+    每轮只更新随机一半节点（避免同步更新的振荡），节点只能加入成员数未达到 max_size 的社区。
+    """
+    rng = np.random.default_rng(seed)
+    labels = np.arange(n, dtype=np.int64)
+    if len(src) == 0:
+        return labels
+    for _ in range(max_iter):
+        sizes = np.bincount(labels, minlength=n)
+        # 每个 (节点, 邻居标签) 的权重和，加一点随机扰动打破平局
+        key = src * n + labels[dst]
+        pairs, inverse = np.unique(key, return_inverse=True)
+        score = np.bincount(inverse, weights=weight) + rng.random(len(pairs)) * 1e-6
+        node, label = pairs // n, pairs % n
+        score[(sizes[label] >= max_size) & (label != labels[node])] = -np.inf
+        # pairs 按节点有序：分段取最大值即每个节点得分最高的标签
+        starts = np.flatnonzero(np.r_[True, node[1:] != node[:-1]])
+        best = np.maximum.reduceat(score, starts)
+        hit = np.flatnonzero(score == np.repeat(best, np.diff(np.r_[starts, len(score)])))
+        first = hit[np.r_[True, node[hit][1:] != node[hit][:-1]]]
+        first = first[np.isfinite(score[first])]
+        move = first[(rng.random(len(first)) < 0.5) & (label[first] != labels[node[first]])]
+        # 同一轮加入同一社区的节点数不超过它剩余的容量（随机取舍）
+        move = move[np.lexsort((rng.random(len(move)), label[move]))]
+        target = label[move]
+        rank = np.arange(len(move)) - np.searchsorted(target, target, side="left")
+        move = move[rank < max_size - sizes[target]]
+        # 节点离开后原社区的容量下一轮才释放，这里不会超限
+        changed = len(move)
+        labels[node[move]] = label[move]
+        if changed <= n * 0.001:
+            break
+    return _compact(labels)
+
+
+def _coarsen(labels: np.ndarray, k: int, src: np.ndarray, dst: np.ndarray, weight: np.ndarray):
+    """按社区收缩：社区之间的边合并为一条，权重为原权重之和"""
+    cs, cd = labels[src], labels[dst]
+    keep = cs != cd
+    key, inverse = np.unique(cs[keep] * k + cd[keep], return_inverse=True)
+    return key // k, key % k, np.bincount(inverse, weights=weight[keep])
+
+
+def cluster_hierarchy(store: GraphStore, max_cluster_size: int = 200, top_clusters: int = 50,
+                      seed: int = 0) -> List[np.ndarray]:
+    """社区层级：parents[l][i] 为第 l 层的第 i 个簇（第 0 层即节点）在第 l + 1 层所属的簇"""
+    n = store.num_nodes
+    src, dst, weight = _undirected(store)
+    parents: List[np.ndarray] = []
+    count = n
+    while count > top_clusters:
+        labels = label_propagation(count, src, dst, weight, max_cluster_size, seed=seed + len(parents))
+        k = int(labels.max()) + 1 if count else 0
+        if k > count * 0.95:
+            # 标签传播已无法继续合并（例如大量孤立的小连通分量）：没有边相连的簇按顺序打包
+            isolated = np.ones(count, dtype=bool)
+            isolated[src] = False
+            if not isolated.any():
+                break
+            labels = np.arange(count, dtype=np.int64)
+            bucket = np.cumsum(isolated) - 1
+            labels[isolated] = count + bucket[isolated] // max_cluster_size
+            labels = _compact(labels)
+            k = int(labels.max()) + 1
+            if k > count * 0.95:
+                break
+        parents.append(labels.astype(np.int32))
+        src, dst, weight = _coarsen(labels, k, src, dst, weight)
+        count = k
+    return parents
+
+
+def _repulsion(pos: np.ndarray, mass: np.ndarray, k2: float, exact_limit: int = 1500,
+               grid: int = 16, chunk: int = 8192) -> np.ndarray:
+    """斥力 k² · m_i · m_j / d：节点较少时两两精确计算，否则对网格各格的质心近似"""
+    n = len(pos)
+    force = np.zeros_like(pos)
+    if n <= exact_limit:
+        dx = pos[:, 0, None] - pos[None, :, 0]
+        dy = pos[:, 1, None] - pos[None, :, 1]
+        f = k2 * np.outer(mass, mass) / (dx * dx + dy * dy + 1e-9)
+        np.fill_diagonal(f, 0.0)
+        force[:, 0] = (dx * f).sum(1)
+        force[:, 1] = (dy * f).sum(1)
+        return force
+    lo = pos.min(0)
+    span = np.maximum(pos.max(0) - lo, 1e-9)
+    cell_xy = np.minimum(((pos - lo) / span * grid).astype(np.int64), grid - 1)
+    cell = cell_xy[:, 0] * grid + cell_xy[:, 1]
+    cell_mass = np.bincount(cell, weights=mass, minlength=grid * grid)
+    used = np.nonzero(cell_mass)[0]
+    centroid = np.stack([np.bincount(cell, weights=mass * pos[:, d], minlength=grid * grid)[used]
+                         for d in range(2)], axis=1) / cell_mass[used, None]
+    cell_mass = cell_mass[used]
+    column = np.searchsorted(used, cell)
+    cx, cy = centroid[:, 0], centroid[:, 1]
+    for start in range(0, n, chunk):
+        part = slice(start, min(start + chunk, n))
+        px, py, m = pos[part, 0], pos[part, 1], mass[part]
+        dx = px[:, None] - cx[None, :]
+        dy = py[:, None] - cy[None, :]
+        f = cell_mass[None, :] / (dx * dx + dy * dy + 1e-9)
+        fx, fy = (dx * f).sum(1), (dy * f).sum(1)
+        # 所在格子：换成去掉节点自身后的质量与质心
+        own = column[part]
+        own_mass = cell_mass[own]
+        own_dx, own_dy = px - cx[own], py - cy[own]
+        f = own_mass / (own_dx * own_dx + own_dy * own_dy + 1e-9)
+        fx -= own_dx * f
+        fy -= own_dy * f
+        rest = own_mass - m
+        has_rest = rest > 1e-12
+        rest_safe = np.where(has_rest, rest, 1.0)
+        rest_dx = px - (own_mass * cx[own] - m * px) / rest_safe
+        rest_dy = py - (own_mass * cy[own] - m * py) / rest_safe
+        f = np.where(has_rest, rest, 0.0) / (rest_dx * rest_dx + rest_dy * rest_dy + 1e-9)
+        fx += rest_dx * f
+        fy += rest_dy * f
+        force[part, 0] = k2 * m * fx
+        force[part, 1] = k2 * m * fy
+    return force
+
+
+def force_layout(pos: np.ndarray, src: np.ndarray, dst: np.ndarray, weight: np.ndarray,
+                 mass: np.ndarray, iterations: int, temperature: float, k: float = 1.0,
+                 gravity: float = 0.3) -> np.ndarray:
+    """Fruchterman-Reingold 迭代（引力 w · d² / k，带质量的斥力，温度线性下降）"""
+    pos = pos.astype(np.float64, copy=True)
+    n = len(pos)
+    if n < 2:
+        return pos
+    for step in range(iterations):
+        t = temperature * (1 - step / iterations)
+        force = _repulsion(pos, mass, k * k)
+        if len(src):
+            delta = pos[dst] - pos[src]
+            d = np.sqrt((delta ** 2).sum(1)) + 1e-9
+            pull = delta * (weight * d / k)[:, None]
+            force[:, 0] += np.bincount(src, weights=pull[:, 0], minlength=n)
+            force[:, 1] += np.bincount(src, weights=pull[:, 1], minlength=n)
+        # 弱向心力，避免孤立的连通分量飘远
+        force -= gravity * mass[:, None] * pos
+        length = np.sqrt((force ** 2).sum(1)) + 1e-9
+        pos += force * (np.minimum(length, t) / length)[:, None]
+    return pos
+
+
+def _spiral(pos_parent: np.ndarray, parent: np.ndarray, mass: np.ndarray, k: float) -> np.ndarray:
+    """下级放在上级位置周围的向日葵螺旋上：质量大的靠近中心，螺旋面积与累计质量成正比"""
+    order = np.lexsort((-mass, parent))
+    sorted_parent = parent[order]
+    group_start = np.searchsorted(sorted_parent, sorted_parent, side="left")
+    cumulative = np.cumsum(mass[order])
+    before = cumulative - mass[order] - (cumulative[group_start] - mass[order][group_start])
+    rank = np.arange(len(order)) - group_start
+    radius = np.sqrt(before + mass[order] / 2) * k
+    angle = rank * GOLDEN_ANGLE
+    pos = np.empty((len(parent), 2))
+    pos[order, 0] = pos_parent[sorted_parent, 0] + radius * np.cos(angle)
+    pos[order, 1] = pos_parent[sorted_parent, 1] + radius * np.sin(angle)
+    return pos
+
+
+def pack_components(pos: np.ndarray, src: np.ndarray, dst: np.ndarray, margin: float = 1.0) -> np.ndarray:
+    """各连通分量整体平移：最大的分量居中，其余按规模从大到小排在它外围的向日葵螺旋上
+
+    力导向只能让相连的节点聚在一起；孤立的小分量只受斥力与向心力作用，会被推到远离主体的地方。
+    """
+    n = len(pos)
+    graph = sp.csr_matrix((np.ones(len(src)), (src, dst)), shape=(n, n))
+    count, labels = connected_components(graph, directed=False)
+    if count < 2:
+        return pos
+    size = np.bincount(labels, minlength=count)
+    center = np.stack([np.bincount(labels, weights=pos[:, d], minlength=count) for d in range(2)], axis=1)
+    center /= size[:, None]
+    radius = np.zeros(count)
+    np.maximum.at(radius, labels, np.sqrt(((pos - center[labels]) ** 2).sum(1)))
+    order = np.argsort(-size, kind="stable")
+    # 面积按 (半径 + 间距)² 累计，与 _spiral 的做法相同
+    area = (radius[order] + margin) ** 2
+    before = np.cumsum(area) - area
+    rank = np.arange(count)
+    distance = np.where(rank == 0, 0.0, np.sqrt(before + area / 2) + radius[order][0] * 0.1)
+    target = np.empty((count, 2))
+    target[order, 0] = distance * np.cos(rank * GOLDEN_ANGLE)
+    target[order, 1] = distance * np.sin(rank * GOLDEN_ANGLE)
+    return pos + (target - center)[labels]
+
+
+def scale_to_spacing(pos: np.ndarray, spacing: float, sample: int = 20000, seed: int = 0) -> np.ndarray:
+    """缩放坐标，使节点到最近邻的距离中位数为 spacing（节点较多时抽样估计）"""
+    if len(pos) < 2:
+        return pos * spacing
+    tree = cKDTree(pos)
+    rows = pos if len(pos) <= sample else pos[np.random.default_rng(seed).choice(len(pos), sample, replace=False)]
+    nearest = tree.query(rows, k=2)[0][:, 1]
+    typical = float(np.median(nearest[nearest > 0])) if (nearest > 0).any() else 1.0
+    return pos * (spacing / typical)
+
+
+def compute_layout(store: GraphStore, parents: List[np.ndarray], iterations: int = 30,
+                   seed: int = 0) -> np.ndarray:
+    """多层力导向布局，返回每个节点的坐标（理想边长为 1）"""
+    n = store.num_nodes
+    if n == 0:
+        return np.zeros((0, 2))
+    src, dst, weight = _undirected(store)
+    # 每一层的边与质量（所含节点数）
+    level_edges = [(src, dst, weight)]
+    level_mass = [np.ones(n)]
+    for labels in parents:
+        s, d, w = level_edges[-1]
+        k = int(labels.max()) + 1
+        cs, cd, cw = _coarsen(labels.astype(np.int64), k, s, d, w)
+        # 簇之间的边可能合并了成百上千条，取对数避免引力压倒斥力
+        level_edges.append((cs, cd, np.log1p(cw)))
+        level_mass.append(np.bincount(labels, weights=level_mass[-1], minlength=k))
+
+    top = len(parents)
+    mass = level_mass[top]
+    rng = np.random.default_rng(seed)
+    # 顶层：从向日葵螺旋出发充分迭代
+    pos = _spiral(np.zeros((1, 2)), np.zeros(len(mass), dtype=np.int64), mass, 1.0)
+    pos += rng.normal(scale=0.01, size=pos.shape)
+    spread = math.sqrt(float(mass.sum()))
+    pos = force_layout(pos, *level_edges[top], mass, iterations=max(iterations, 200), temperature=spread / 4)
+    for level in range(top - 1, -1, -1):
+        mass = level_mass[level]
+        pos = _spiral(pos, parents[level].astype(np.int64), mass, 1.0)
+        pos += rng.normal(scale=0.01, size=pos.shape)
+        # 越往下节点越多，迭代次数越少：只做局部微调
+        steps = max(iterations, min(200, int(iterations * 2000 / len(mass))))
+        pos = force_layout(pos, *level_edges[level], mass, iterations=steps,
+                           temperature=max(2.0, float(np.sqrt(mass.max()))))
+    pos = pack_components(pos, src, dst)
+    return pos - pos.mean(0)
+
+
+class GraphLayout:
+    """某一图谱版本的节点坐标与社区层级（后台线程计算，算完之前 is_ready() 为 False）
+
+    簇的编号形如 c{层}:{序号}；簇的坐标是其全部节点坐标的均值。
+    """
+
+    def __init__(self, store: GraphStore, iterations: int = 30, spacing: float = 100.0,
+                 max_cluster_size: int = 200, top_clusters: int = 50, seed: int = 0):
+        self.store = store
+        self.iterations = iterations
+        # 相邻节点的典型间距（前端坐标单位，即像素）
+        self.spacing = spacing
+        self.max_cluster_size = max(2, max_cluster_size)
+        self.top_clusters = max(1, top_clusters)
+        self.seed = seed
+        self._positions: Optional[np.ndarray] = None
+        self._parents: List[np.ndarray] = []
+        self._membership: Optional[List[np.ndarray]] = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        # 被更新的版本取代后，尚未开始的计算直接放弃
+        self._superseded = threading.Event()
+
+    def start(self, after: Optional[threading.Thread] = None):
+        """在后台线程计算；after 为上一版本的计算线程，等它结束后再开始"""
+        self._thread = threading.Thread(target=self._compute, args=(after,), daemon=True, name="layout")
+        self._thread.start()
+
+    def _compute(self, after: Optional[threading.Thread] = None):
+        if after is not None:
+            after.join()
+        if self._superseded.is_set():
+            return
+        start = time.perf_counter()
+        parents = cluster_hierarchy(self.store, self.max_cluster_size, self.top_clusters, self.seed)
+        positions = compute_layout(self.store, parents, self.iterations, self.seed)
+        positions = scale_to_spacing(positions, self.spacing, seed=self.seed)
+        self._set(positions.astype(np.float32), parents)
+        print(f"图谱布局计算完成：{self.store.num_nodes} 个节点，{len(parents)} 层聚类，"
+              f"耗时 {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    def _set(self, positions: np.ndarray, parents: List[np.ndarray]):
+        with self._lock:
+            self._positions, self._parents, self._membership = positions, parents, None
+        self._ready.set()
+
+    def is_ready(self) -> bool:
+        return self._ready.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._ready.wait(timeout)
+
+    @property
+    def positions(self) -> Optional[np.ndarray]:
+        """(节点数, 2) 的坐标数组，未算完时为 None"""
+        return self._positions
+
+    @property
+    def num_levels(self) -> int:
+        """簇的层数（不含第 0 层的节点）"""
+        return len(self._parents)
+
+    def coordinates(self, node: int) -> Dict:
+        """节点坐标 {"x", "y"}，未算完时为空字典"""
+        positions = self._positions
+        if positions is None:
+            return {}
+        return {"x": round(float(positions[node, 0]), 1), "y": round(float(positions[node, 1]), 1)}
+
+    def updated(self, store: GraphStore, touched: np.ndarray) -> "GraphLayout":
+        """图谱增量更新后的布局：已有节点的坐标与所属簇不变，新节点放在已有邻居的中心附近、加入权重最大的邻居所在的簇
+
+        旧版本尚未算完时，新版本在后台重新计算。
+        """
+        layout = GraphLayout(store, self.iterations, self.spacing, self.max_cluster_size,
+                             self.top_clusters, self.seed)
+        self._superseded.set()
+        if not self.is_ready():
+            layout.start(after=self._thread)
+            return layout
+        with self._lock:
+            old_positions, old_parents = self._positions, self._parents
+        n_old, n = len(old_positions), store.num_nodes
+        positions = np.concatenate([old_positions, np.zeros((n - n_old, 2), dtype=np.float32)])
+        parents = list(old_parents)
+        if parents:
+            parents[0] = np.concatenate([parents[0], np.zeros(n - n_old, dtype=np.int32)])
+        rng = np.random.default_rng(self.seed + n)
+        placed = np.zeros(n, dtype=bool)
+        placed[:n_old] = True
+        # 新节点之间也可能相连：按编号顺序放置，后放的可以参考先放的
+        for node in range(n_old, n):
+            neighbors, weights = [], []
+            for indptr, indices, node_weights in ((store.out_indptr, store.out_indices, store.out_weights),
+                                                  (store.in_indptr, store.in_indices, store.in_weights)):
+                lo, hi = int(indptr[node]), int(indptr[node + 1])
+                neighbors.append(indices[lo:hi])
+                weights.append(node_weights[lo:hi])
+            neighbors, weights = np.concatenate(neighbors).astype(np.int64), np.concatenate(weights)
+            known = placed[neighbors]
+            neighbors, weights = neighbors[known], weights[known]
+            if len(neighbors):
+                center = positions[neighbors].mean(0)
+                if parents:
+                    parents[0][node] = parents[0][neighbors[int(np.argmax(weights))]]
+            else:
+                center = np.zeros(2)
+                if parents:
+                    # 没有已放置的邻居：在第 1 层单独成簇，挂在第 2 层的最后一个簇下；更高层的簇数不变
+                    if len(parents) > 1:
+                        parents[0][node] = len(parents[1])
+                        parents[1] = np.concatenate([parents[1], [int(parents[1].max())]]).astype(np.int32)
+                    else:
+                        parents[0][node] = int(parents[0].max()) + 1
+            positions[node] = center + rng.normal(scale=self.spacing, size=2)
+            placed[node] = True
+        layout._set(positions, parents)
+        return layout
+
+    # ---------- 共享内存 ----------
+
+    def shared_arrays(self) -> Dict[str, np.ndarray]:
+        """坐标与社区层级（已算完时），供发布到共享内存"""
+        with self._lock:
+            if self._positions is None:
+                return {}
+            lengths = [len(p) for p in self._parents]
+            return {
+                "layout_positions": self._positions,
+                "layout_parents": (np.concatenate(self._parents) if self._parents
+                                   else np.zeros(0, dtype=np.int32)),
+                "layout_parent_offsets": np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64),
+            }
+
+    def attach(self, positions: np.ndarray, parents: np.ndarray, offsets: np.ndarray):
+        """使用已算好的布局（来自共享内存），不在本进程重新计算"""
+        self._set(positions, [parents[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)])
+
+    # ---------- 簇视图 ----------
+
+    def _memberships(self) -> List[np.ndarray]:
+        """membership[l][v]：节点 v 在第 l 层所属的簇（第 0 层为节点自身）"""
+        with self._lock:
+            if self._membership is None:
+                membership = [np.arange(self.store.num_nodes, dtype=np.int64)]
+                for labels in self._parents:
+                    membership.append(labels.astype(np.int64)[membership[-1]])
+                self._membership = membership
+            return self._membership
+
+    @staticmethod
+    def parse_cluster_id(cluster: str):
+        """"c{层}:{序号}" -> (层, 序号)"""
+        try:
+            if not cluster.startswith("c"):
+                raise ValueError
+            level, index = cluster[1:].split(":")
+            return int(level), int(index)
+        except ValueError:
+            raise ValueError(f"无效的簇编号：{cluster}")
+
+    def _cluster_nodes(self, level: int, ids: np.ndarray, membership: List[np.ndarray]) -> List[Dict]:
+        """第 level 层若干簇的超级节点：节点数、坐标（成员坐标均值），名称取其中度最大的节点"""
+        store = self.store
+        names = store.nodes
+        if level == 0:
+            return [{"id": str(names[i]), "label": str(names[i]), **self.coordinates(i)} for i in ids.tolist()]
+        members = membership[level]
+        k = int(members.max()) + 1 if len(members) else 0
+        size = np.bincount(members, minlength=k)
+        x = np.bincount(members, weights=self._positions[:, 0], minlength=k) / np.maximum(size, 1)
+        y = np.bincount(members, weights=self._positions[:, 1], minlength=k) / np.maximum(size, 1)
+        children = np.bincount(self._parents[level - 1], minlength=k)
+        # 每个簇中度最大的节点作为代表
+        order = np.lexsort((-store.degree, members))
+        first = np.full(k, -1, dtype=np.int64)
+        sorted_members = members[order]
+        starts = np.r_[True, sorted_members[1:] != sorted_members[:-1]]
+        first[sorted_members[starts]] = order[starts]
+        nodes = []
+        for c in ids.tolist():
+            representative = str(names[int(first[c])])
+            count = int(size[c])
+            nodes.append({
+                "id": f"c{level}:{c}",
+                "label": representative if count == 1 else f"{representative} 等 {count} 个",
+                "cluster": True,
+                "level": level,
+                "size": count,
+                "children": int(children[c]),
+                "x": round(float(x[c]), 1),
+                "y": round(float(y[c]), 1),
+            })
+        return nodes
+
+    def _node_id(self, level: int, index: int) -> str:
+        return str(self.store.nodes[index]) if level == 0 else f"c{level}:{index}"
+
+    def cluster_view(self, level: Optional[int] = None, parent: Optional[str] = None,
+                     max_edges: int = 2000) -> Dict:
+        """聚合视图
+
+        parent 为空时返回第 level 层（默认顶层）的全部簇及簇之间的聚合边；
+        parent 为某个簇时返回它的直接下级，以及下级之间、下级与同层其他簇之间的聚合边（用于展开）。
+        聚合边带 count（原始边数）与 weight（权重和），按 count 从大到小最多返回 max_edges 条。
+        """
+        if not self.is_ready():
+            raise RuntimeError("布局尚未计算完成")
+        store = self.store
+        membership = self._memberships()
+        top = self.num_levels
+        src = np.repeat(np.arange(store.num_nodes, dtype=np.int64), store.out_degree)
+        dst = store.out_indices.astype(np.int64)
+        relation = store.out_relations
+        weights = store.out_weights.astype(np.int64)
+
+        if parent is None:
+            level = top if level is None else max(0, min(int(level), top))
+            ids = np.unique(membership[level])
+            cs, cd = membership[level][src], membership[level][dst]
+            from_level = to_level = np.full(len(src), level)
+        else:
+            parent_level, parent_index = self.parse_cluster_id(parent)
+            if not 1 <= parent_level <= top or not 0 <= parent_index <= int(membership[parent_level].max()):
+                raise KeyError(parent)
+            level = parent_level - 1
+            in_parent = membership[parent_level] == parent_index
+            ids = np.unique(membership[level][in_parent])
+            # 至少一端在该簇内的边：簇内一端映射到下级，簇外一端映射到同层的其他簇
+            touching = np.nonzero(in_parent[src] | in_parent[dst])[0]
+            src, dst, relation, weights = src[touching], dst[touching], relation[touching], weights[touching]
+            src_in, dst_in = in_parent[src], in_parent[dst]
+            cs = np.where(src_in, membership[level][src], membership[parent_level][src])
+            cd = np.where(dst_in, membership[level][dst], membership[parent_level][dst])
+            from_level = np.where(src_in, level, parent_level)
+            to_level = np.where(dst_in, level, parent_level)
+
+        nodes = self._cluster_nodes(level, ids, membership)
+        edges = []
+        aggregate = ~((from_level == to_level) & (cs == cd))
+        if level == 0:
+            # 节点之间是原始边，照常给出关系；与其他簇之间的边仍然聚合
+            direct = (from_level == 0) & (to_level == 0)
+            aggregate &= ~direct
+            names, relations = store.nodes, store.relations
+            direct = np.nonzero(direct)[0]
+            for i in direct[np.argsort(-weights[direct], kind="stable")][:max_edges].tolist():
+                edges.append({"from": str(names[int(cs[i])]), "to": str(names[int(cd[i])]),
+                              "label": str(relations[int(relation[i])]), "weight": int(weights[i]), "count": 1})
+        # 聚合边：(起点层, 起点, 终点层, 终点) 相同的边合并
+        if aggregate.any():
+            stacked = np.stack([from_level[aggregate], cs[aggregate], to_level[aggregate], cd[aggregate]], axis=1)
+            groups, inverse = np.unique(stacked, axis=0, return_inverse=True)
+            inverse = inverse.ravel()
+            count = np.bincount(inverse)
+            total = np.bincount(inverse, weights=weights[aggregate])
+            for g in np.argsort(-count, kind="stable")[:max(max_edges - len(edges), 0)].tolist():
+                fl, f, tl, t = (int(v) for v in groups[g])
+                edges.append({"from": self._node_id(fl, f), "to": self._node_id(tl, t),
+                              "label": f"{int(count[g])} 条", "weight": int(total[g]), "count": int(count[g])})
+        return {"level": level, "levels": top, "parent": parent, "nodes": nodes, "edges": edges}
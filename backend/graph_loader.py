@@ -0,0 +1,257 @@
+"""知识图谱数据加载：向量化读取 CSV，并缓存为二进制快照（.npz）
+
+快照保存驻留后的节点名（UTF-8 字符串表）、边的整数数组、字典编码的关系与权重，
+以 CSV 的 mtime / 大小 / 内容哈希作为失效依据。命令行预构建快照：
+
+    python graph_loader.py data/frontend_knowledge.csv
+"""
+import argparse
+import hashlib
+import os
+import time
+import zipfile
+from typing import List, Optional
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+# 快照格式版本，结构变化时递增，旧快照自动失效
+SNAPSHOT_FORMAT = 1
+
+
+def file_sha1(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def encode_strings(strings: List[str]):
+    """字符串表：UTF-8 拼接后的字节数组 + 偏移数组"""
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    if encoded:
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    return blob, offsets
+
+
+def decode_strings(blob: np.ndarray, offsets: np.ndarray) -> List[str]:
+    data = blob.tobytes()
+    bounds = offsets.tolist()
+    return [data[bounds[i]:bounds[i + 1]].decode("utf-8") for i in range(len(bounds) - 1)]
+
+
+class EdgeArrays:
+    """图谱的紧凑数组表示：节点名按首次出现顺序编号，边为 (src, dst) 整数对"""
+
+    def __init__(self, nodes: List[str], src: np.ndarray, dst: np.ndarray,
+                 relations: List[str], relation_codes: np.ndarray, weights: np.ndarray):
+        self.nodes = nodes
+        self.src = src
+        self.dst = dst
+        self.relations = relations
+        self.relation_codes = relation_codes
+        self.weights = weights
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.src)
+
+    @classmethod
+    def from_csv(cls, data_path: str) -> "EdgeArrays":
+        """向量化读取 CSV：清洗、去重（同一条边以最后一行为准）、驻留节点名"""
+        df = pd.read_csv(data_path, encoding='utf-8-sig', dtype=str, keep_default_na=False, na_values=[""])
+        df.columns = df.columns.str.strip()
+        missing = {"source", "target"} - set(df.columns)
+        if missing:
+            raise ValueError(f"{data_path} 缺少必要的列：{', '.join(sorted(missing))}")
+        # 删除空行
+        df = df.dropna(subset=['source', 'target'])
+        df['source'] = df['source'].str.strip()
+        df['target'] = df['target'].str.strip()
+        df = df[(df['source'] != '') & (df['target'] != '')]
+        # 权重处理
+        if 'weight' in df.columns:
+            df['weight'] = pd.to_numeric(df['weight'], errors='coerce').fillna(1).astype(np.int64)
+        else:
+            df['weight'] = 1
+        if 'relation' in df.columns:
+            df['relation'] = df['relation'].fillna('')
+        else:
+            df['relation'] = ''
+
+        # 重复的边：保留第一次出现的位置、最后一次出现的属性（与逐行 add_edge 的效果一致）
+        keys = ['source', 'target']
+        order = df.drop_duplicates(keys, keep='first')[keys]
+        df = order.merge(df.drop_duplicates(keys, keep='last'), on=keys, how='left')
+
+        # 交错排列 source/target，按首次出现顺序编号，与逐条加边时节点的插入顺序一致
+        interleaved = np.empty(len(df) * 2, dtype=object)
+        interleaved[0::2] = df['source'].to_numpy()
+        interleaved[1::2] = df['target'].to_numpy()
+        codes, uniques = pd.factorize(interleaved)
+        relation_codes, relation_uniques = pd.factorize(df['relation'].to_numpy())
+        return cls(
+            nodes=list(uniques),
+            src=codes[0::2].astype(np.int32),
+            dst=codes[1::2].astype(np.int32),
+            relations=list(relation_uniques),
+            relation_codes=relation_codes.astype(np.int32),
+            weights=df['weight'].to_numpy().astype(np.int32),
+        )
+
+    @classmethod
+    def from_digraph(cls, G: nx.DiGraph) -> "EdgeArrays":
+        """从 networkx 图导出（边按 G.edges 的顺序）"""
+        nodes = list(G.nodes)
+        index = {name: i for i, name in enumerate(nodes)}
+        relations: dict = {}
+        src, dst, rel, weights = [], [], [], []
+        for u, v, data in G.edges(data=True):
+            src.append(index[u])
+            dst.append(index[v])
+            rel.append(relations.setdefault(str(data.get('relation', '')), len(relations)))
+            weights.append(int(data.get('weight', 1)))
+        return cls(
+            nodes=nodes,
+            src=np.array(src, dtype=np.int32),
+            dst=np.array(dst, dtype=np.int32),
+            relations=list(relations),
+            relation_codes=np.array(rel, dtype=np.int32),
+            weights=np.array(weights, dtype=np.int32),
+        )
+
+    def save(self, path: str, meta: dict):
+        node_blob, node_offsets = encode_strings(self.nodes)
+        rel_blob, rel_offsets = encode_strings(self.relations)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                np.savez(
+                    f,
+                    format=np.int64(SNAPSHOT_FORMAT),
+                    csv_sha1=np.array(meta["csv_sha1"]),
+                    csv_mtime=np.float64(meta["csv_mtime"]),
+                    csv_size=np.int64(meta["csv_size"]),
+                    node_blob=node_blob, node_offsets=node_offsets,
+                    rel_blob=rel_blob, rel_offsets=rel_offsets,
+                    src=self.src, dst=self.dst,
+                    relation_codes=self.relation_codes, weights=self.weights,
+                )
+                f.flush()
+                os.fsync(f.fileno())
+            # 写完整后原子替换，避免并发启动的 worker 或中断的预构建留下半个文件
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: str) -> "EdgeArrays":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                nodes=decode_strings(data["node_blob"], data["node_offsets"]),
+                src=data["src"], dst=data["dst"],
+                relations=decode_strings(data["rel_blob"], data["rel_offsets"]),
+                relation_codes=data["relation_codes"], weights=data["weights"],
+            )
+
+    def to_digraph(self, G: Optional[nx.DiGraph] = None) -> nx.DiGraph:
+        """批量写入 networkx 图"""
+        G = nx.DiGraph() if G is None else G
+        nodes = self.nodes
+        relations = self.relations
+        G.add_nodes_from(nodes)
+        G.add_edges_from(
+            (nodes[u], nodes[v], {"relation": relations[r], "weight": w})
+            for u, v, r, w in zip(self.src.tolist(), self.dst.tolist(),
+                                  self.relation_codes.tolist(), self.weights.tolist())
+        )
+        return G
+
+
+def snapshot_path(data_path: str, cache_dir: Optional[str] = None) -> str:
+    cache_dir = cache_dir or os.path.join(os.path.dirname(os.path.abspath(data_path)), ".cache")
+    return os.path.join(cache_dir, os.path.basename(data_path) + ".graph.npz")
+
+
+def _read_meta(path: str) -> Optional[dict]:
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            if int(data["format"]) != SNAPSHOT_FORMAT:
+                return None
+            return {
+                "csv_sha1": str(data["csv_sha1"]),
+                "csv_mtime": float(data["csv_mtime"]),
+                "csv_size": int(data["csv_size"]),
+            }
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+        return None
+
+
+def _save_snapshot(arrays: EdgeArrays, data_path: str, stat: os.stat_result, path: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    arrays.save(path, {
+        "csv_sha1": file_sha1(data_path),
+        "csv_mtime": stat.st_mtime,
+        "csv_size": stat.st_size,
+    })
+
+
+def build_snapshot(data_path: str, cache_dir: Optional[str] = None) -> str:
+    """解析 CSV 并写出快照，返回快照路径"""
+    stat = os.stat(data_path)
+    path = snapshot_path(data_path, cache_dir)
+    _save_snapshot(EdgeArrays.from_csv(data_path), data_path, stat, path)
+    return path
+
+
+def load_edge_arrays(data_path: str, use_cache: bool = True,
+                     cache_dir: Optional[str] = None) -> EdgeArrays:
+    """优先读取有效的快照，否则解析 CSV 并（在允许时）写出新快照
+
+    mtime 与大小一致时直接使用快照；不一致时再比较内容哈希，只是被 touch 过的文件不会触发重建。
+    """
+    start = time.perf_counter()
+    stat = os.stat(data_path)
+    path = snapshot_path(data_path, cache_dir)
+    if use_cache:
+        meta = _read_meta(path)
+        valid = meta is not None and meta["csv_size"] == stat.st_size and (
+            meta["csv_mtime"] == stat.st_mtime or meta["csv_sha1"] == file_sha1(data_path)
+        )
+        if valid:
+            try:
+                arrays = EdgeArrays.load(path)
+            except (OSError, KeyError, ValueError, zipfile.BadZipFile) as e:
+                # 快照损坏时退回解析 CSV，并在下面重新写出快照
+                print(f"图谱快照损坏，重新解析 CSV：{e}")
+            else:
+                print(f"图谱快照加载完成：{path}，{len(arrays.nodes)} 个节点，{arrays.num_edges} 条边，"
+                      f"耗时 {(time.perf_counter() - start) * 1000:.1f} ms")
+                return arrays
+
+    arrays = EdgeArrays.from_csv(data_path)
+    print(f"CSV 解析完成：{data_path}，{len(arrays.nodes)} 个节点，{arrays.num_edges} 条边，"
+          f"耗时 {(time.perf_counter() - start) * 1000:.1f} ms")
+    if use_cache:
+        try:
+            _save_snapshot(arrays, data_path, stat, path)
+        except OSError as e:
+            # 快照只是加速手段，写不进去不影响服务
+            print(f"图谱快照写入失败：{e}")
+    return arrays
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="预构建知识图谱二进制快照")
+    parser.add_argument("data_path", nargs="?", default="data/frontend_knowledge.csv", help="知识图谱 CSV 路径")
+    parser.add_argument("--cache-dir", default=None, help="快照目录（默认 CSV 同级的 .cache/）")
+    args = parser.parse_args()
+    t0 = time.perf_counter()
+    out = build_snapshot(args.data_path, args.cache_dir)
+    print(f"快照已写入 {out}，耗时 {(time.perf_counter() - t0) * 1000:.1f} ms")
@@ -0,0 +1,186 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import networkx as nx
+import numpy as np
+
+from graph_store import GraphStore
+
+RANK_METHODS = ("degree", "weighted_degree", "pagerank", "betweenness")
+
+
+def pagerank(store: GraphStore, damping: float = 0.85, max_iter: int = 100, tol: float = 1e-6) -> np.ndarray:
+    """按边权重加权的 PageRank（幂迭代，全部为向量化运算）"""
+    n = store.num_nodes
+    if n == 0:
+        return np.zeros(0)
+    src = np.repeat(np.arange(n), store.out_degree)
+    dst = store.out_indices
+    weights = store.out_weights.astype(np.float64)
+    out_weight = np.bincount(src, weights=weights, minlength=n)
+    dangling = out_weight == 0
+    # 每条边上的转移概率
+    transition = weights / np.where(dangling, 1, out_weight)[src]
+    x = np.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        spread = np.bincount(dst, weights=x[src] * transition, minlength=n)
+        x_new = damping * (spread + x[dangling].sum() / n) + (1 - damping) / n
+        if np.abs(x_new - x).sum() < n * tol:
+            return x_new
+        x = x_new
+    return x
+
+
+class GraphRankings:
+    """某一图谱版本的节点排名：度、加权度、PageRank、介数中心性
+
+    排名以排好序的节点编号数组保存，Top-K 只需切片；
+    度在构建时计算，加权度与 PageRank 首次使用时计算，介数中心性在后台线程计算。
+    图谱增量更新时用 updated() 生成新版本的排名，度排序只重排受影响的节点。
+    """
+
+    def __init__(self, store: GraphStore, betweenness_samples: int = 256, max_views: int = 32,
+                 degree_order: Optional[np.ndarray] = None):
+        self.store = store
+        self.betweenness_samples = betweenness_samples
+        self.max_views = max_views
+        if degree_order is None:
+            degree_order = np.argsort(-store.degree, kind="stable")
+        self._scores: Dict[str, np.ndarray] = {"degree": store.degree}
+        self._orders: Dict[str, np.ndarray] = {"degree": degree_order}
+        self._views: "OrderedDict[tuple, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        # 任一排名（例如后台算完的介数中心性）变化时递增，用作缓存键的一部分
+        self.generation = 0
+        self._betweenness_thread = None
+        # 被更新的版本取代后，尚未开始的介数中心性计算直接放弃
+        self._superseded = threading.Event()
+
+    def start_betweenness(self, after: Optional[threading.Thread] = None):
+        """在后台线程计算介数中心性；after 为上一版本的计算线程，等它结束后再开始，避免多个计算同时进行"""
+        self._betweenness_thread = threading.Thread(
+            target=self._compute_betweenness, args=(after,), daemon=True, name="betweenness"
+        )
+        self._betweenness_thread.start()
+
+    def _compute_betweenness(self, after: Optional[threading.Thread] = None):
+        if after is not None:
+            after.join()
+        if self._superseded.is_set():
+            return
+        store = self.store
+        n = store.num_nodes
+        # 在只读存储上单独建图，不与可编辑的 networkx 图共享
+        G = nx.DiGraph()
+        G.add_nodes_from(range(n))
+        G.add_edges_from(zip(np.repeat(np.arange(n), store.out_degree).tolist(), store.out_indices.tolist()))
+        # 节点较多时按固定种子抽样近似，避免 O(VE) 的全量计算
+        k = None if n <= self.betweenness_samples else self.betweenness_samples
+        centrality = nx.betweenness_centrality(G, k=k, seed=0)
+        scores = np.array([centrality.get(i, 0.0) for i in range(n)])
+        self._set("betweenness", scores)
+
+    def updated(self, store: GraphStore, touched: np.ndarray) -> "GraphRankings":
+        """图谱增量更新后的排名：未受影响的节点保持原有相对顺序，只把变化的节点重新插入
+
+        加权度与 PageRank 在新版本首次使用时重新计算；介数中心性先沿用旧值，后台重新计算。
+        """
+        n = store.num_nodes
+        old_order = self._orders["degree"]
+        changed = np.union1d(np.asarray(touched, dtype=np.int64), np.arange(len(old_order), n))
+        is_changed = np.zeros(n, dtype=bool)
+        is_changed[changed] = True
+        kept = old_order[~is_changed[old_order]]
+        # 排序键 (-度, 编号)，与 argsort(-degree, kind="stable") 的顺序一致
+        key = lambda ids: -store.degree[ids].astype(np.int64) * n + ids
+        moved = changed[np.argsort(key(changed), kind="stable")]
+        order = np.insert(kept, np.searchsorted(key(kept), key(moved)), moved)
+
+        rankings = GraphRankings(store, self.betweenness_samples, self.max_views, degree_order=order)
+        with self._lock:
+            stale = self._scores.get("betweenness")
+        if stale is not None:
+            rankings._set("betweenness", np.concatenate([stale, np.zeros(n - len(stale))]))
+        self._superseded.set()
+        rankings.start_betweenness(after=self._betweenness_thread)
+        return rankings
+
+    def shared_arrays(self) -> Dict[str, np.ndarray]:
+        """度排序与（已算完的）介数中心性，供发布到共享内存"""
+        with self._lock:
+            arrays = {"degree_order": self._orders["degree"]}
+            if "betweenness" in self._scores:
+                arrays["betweenness"] = self._scores["betweenness"]
+                arrays["betweenness_order"] = self._orders["betweenness"]
+        return arrays
+
+    def attach_betweenness(self, scores: np.ndarray, order: np.ndarray):
+        """使用已算好的介数中心性（来自共享内存），不在本进程重新计算"""
+        with self._lock:
+            self._scores["betweenness"] = scores
+            self._orders["betweenness"] = order
+            self._views.clear()
+            self.generation += 1
+
+    def _set(self, method: str, scores: np.ndarray):
+        order = np.argsort(-scores, kind="stable")
+        with self._lock:
+            self._scores[method] = scores
+            self._orders[method] = order
+            # 排名变化后缓存的子图作废
+            self._views.clear()
+            self.generation += 1
+
+    def is_ready(self, method: str) -> bool:
+        return method in self._orders
+
+    def _ensure(self, method: str):
+        if method in self._orders or method == "betweenness":
+            return
+        store = self.store
+        if method == "weighted_degree":
+            n = store.num_nodes
+            weights = store.out_weights.astype(np.float64)
+            src = np.repeat(np.arange(n), store.out_degree)
+            # 出边权重和 + 入边权重和
+            scores = (np.bincount(src, weights=weights, minlength=n)
+                      + np.bincount(store.out_indices, weights=weights, minlength=n)).astype(np.int64)
+        elif method == "pagerank":
+            scores = pagerank(store)
+        else:
+            raise ValueError(f"不支持的排序方式：{method}")
+        self._set(method, scores)
+
+    def resolve(self, method: str) -> str:
+        """实际使用的排序方式：介数中心性未算完时退回度排序"""
+        if method not in RANK_METHODS:
+            raise ValueError(f"不支持的排序方式：{method}")
+        self._ensure(method)
+        return method if method in self._orders else "degree"
+
+    def top(self, method: str, k: int):
+        """Top-K 节点编号与得分"""
+        method = self.resolve(method)
+        ids = self._orders[method][:k]
+        return method, ids, self._scores[method][ids]
+
+    def top_view(self, method: str, k: int, build) -> Dict:
+        """缓存每个 (排序方式, K) 的子图结果，build(method, ids, scores) 负责生成"""
+        method = self.resolve(method)
+        with self._lock:
+            key = (method, k, self.generation)
+            ids, scores = self._orders[method][:k], self._scores[method]
+            view = self._views.get(key)
+            if view is not None:
+                self._views.move_to_end(key)
+                return view
+        view = build(method, ids, scores[ids])
+        with self._lock:
+            # 构建期间排名已变化时不缓存，下次请求按新排名重新生成
+            if key[2] != self.generation:
+                return view
+            self._views[key] = view
+            while len(self._views) > self.max_views:
+                self._views.popitem(last=False)
+        return view
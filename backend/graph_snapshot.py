@@ -0,0 +1,182 @@
+import gzip
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional
+
+from metrics import SNAPSHOT_CACHE, stage
+
+try:
+    import orjson
+except ImportError:  # 未安装 orjson 时退回标准库
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # 未安装 brotli 时只提供 gzip
+    brotli = None
+
+
+def dumps(obj) -> bytes:
+    """把对象编码为 UTF-8 JSON 字节串，优先使用 orjson"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+# 压缩编码在 ETag 中的后缀
+ENCODING_TAGS = {"gzip": "gz", "br": "br"}
+
+
+class GraphSnapshot:
+    """某一图谱版本下预先编码好的响应体（不可变）
+
+    body 为完整的 JSON 响应字节串，gzip / br 压缩版本在第一次需要时生成并复用。
+    每种编码是不同的表示，各有自己的强 ETag（压缩版本在基础 ETag 后加 -gz / -br）。
+    """
+
+    __slots__ = ("version", "body", "etag", "_encoded", "_lock")
+
+    def __init__(self, version: str, body: bytes):
+        self.version = version
+        self.body = body
+        self.etag = f'"{version}-{hashlib.sha1(body).hexdigest()[:16]}"'
+        self._encoded: Dict[str, bytes] = {"identity": body}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_payload(cls, version: str, payload) -> "GraphSnapshot":
+        return cls(version, dumps(payload))
+
+    @staticmethod
+    def available_encodings() -> Iterable[str]:
+        return ("br", "gzip") if brotli is not None else ("gzip",)
+
+    def encoded(self, encoding: str) -> bytes:
+        """返回指定编码（identity / gzip / br）的响应体"""
+        data = self._encoded.get(encoding)
+        if data is not None:
+            return data
+        with self._lock:
+            data = self._encoded.get(encoding)
+            if data is None:
+                if encoding == "gzip":
+                    data = gzip.compress(self.body, compresslevel=6, mtime=0)
+                elif encoding == "br" and brotli is not None:
+                    data = brotli.compress(self.body, quality=5)
+                else:
+                    raise ValueError(f"不支持的编码：{encoding}")
+                self._encoded[encoding] = data
+        return data
+
+    def negotiate(self, accept_encoding: Optional[str]) -> str:
+        """根据 Accept-Encoding 选择编码，优先 br，其次 gzip"""
+        accepted = set()
+        for token in (accept_encoding or "").split(","):
+            name, _, params = token.strip().partition(";")
+            params = params.replace(" ", "")
+            if params.startswith("q="):
+                try:
+                    if float(params[2:]) == 0:
+                        continue
+                except ValueError:
+                    continue
+            accepted.add(name.strip().lower())
+        for encoding in self.available_encodings():
+            if encoding in accepted or "*" in accepted:
+                return encoding
+        return "identity"
+
+    def etag_for(self, encoding: str) -> str:
+        """指定编码的响应体对应的 ETag"""
+        suffix = ENCODING_TAGS.get(encoding)
+        return f'{self.etag[:-1]}-{suffix}"' if suffix else self.etag
+
+    def matches(self, if_none_match: Optional[str], encoding: str = "identity") -> bool:
+        """If-None-Match 是否命中将要返回的编码的 ETag"""
+        if not if_none_match:
+            return False
+        etag = self.etag_for(encoding)
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag.startswith("W/"):
+                tag = tag[2:]
+            if tag == "*" or tag == etag:
+                return True
+        return False
+
+
+class EncodedArrays:
+    """由若干个 JSON 数组组成的对象（例如全量图谱的 nodes / edges），每个元素单独预编码
+
+    拼接结果与直接编码整个对象的字节完全相同；图谱增量更新时只需重新编码变化的元素。
+    """
+
+    def __init__(self, arrays: Dict[str, List[bytes]]):
+        self.arrays = arrays
+
+    @classmethod
+    def encode(cls, arrays: Dict[str, Iterable]) -> "EncodedArrays":
+        return cls({name: [dumps(item) for item in items] for name, items in arrays.items()})
+
+    def replace(self, **arrays: List[bytes]) -> "EncodedArrays":
+        """替换部分数组，其余数组与原对象共享"""
+        return EncodedArrays({**self.arrays, **arrays})
+
+    def dumps(self) -> bytes:
+        return b"{" + b",".join(
+            dumps(name) + b":[" + b",".join(parts) + b"]" for name, parts in self.arrays.items()
+        ) + b"}"
+
+
+class SnapshotStore:
+    """某一图谱版本的快照缓存（每个 GraphState 一个，版本切换时随旧 state 一起丢弃）"""
+
+    def __init__(self, max_entries: int = 32, version: str = ""):
+        self.max_entries = max_entries
+        self.version = version
+        self._snapshots: "OrderedDict[str, GraphSnapshot]" = OrderedDict()
+        self._lock = threading.Lock()
+        # 正在构建的快照各有一把锁：同一快照的并发请求只构建一次，不同快照互不阻塞
+        self._building: Dict[str, threading.Lock] = {}
+
+    def get(self, name: str, build: Callable[[], object]) -> GraphSnapshot:
+        """取出快照，不存在时调用 build() 生成响应数据（或已编码的字节串）并编码"""
+        snapshot = self._lookup(name)
+        if snapshot is not None:
+            return snapshot
+        with self._lock:
+            key_lock = self._building.setdefault(name, threading.Lock())
+        # 只在该快照自己的锁内构建，避免并发请求重复做 O(E) 的序列化，又不阻塞其他快照
+        with key_lock:
+            snapshot = self._lookup(name)
+            if snapshot is not None:
+                return snapshot
+            SNAPSHOT_CACHE.inc("miss")
+            snapshot = None
+            try:
+                with stage("snapshot_build"):
+                    payload = build()
+                with stage("json_serialize"):
+                    if isinstance(payload, bytes):
+                        snapshot = GraphSnapshot(self.version, payload)
+                    else:
+                        snapshot = GraphSnapshot.from_payload(self.version, payload)
+            finally:
+                # 先写入缓存再移除构建锁（同一把锁内完成），之后到达的请求一定能命中缓存
+                with self._lock:
+                    if snapshot is not None:
+                        self._snapshots[name] = snapshot
+                        while len(self._snapshots) > self.max_entries:
+                            self._snapshots.popitem(last=False)
+                    self._building.pop(name, None)
+            return snapshot
+
+    def _lookup(self, name: str) -> Optional[GraphSnapshot]:
+        with self._lock:
+            snapshot = self._snapshots.get(name)
+            if snapshot is not None:
+                self._snapshots.move_to_end(name)
+                SNAPSHOT_CACHE.inc("hit")
+            return snapshot
@@ -0,0 +1,36 @@
+from typing import Optional
+
+from entity_matcher import EntityMatcher
+from entity_search import EntitySearchIndex
+from graph_layout import GraphLayout
+from graph_rankings import GraphRankings
+from graph_snapshot import EncodedArrays, SnapshotStore
+from graph_store import GraphStore
+from learning_path import LearningPathPlanner
+from recommendations import RecommendationEngine
+
+
+class GraphState:
+    """某一图谱版本的全部只读数据：CSR 存储与派生索引
+
+    创建后不再修改（各自内部的惰性缓存除外）。图谱更新时生成新的 GraphState 并整体替换，
+    请求开始时取一次 kg.state，整个请求都使用同一版本，写入不会阻塞读取。
+    """
+
+    def __init__(self, store: GraphStore, version: str, entity_matcher: EntityMatcher,
+                 search_index: EntitySearchIndex, rankings: GraphRankings,
+                 path_planner: LearningPathPlanner, recommender: RecommendationEngine, layout: GraphLayout):
+        self.store = store
+        self.version = version
+        self.entity_matcher = entity_matcher
+        self.search_index = search_index
+        self.rankings = rankings
+        self.path_planner = path_planner
+        self.recommender = recommender
+        self.layout = layout
+        # 预序列化的图谱响应（只属于这个版本）
+        self.snapshots = SnapshotStore(version=version)
+        # 全量图谱响应的分片编码，首次请求时生成，增量更新时只重新编码变化的节点与边
+        self.full_payload: Optional[EncodedArrays] = None
+        # full_payload 中的节点是否已带坐标（布局算完之前生成的不带）
+        self.full_payload_layout = False
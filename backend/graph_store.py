@@ -0,0 +1,230 @@
+"""只读的紧凑图存储（CSR），作为 FrontendKnowledgeGraph 的查询后端
+
+节点名驻留为整数编号，出边 / 入边各用一组 CSR 数组保存，关系按字典编码，
+权重按取值范围压缩为小整数。networkx 图只在编辑与分析代码首次使用时从这里导出。
+
+与 networkx.DiGraph 的内存、延迟对比：
+
+    python graph_store.py --edges 1000000
+"""
+import argparse
+import time
+import tracemalloc
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import networkx as nx
+import numpy as np
+
+from graph_loader import EdgeArrays
+
+
+def _small_int_dtype(values: np.ndarray):
+    """能容纳全部取值的最小整数类型"""
+    if len(values) == 0:
+        return np.int8
+    low, high = int(values.min()), int(values.max())
+    for dtype in (np.int8, np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return dtype
+    return np.int64
+
+
+def _csr(keys: np.ndarray, values: Tuple[np.ndarray, ...], num_nodes: int):
+    """按 keys 稳定排序得到 indptr 与重排后的数组，同一节点内保持原有的边顺序"""
+    order = np.argsort(keys, kind="stable")
+    indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=num_nodes), out=indptr[1:])
+    return indptr, tuple(v[order] for v in values)
+
+
+class GraphStore:
+    """CSR 格式的只读有向图"""
+
+    def __init__(self, nodes: List[str], src: np.ndarray, dst: np.ndarray,
+                 relations: List[str], relation_codes: np.ndarray, weights: np.ndarray):
+        self.nodes = list(nodes)
+        self.node_index: Dict[str, int] = {name: i for i, name in enumerate(self.nodes)}
+        self.relations = list(relations)
+        self.relation_index: Dict[str, int] = {name: i for i, name in enumerate(self.relations)}
+
+        num_nodes = len(self.nodes)
+        src = np.asarray(src, dtype=np.int32)
+        dst = np.asarray(dst, dtype=np.int32)
+        rel_dtype = np.uint16 if len(self.relations) <= np.iinfo(np.uint16).max else np.int32
+        relation_codes = np.asarray(relation_codes).astype(rel_dtype)
+        weights = np.asarray(weights)
+        weights = weights.astype(_small_int_dtype(weights))
+
+        self.out_indptr, (self.out_indices, self.out_relations, self.out_weights) = _csr(
+            src, (dst, relation_codes, weights), num_nodes
+        )
+        self.in_indptr, (self.in_indices, self.in_relations, self.in_weights) = _csr(
+            dst, (src, relation_codes, weights), num_nodes
+        )
+        self.out_degree = np.diff(self.out_indptr)
+        self.in_degree = np.diff(self.in_indptr)
+        self.degree = self.out_degree + self.in_degree
+
+    @classmethod
+    def from_edge_arrays(cls, arrays: EdgeArrays) -> "GraphStore":
+        return cls(arrays.nodes, arrays.src, arrays.dst, arrays.relations,
+                   arrays.relation_codes, arrays.weights)
+
+    @classmethod
+    def from_digraph(cls, G: nx.DiGraph) -> "GraphStore":
+        return cls.from_edge_arrays(EdgeArrays.from_digraph(G))
+
+    @classmethod
+    def from_csr(cls, nodes, node_index, relations: List[str], arrays: Dict[str, np.ndarray]) -> "GraphStore":
+        """直接使用已经排好的 CSR 数组（例如映射自共享内存的只读数组），不复制也不重排
+
+        nodes 只需支持下标访问与迭代，node_index 只需支持 get / in。
+        """
+        store = cls.__new__(cls)
+        store.nodes = nodes
+        store.node_index = node_index
+        store.relations = list(relations)
+        store.relation_index = {name: i for i, name in enumerate(store.relations)}
+        for name in ("out_indptr", "out_indices", "out_relations", "out_weights",
+                     "in_indptr", "in_indices", "in_relations", "in_weights",
+                     "out_degree", "in_degree", "degree"):
+            setattr(store, name, arrays[name])
+        return store
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.nodes)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.out_indices)
+
+    def __contains__(self, name) -> bool:
+        return name in self.node_index
+
+    def id_of(self, name: str) -> Optional[int]:
+        return self.node_index.get(name)
+
+    def relation_codes(self, names: Optional[Iterable[str]]) -> Optional[Set[int]]:
+        """关系名集合转为编码集合（不存在的关系忽略），names 为空时返回 None"""
+        if not names:
+            return None
+        return {self.relation_index[n] for n in names if n in self.relation_index}
+
+    def out_edges(self, node: int) -> Tuple[List[int], List[int], List[int]]:
+        """出边：(目标编号, 关系编码, 权重)"""
+        start, end = self.out_indptr[node], self.out_indptr[node + 1]
+        return (self.out_indices[start:end].tolist(), self.out_relations[start:end].tolist(),
+                self.out_weights[start:end].tolist())
+
+    def in_edges(self, node: int) -> Tuple[List[int], List[int], List[int]]:
+        """入边：(源编号, 关系编码, 权重)"""
+        start, end = self.in_indptr[node], self.in_indptr[node + 1]
+        return (self.in_indices[start:end].tolist(), self.in_relations[start:end].tolist(),
+                self.in_weights[start:end].tolist())
+
+    def edge_lists(self) -> Tuple[List[int], List[int], List[int], List[int]]:
+        """全部边（按源节点分组）：(源, 目标, 关系编码, 权重)"""
+        src = np.repeat(np.arange(self.num_nodes, dtype=np.int32), self.out_degree)
+        return (src.tolist(), self.out_indices.tolist(), self.out_relations.tolist(),
+                self.out_weights.tolist())
+
+    def to_digraph(self) -> nx.DiGraph:
+        """导出为 networkx 图（编辑与分析用）"""
+        G = nx.DiGraph()
+        nodes, relations = self.nodes, self.relations
+        G.add_nodes_from(str(name) for name in nodes)
+        src, dst, rel, weight = self.edge_lists()
+        G.add_edges_from(
+            (str(nodes[u]), str(nodes[v]), {"relation": relations[r], "weight": w})
+            for u, v, r, w in zip(src, dst, rel, weight)
+        )
+        return G
+
+    def nbytes(self) -> int:
+        """数组部分占用的字节数（不含节点名字符串与索引字典）"""
+        arrays = (self.out_indptr, self.out_indices, self.out_relations, self.out_weights,
+                  self.in_indptr, self.in_indices, self.in_relations, self.in_weights,
+                  self.out_degree, self.in_degree, self.degree)
+        return sum(a.nbytes for a in arrays)
+
+
+def _synthetic_arrays(num_edges: int, seed: int = 0) -> EdgeArrays:
+    """幂律度分布的随机图（用于对比测试）"""
+    rng = np.random.default_rng(seed)
+    num_nodes = max(num_edges // 5, 10)
+    # 多采样一些，去掉重复边后再截取到目标边数
+    sample = int(num_edges * 1.2)
+    src = (rng.pareto(1.2, sample) * 10).astype(np.int64) % num_nodes
+    dst = rng.integers(0, num_nodes, sample)
+    pairs = np.unique(np.stack([src, dst], axis=1), axis=0)
+    pairs = pairs[np.sort(rng.permutation(len(pairs))[:num_edges])]
+    return EdgeArrays(
+        nodes=[f"节点{i}_node" for i in range(num_nodes)],
+        src=pairs[:, 0].astype(np.int32), dst=pairs[:, 1].astype(np.int32),
+        relations=[f"关系{i}" for i in range(32)],
+        relation_codes=rng.integers(0, 32, len(pairs)).astype(np.int32),
+        weights=rng.integers(1, 11, len(pairs)).astype(np.int32),
+    )
+
+
+def _measure(build):
+    tracemalloc.start()
+    start = time.perf_counter()
+    obj = build()
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, elapsed, current, peak
+
+
+def compare(num_edges: int, queries: int = 2000):
+    arrays = _synthetic_arrays(num_edges)
+    print(f"合成图：{len(arrays.nodes)} 个节点，{arrays.num_edges} 条边")
+    G, g_time, g_mem, _ = _measure(arrays.to_digraph)
+    store, s_time, s_mem, _ = _measure(lambda: GraphStore.from_edge_arrays(arrays))
+
+    rng = np.random.default_rng(1)
+    sample = [arrays.nodes[i] for i in rng.integers(0, len(arrays.nodes), queries)]
+
+    def nx_query():
+        for name in sample:
+            [(name, v, d['relation'], d['weight']) for v, d in G.succ[name].items()]
+            [(u, name, d['relation'], d['weight']) for u, d in G.pred[name].items()]
+
+    def store_query():
+        relations, nodes = store.relations, store.nodes
+        for name in sample:
+            i = store.node_index[name]
+            targets, rels, weights = store.out_edges(i)
+            [(name, nodes[v], relations[r], w) for v, r, w in zip(targets, rels, weights)]
+            sources, rels, weights = store.in_edges(i)
+            [(nodes[u], name, relations[r], w) for u, r, w in zip(sources, rels, weights)]
+
+    def timed(fn):
+        start = time.perf_counter()
+        fn()
+        return time.perf_counter() - start
+
+    rows = [
+        ("构建耗时 (s)", g_time, s_time),
+        ("内存 (MB)", g_mem / 2**20, s_mem / 2**20),
+        (f"query_relation x{queries} (ms)", timed(nx_query) * 1000, timed(store_query) * 1000),
+        ("度排序 Top100 (ms)",
+         timed(lambda: sorted(G.degree, key=lambda x: x[1], reverse=True)[:100]) * 1000,
+         timed(lambda: np.argsort(-store.degree, kind="stable")[:100]) * 1000),
+        ("全量边遍历 (ms)",
+         timed(lambda: [(u, v, d['relation'], d['weight']) for u, v, d in G.edges(data=True)]) * 1000,
+         timed(store.edge_lists) * 1000),
+    ]
+    print(f"{'指标':<28}{'DiGraph':>14}{'GraphStore':>14}")
+    for name, a, b in rows:
+        print(f"{name:<28}{a:>14.2f}{b:>14.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="GraphStore 与 networkx.DiGraph 的内存 / 延迟对比")
+    parser.add_argument("--edges", type=int, default=1_000_000, help="合成图的边数")
+    args = parser.parse_args()
+    compare(args.edges)
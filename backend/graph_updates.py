@@ -0,0 +1,355 @@
+"""图谱增量更新：批量的加边 / 删边 / 改权重，以及被监视的增量文件
+
+变更作用在只读的 GraphStore 上，生成一个新的 GraphStore（旧的保持不变，正在处理的请求继续使用），
+同时给出每条边在旧存储中的来源位置与受影响的节点，供派生索引做增量更新。
+
+增量文件为 CSV，列与知识图谱 CSV 相同，另加一列 op（add / remove / reweight），只追加写入：
+
+    op,source,target,relation,weight
+    add,Vue3,Pinia,状态管理,5
+    reweight,Vue,Vue3,,4
+    remove,Vue,Webpack,,
+"""
+import csv
+import hashlib
+import io
+import os
+import threading
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from graph_store import GraphStore
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+EDGE_OPS = ("add", "remove", "reweight")
+# DeltaFileWatcher 每次轮询核对的已应用内容末尾字节数
+TAIL_BYTES = 256
+
+
+class EdgeChange(NamedTuple):
+    op: str
+    source: str
+    target: str
+    relation: Optional[str] = None
+    weight: Optional[int] = None
+
+
+def parse_change(item: Dict) -> EdgeChange:
+    """校验一条变更（来自 JSON 或 CSV 行），不合法时抛出 ValueError"""
+    op = str(item.get("op") or "add").strip().lower()
+    if op not in EDGE_OPS:
+        raise ValueError(f"不支持的操作：{op}")
+    source = str(item.get("source") or "").strip()
+    target = str(item.get("target") or "").strip()
+    if not source or not target:
+        raise ValueError("source 与 target 不能为空")
+    relation = item.get("relation")
+    relation = None if relation is None or str(relation).strip() == "" else str(relation).strip()
+    weight = item.get("weight")
+    if weight is None or str(weight).strip() == "":
+        weight = None
+    else:
+        try:
+            weight = int(float(weight))
+        except ValueError:
+            raise ValueError(f"权重必须是数字：{weight}")
+    if op == "reweight" and weight is None:
+        raise ValueError("reweight 操作必须提供 weight")
+    return EdgeChange(op, source, target, relation, weight)
+
+
+class EdgeUpdate(NamedTuple):
+    store: GraphStore
+    # 新存储中每条边（CSR 顺序）在旧存储中的位置，新增或属性变化的边为 -1
+    origin: np.ndarray
+    # 边发生变化的节点（两端）
+    touched: np.ndarray
+    # 旧存储的节点数，之后的节点为新增
+    old_num_nodes: int
+    # 实际生效的变更 (源, 目标, 关系, 权重)，删除时关系与权重为 None
+    effects: List[Tuple[str, str, Optional[str], Optional[int]]]
+    summary: Dict
+
+    @property
+    def changed(self) -> bool:
+        return self.touched.size > 0
+
+
+def _find_edge(store: GraphStore, u: int, v: int) -> int:
+    """边 u -> v 在 CSR 出边数组中的位置，不存在时返回 -1"""
+    if u >= store.num_nodes or v >= store.num_nodes:
+        return -1
+    start, end = store.out_indptr[u], store.out_indptr[u + 1]
+    hit = np.nonzero(store.out_indices[start:end] == v)[0]
+    return int(start + hit[0]) if len(hit) else -1
+
+
+def apply_edge_changes(store: GraphStore, changes: Iterable[EdgeChange]) -> EdgeUpdate:
+    """按顺序应用一批变更，返回新的 GraphStore（不修改传入的 store）
+
+    add 为新增或覆盖（未给出的关系 / 权重沿用原值，新边默认为空关系、权重 1）；
+    remove 删除边（节点保留）；reweight 只修改已有边的权重。作用于不存在的边的操作记为 ignored，
+    summary 中的 added / updated / removed 为实际生效的边数。
+    """
+    nodes = store.nodes
+    node_index = store.node_index
+    new_nodes: Dict[str, int] = {}
+    relations = list(store.relations)
+    relation_index = dict(store.relation_index)
+    summary = {"added": 0, "updated": 0, "removed": 0, "ignored": 0}
+
+    def node_id(name: str, create: bool) -> Optional[int]:
+        i = node_index.get(name, new_nodes.get(name))
+        if i is None and create:
+            i = len(nodes) + len(new_nodes)
+            new_nodes[name] = i
+        return i
+
+    # (u, v) -> 变更后的 (关系编码, 权重)，None 表示删除；positions 记录旧存储中的位置
+    pending: Dict[Tuple[int, int], Optional[Tuple[int, int]]] = {}
+    positions: Dict[Tuple[int, int], int] = {}
+    for change in changes:
+        u = node_id(change.source, create=change.op == "add")
+        v = node_id(change.target, create=change.op == "add")
+        if u is None or v is None:
+            summary["ignored"] += 1
+            continue
+        key = (u, v)
+        if key not in positions:
+            positions[key] = _find_edge(store, u, v)
+        if key in pending:
+            current = pending[key]
+        elif positions[key] >= 0:
+            pos = positions[key]
+            current = (int(store.out_relations[pos]), int(store.out_weights[pos]))
+        else:
+            current = None
+
+        if change.op == "add":
+            if change.relation is None and current is not None:
+                relation = current[0]
+            else:
+                name = change.relation or ""
+                if name not in relation_index:
+                    relation_index[name] = len(relations)
+                    relations.append(name)
+                relation = relation_index[name]
+            weight = change.weight if change.weight is not None else (current[1] if current is not None else 1)
+            pending[key] = (relation, weight)
+        elif current is None:
+            summary["ignored"] += 1
+        elif change.op == "remove":
+            pending[key] = None
+        else:
+            pending[key] = (current[0], change.weight)
+
+    num_edges = store.num_edges
+    src = np.repeat(np.arange(store.num_nodes, dtype=np.int32), store.out_degree)
+    dst = store.out_indices.astype(np.int32)
+    relation_codes = store.out_relations.astype(np.int32)
+    weights = store.out_weights.astype(np.int32)
+    origin = np.arange(num_edges, dtype=np.int64)
+    keep = np.ones(num_edges, dtype=bool)
+    appended = []
+    touched = set()
+    effects = []
+    names = nodes + list(new_nodes)
+    for (u, v), value in pending.items():
+        pos = positions[(u, v)]
+        if pos >= 0:
+            old = (int(relation_codes[pos]), int(weights[pos]))
+            if value == old:
+                continue
+            if value is None:
+                keep[pos] = False
+                summary["removed"] += 1
+            else:
+                relation_codes[pos], weights[pos] = value
+                origin[pos] = -1
+                summary["updated"] += 1
+        elif value is None:
+            # 同一批次内先加后删
+            continue
+        else:
+            appended.append((u, v) + value)
+            summary["added"] += 1
+        touched.update((u, v))
+        effects.append((names[u], names[v]) + ((None, None) if value is None else (relations[value[0]], value[1])))
+
+    if appended:
+        extra = np.array(appended, dtype=np.int64).reshape(-1, 4)
+        src = np.concatenate([src[keep], extra[:, 0].astype(np.int32)])
+        dst = np.concatenate([dst[keep], extra[:, 1].astype(np.int32)])
+        relation_codes = np.concatenate([relation_codes[keep], extra[:, 2].astype(np.int32)])
+        weights = np.concatenate([weights[keep], extra[:, 3].astype(np.int32)])
+        origin = np.concatenate([origin[keep], np.full(len(extra), -1, dtype=np.int64)])
+    else:
+        src, dst, relation_codes, weights, origin = (
+            src[keep], dst[keep], relation_codes[keep], weights[keep], origin[keep]
+        )
+
+    new_store = GraphStore(names, src, dst, relations, relation_codes, weights)
+    # 与 GraphStore 内部相同的稳定排序，得到 CSR 顺序下每条边的来源
+    origin = origin[np.argsort(src, kind="stable")]
+    summary["nodes_added"] = len(new_nodes)
+    return EdgeUpdate(
+        store=new_store,
+        origin=origin,
+        touched=np.array(sorted(touched), dtype=np.int64),
+        old_num_nodes=store.num_nodes,
+        effects=effects,
+        summary=summary,
+    )
+
+
+def neighborhood_ids(store: GraphStore, seeds: np.ndarray, radius: int) -> np.ndarray:
+    """与 seeds 相距不超过 radius 跳（忽略方向）的全部节点"""
+    visited = np.zeros(store.num_nodes, dtype=bool)
+    frontier = np.asarray(seeds, dtype=np.int64)
+    frontier = frontier[frontier < store.num_nodes]
+    visited[frontier] = True
+    for _ in range(radius):
+        if frontier.size == 0:
+            break
+        found = []
+        for indptr, indices in ((store.out_indptr, store.out_indices), (store.in_indptr, store.in_indices)):
+            for i in frontier.tolist():
+                found.append(indices[indptr[i]:indptr[i + 1]])
+        frontier = np.unique(np.concatenate(found)) if found else frontier[:0]
+        frontier = frontier[~visited[frontier]]
+        visited[frontier] = True
+    return np.nonzero(visited)[0]
+
+
+DELTA_COLUMNS = ("op", "source", "target", "relation", "weight")
+
+
+def append_changes(path: str, changes: Iterable[EdgeChange]) -> int:
+    """把一批变更追加到增量文件（多进程同时写入时用文件锁保证整批连续），返回写入的行数"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    rows = [["" if value is None else value for value in change] for change in changes]
+    writer.writerows(rows)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "a", encoding="utf-8", newline="") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            if os.fstat(f.fileno()).st_size == 0:
+                f.write(",".join(DELTA_COLUMNS) + "\n")
+            f.write(buffer.getvalue())
+            f.flush()
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+    return len(rows)
+
+
+class DeltaFileWatcher:
+    """轮询监视只追加的增量 CSV，把新写入的完整行交给 apply(changes)
+
+    记录已应用的字节偏移及这部分内容的哈希。变更不是幂等的（例如先删后加、add → reweight → add），
+    重复应用会得到不同的图谱，所以文件被截断或替换（inode 变化、变短，或偏移之前的最后几个字节不同）后：
+    开头与已应用内容完全相同时跳过这部分，只应用之后的新记录；否则视为一份全新的增量日志，从头应用。
+    进程重启时图谱从基础 CSV 重新加载，增量文件需要从头完整应用一次，因此偏移只保存在内存中。
+    """
+
+    def __init__(self, path: str, apply: Callable[[List[EdgeChange]], Dict], interval: float = 2.0):
+        self.path = path
+        self.apply = apply
+        self.interval = interval
+        self._offset = 0
+        # 已应用的前 _offset 个字节的哈希，用来识别替换后的文件是否以已应用的内容开头
+        self._digest = hashlib.sha1()
+        # 已应用内容的最后几个字节，每次轮询廉价地确认文件没有被截断后重新写长
+        self._tail = b""
+        self._header: Optional[List[str]] = None
+        self._identity = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def poll(self) -> Optional[Dict]:
+        """检查一次文件，有新内容时应用并返回更新结果"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        identity = (stat.st_dev, stat.st_ino)
+        if self._identity is not None and (identity != self._identity or stat.st_size < self._offset
+                                           or not self._tail_matches()):
+            if not self._same_prefix(stat.st_size):
+                print(f"增量文件 {self.path} 已被替换为新的内容，从头应用")
+                self._offset, self._digest, self._tail, self._header = 0, hashlib.sha1(), b"", None
+        self._identity = identity
+        if stat.st_size == self._offset:
+            return None
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            data = f.read(stat.st_size - self._offset)
+        # 只处理完整的行，写了一半的行留到下次
+        end = data.rfind(b"\n") + 1
+        if end == 0:
+            return None
+        text = data[:end].decode("utf-8-sig" if self._offset == 0 else "utf-8")
+        self._offset += end
+        self._digest.update(data[:end])
+        self._tail = (self._tail + data[:end])[-TAIL_BYTES:]
+
+        rows = list(csv.reader(io.StringIO(text)))
+        if self._header is None and rows:
+            self._header = [c.strip() for c in rows.pop(0)]
+        changes = []
+        for row in rows:
+            if not any(cell.strip() for cell in row):
+                continue
+            try:
+                changes.append(parse_change(dict(zip(self._header, row))))
+            except ValueError as e:
+                print(f"增量文件 {self.path} 中的无效行 {row}：{e}")
+        return self.apply(changes) if changes else None
+
+    def _tail_matches(self) -> bool:
+        """偏移之前的最后几个字节是否仍是已应用的内容"""
+        if not self._tail:
+            return True
+        with open(self.path, "rb") as f:
+            f.seek(self._offset - len(self._tail))
+            return f.read(len(self._tail)) == self._tail
+
+    def _same_prefix(self, size: int) -> bool:
+        """当前文件的前 _offset 个字节是否与已应用的内容相同"""
+        if size < self._offset:
+            return False
+        digest = hashlib.sha1()
+        remaining = self._offset
+        with open(self.path, "rb") as f:
+            while remaining:
+                chunk = f.read(min(remaining, 1 << 20))
+                if not chunk:
+                    return False
+                digest.update(chunk)
+                remaining -= len(chunk)
+        return digest.digest() == self._digest.digest()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"增量文件处理失败：{e}")
+
+    def start(self):
+        """先同步应用已有内容，再启动后台轮询"""
+        self.poll()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="graph-delta")
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
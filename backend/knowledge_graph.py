@@ -1,137 +1,593 @@
 import markdown
 import networkx as nx
-import pandas as pd
-from typing import List, Dict, Tuple
-import requests
+import numpy as np
+from typing import AsyncIterator, Iterable, List, Dict, Optional, Tuple
 import os
+import re
+import json
+import hashlib
+import threading
+import time
 from dotenv import load_dotenv
+from fastapi.concurrency import run_in_threadpool
+from graph_loader import EdgeArrays, load_edge_arrays
+from graph_store import GraphStore
+from graph_rankings import GraphRankings
+from graph_layout import GraphLayout
+from learning_path import ASSOCIATIVE_RELATIONS, PREREQUISITE_RELATIONS, LearningPathPlanner
+from context_retrieval import ContextRetriever
+from recommendations import RecommendationEngine
+from entity_matcher import EntityMatcher, SharedEntityMatcher
+from entity_search import EntitySearchIndex, SharedEntitySearchIndex
+from answer_cache import AnswerCache, make_key, normalize_question, context_hash
+from llm_client import LLMClient, outcome_of
+from llm_guard import CircuitOpenError, LLMGuard, QueueTimeoutError
+from metrics import LLM_FALLBACKS, stage
+from graph_snapshot import EncodedArrays, dumps
+from graph_state import GraphState
+from graph_updates import DeltaFileWatcher, EdgeChange, EdgeUpdate, append_changes, apply_edge_changes
+from shared_graph import Arena, SharedGraphPublisher, SharedGraphReader
 
 # 加载环境变量
 load_dotenv()
 
+
+def _env_names(name: str, default: Iterable[str]) -> frozenset:
+    """逗号分隔的名称列表环境变量，未配置时使用默认值"""
+    value = os.getenv(name)
+    if value is None:
+        return frozenset(default)
+    return frozenset(item.strip() for item in value.split(",") if item.strip())
+
+
 class FrontendKnowledgeGraph:
-    def __init__(self, data_path: str = "data/frontend_knowledge.csv"):
-        # 初始化知识图谱
-        self.G = nx.DiGraph()
-        self.load_data(data_path)
+    def __init__(self, data_path: str = "data/frontend_knowledge.csv", shared_dir: Optional[str] = None):
+        # 只读查询走 GraphState（紧凑的 CSR 存储与派生索引）；networkx 图只用于编辑与分析，首次访问 G 时才构建
+        self._G: Optional[nx.DiGraph] = None
+        self.state = self._build_state(GraphStore.from_edge_arrays(EdgeArrays([], [], [], [], [], [])), start=False)
+        # 图谱写入串行执行；读取不加锁，始终使用当前的 state
+        self._write_lock = threading.Lock()
+        self.delta_watcher: Optional[DeltaFileWatcher] = None
+        # 多进程部署：构建进程发布共享图谱（publisher），worker 进程映射共享图谱（reader）
+        self.shared_publisher: Optional[SharedGraphPublisher] = None
+        self.shared_reader: Optional[SharedGraphReader] = None
+        # 核心图谱视图允许的最大节点数
+        self.top_limit_cap = int(os.getenv("TOP_GRAPH_MAX_LIMIT", "200"))
+        # 聚合视图等待后台布局完成的最长时间（秒）
+        self.layout_wait = float(os.getenv("LAYOUT_WAIT", "10"))
+        # 问答 / 学习路径缓存
+        self.answer_cache = AnswerCache.from_env()
+        # 问答上下文检索：各模式的 token 预算与多跳扩展参数
+        self.context_budgets = {
+            "quick": int(os.getenv("CONTEXT_BUDGET_QUICK", "400")),
+            "deep": int(os.getenv("CONTEXT_BUDGET_DEEP", "1500")),
+        }
+        self.context_options = {
+            "max_hops": int(os.getenv("CONTEXT_MAX_HOPS", "2")),
+            "beam": int(os.getenv("CONTEXT_BEAM", "16")),
+        }
+        shared_dir = os.getenv("GRAPH_SHARED_DIR", "") if shared_dir is None else shared_dir
+        if shared_dir:
+            self.attach_shared(shared_dir)
+        else:
+            self.load_data(data_path)
          # 初始化DeepSeek API配置
         self.deepseek_api_key = os.getenv("DEEPSEEK_API_KEY")
         self.deepseek_api_url = os.getenv("DEEPSEEK_API_URL")
         if not self.deepseek_api_key:
             raise ValueError("请配置DEEPSEEK_API_KEY环境变量")
+        # 共享连接池的大模型客户端
+        self.llm = LLMClient.from_env()
+        # 大模型调用保护：相同请求合并、并发上限、熔断
+        self.llm_guard = LLMGuard.from_env()
 
-    def load_data(self, data_path: str):
-        """加载知识图谱数据"""
-        try:
-            df = pd.read_csv(data_path, encoding='utf-8-sig')
-            df.columns = df.columns.str.strip()
-            # 删除空行
-            df.dropna(subset=['source', 'target'], inplace=True)
-            # 权重处理
-            if 'weight' in df.columns:
-                df['weight'] = pd.to_numeric(df['weight'], errors='coerce').fillna(1).astype(int)
+    # 当前版本的只读数据
+    store = property(lambda self: self.state.store)
+    graph_version = property(lambda self: self.state.version)
+    entity_matcher = property(lambda self: self.state.entity_matcher)
+    search_index = property(lambda self: self.state.search_index)
+    rankings = property(lambda self: self.state.rankings)
+    path_planner = property(lambda self: self.state.path_planner)
+    recommender = property(lambda self: self.state.recommender)
+    layout = property(lambda self: self.state.layout)
+    snapshots = property(lambda self: self.state.snapshots)
+
+    @property
+    def G(self) -> nx.DiGraph:
+        """networkx 图（从当前版本的 CSR 存储导出，之后随增量更新同步）"""
+        if self._G is None:
+            with self._write_lock:
+                if self._G is None:
+                    self._G = self.store.to_digraph()
+        return self._G
+
+    def load_data(self, data_path: str, use_cache: bool = True):
+        """加载知识图谱数据（优先读取二进制快照，失败直接抛出异常）"""
+        start = time.perf_counter()
+        arrays = load_edge_arrays(data_path, use_cache=use_cache)
+        print(f"知识图谱构建完成：{len(arrays.nodes)} 个节点，{len(arrays.src)} 条边，"
+              f"耗时 {(time.perf_counter() - start) * 1000:.1f} ms")
+        self.rebuild_indexes(arrays)
+
+    def _build_state(self, store: GraphStore, start: bool = True) -> GraphState:
+        """从零构建某一版本的全部派生索引；start 为 True 时启动后台计算"""
+        rankings = self._new_rankings(store)
+        recommender = self._new_recommender(store)
+        layout = self._new_layout(store)
+        if start:
+            rankings.start_betweenness()
+            recommender.start_precompute()
+            layout.start()
+        return GraphState(
+            store=store,
+            version=self.compute_graph_version(store),
+            entity_matcher=EntityMatcher(store.nodes),
+            search_index=EntitySearchIndex(store.nodes),
+            rankings=rankings,
+            path_planner=self._new_path_planner(store),
+            recommender=recommender,
+            layout=layout,
+        )
+
+    @staticmethod
+    def _new_rankings(store: GraphStore, degree_order: Optional[np.ndarray] = None) -> GraphRankings:
+        # 节点排名（介数中心性在后台线程计算）
+        return GraphRankings(store, betweenness_samples=int(os.getenv("BETWEENNESS_SAMPLES", "256")),
+                             degree_order=degree_order)
+
+    @staticmethod
+    def _new_recommender(store: GraphStore) -> RecommendationEngine:
+        # 关联推荐（个性化 PageRank，后台预计算每个节点的 Top-N）
+        return RecommendationEngine(
+            store,
+            top_n=int(os.getenv("RECOMMEND_TOP_N", "20")),
+            alpha=float(os.getenv("RECOMMEND_RESTART", "0.15")),
+            precompute_limit=int(os.getenv("RECOMMEND_PRECOMPUTE_MAX", "20000")),
+        )
+
+    @staticmethod
+    def _new_path_planner(store: GraphStore) -> LearningPathPlanner:
+        # 基于图谱结构的学习路径规划（按实体缓存）
+        return LearningPathPlanner(
+            store,
+            max_depth=int(os.getenv("LEARNING_PATH_DEPTH", "3")),
+            max_items=int(os.getenv("LEARNING_PATH_ITEMS", "5")),
+            prerequisite_relations=_env_names("LEARNING_PATH_PREREQUISITE", PREREQUISITE_RELATIONS),
+            associative_relations=_env_names("LEARNING_PATH_ASSOCIATIVE", ASSOCIATIVE_RELATIONS),
+        )
+
+    @staticmethod
+    def _new_layout(store: GraphStore) -> GraphLayout:
+        # 节点坐标与社区聚类层级（后台线程计算）
+        return GraphLayout(
+            store,
+            iterations=int(os.getenv("LAYOUT_ITERATIONS", "30")),
+            spacing=float(os.getenv("LAYOUT_SPACING", "100")),
+            max_cluster_size=int(os.getenv("CLUSTER_MAX_SIZE", "200")),
+            top_clusters=int(os.getenv("CLUSTER_TOP", "50")),
+        )
+
+    def rebuild_indexes(self, arrays: Optional[EdgeArrays] = None):
+        """图谱变化后重建派生索引；arrays 为空时从（已构建的）networkx 图导出"""
+        start = time.perf_counter()
+        with self._write_lock:
+            if arrays is not None:
+                store = GraphStore.from_edge_arrays(arrays)
+                # 换了整份数据，旧的 networkx 图作废，下次访问时重新导出
+                self._G = None
+            elif self._G is not None:
+                store = GraphStore.from_digraph(self._G)
             else:
-                df['weight'] = 1 
-            count = 0
-            for _, row in df.iterrows():
-                source_node = str(row['source']).strip()
-                target_node = str(row['target']).strip()
-                
-                if not source_node or not target_node:
-                    continue
+                store = self.state.store
+            self.state = self._build_state(store)
+        self.answer_cache.set_version(self.graph_version)
+        print(f"图谱索引构建完成：版本 {self.graph_version}，耗时 {(time.perf_counter() - start) * 1000:.1f} ms")
 
-                self.G.add_edge(
-                    source_node,
-                    target_node,
-                    relation=str(row.get('relation', '')), 
-                    weight=int(row['weight'])
-                )
-                count += 1
-            
-        except Exception as e:
-            import traceback
-            print(traceback.format_exc())
-            pass
+    def apply_changes(self, changes: List[EdgeChange]) -> Dict:
+        """批量应用边的增删改，生成新版本后原子替换 state
+
+        新版本在旧版本旁边构建，期间的读取继续使用旧版本；派生索引尽量沿用旧版本做增量更新。
+        问答 / 学习路径缓存的键包含图谱上下文的哈希，不随版本整体清空。
+        """
+        if self.shared_reader is not None:
+            return self._forward_changes(changes)
+        start = time.perf_counter()
+        with self._write_lock:
+            old = self.state
+            update = apply_edge_changes(old.store, changes)
+            summary = dict(update.summary)
+            if not update.changed:
+                summary.update(version=old.version, elapsed_ms=round((time.perf_counter() - start) * 1000, 2))
+                return summary
+            store = update.store
+            added_names = store.nodes[update.old_num_nodes:]
+            new = GraphState(
+                store=store,
+                version=self.compute_graph_version(store),
+                entity_matcher=EntityMatcher(store.nodes) if added_names else old.entity_matcher,
+                search_index=old.search_index.with_names(added_names),
+                rankings=old.rankings.updated(store, update.touched),
+                path_planner=self._new_path_planner(store),
+                recommender=old.recommender.updated(store, update.touched),
+                layout=old.layout.updated(store, update.touched),
+            )
+            # 已有节点的坐标在新版本中不变，带坐标的编码可以沿用
+            new.full_payload = self._updated_full_payload(old.full_payload, update, new.layout)
+            new.full_payload_layout = old.full_payload_layout and new.layout.is_ready()
+            # networkx 图已构建时与新版本保持一致，未构建时不需要同步
+            if self._G is not None:
+                self._G.add_nodes_from(added_names)
+                for u, v, relation, weight in update.effects:
+                    if relation is None:
+                        self._G.remove_edge(u, v)
+                    else:
+                        self._G.add_edge(u, v, relation=relation, weight=weight)
+            self.state = new
+        summary.update(version=new.version, elapsed_ms=round((time.perf_counter() - start) * 1000, 2))
+        print(f"图谱增量更新完成：{summary}")
+        return summary
+
+    def start_delta_watcher(self, path: Optional[str] = None, interval: Optional[float] = None):
+        """监视增量文件（默认 GRAPH_DELTA_FILE），已有内容立即应用，之后的追加内容定时应用"""
+        path = os.getenv("GRAPH_DELTA_FILE", "data/graph_delta.csv") if path is None else path
+        # 共享图谱的 worker 不直接应用增量文件，由构建进程应用后重新发布
+        if not path or self.shared_reader is not None:
+            return
+        interval = float(os.getenv("GRAPH_DELTA_POLL", "2")) if interval is None else interval
+        self.delta_watcher = DeltaFileWatcher(path, self.apply_changes, interval)
+        self.delta_watcher.start()
+
+    def stop_delta_watcher(self):
+        if self.delta_watcher is not None:
+            self.delta_watcher.stop()
+
+    def _forward_changes(self, changes: List[EdgeChange]) -> Dict:
+        """worker 进程收到的变更追加到增量文件，由构建进程统一应用并发布新版本"""
+        path = os.getenv("GRAPH_DELTA_FILE", "data/graph_delta.csv")
+        if not path:
+            raise ValueError("多进程共享图谱模式下写入图谱需要配置 GRAPH_DELTA_FILE")
+        queued = append_changes(path, changes)
+        return {"queued": queued, "version": self.graph_version}
+
+    def publish_shared(self, directory: str, interval: Optional[float] = None):
+        """构建进程：把当前版本发布到共享目录，之后版本变化或后台计算完成时自动重新发布"""
+        interval = float(os.getenv("GRAPH_SHARED_POLL", "0.5")) if interval is None else interval
+        self.shared_publisher = SharedGraphPublisher(directory, self._shared_snapshot, interval)
+        self.shared_publisher.start()
+
+    def _shared_snapshot(self):
+        state = self.state
+        rankings = state.rankings.shared_arrays()
+        recommender = state.recommender
+        # 版本、介数中心性、推荐预计算任意一个变化都重新发布
+        key = (state, rankings.get("betweenness"), recommender.is_ready(), state.layout.is_ready())
+
+        def build():
+            extras = dict(rankings)
+            extras.update(recommender.shared_arrays())
+            extras.update(state.layout.shared_arrays())
+            extras.update(state.entity_matcher.shared_arrays())
+            extras.update(state.search_index.shared_arrays())
+            return state.version, state.store, extras
+        return key, build
+
+    def attach_shared(self, directory: str, interval: Optional[float] = None):
+        """worker 进程：映射构建进程发布的共享图谱（不加载 CSV，也不做后台计算），之后随其版本切换"""
+        interval = float(os.getenv("GRAPH_SHARED_POLL", "0.5")) if interval is None else interval
+        self.shared_reader = SharedGraphReader(directory, interval)
+        self._swap_shared(self.shared_reader.open_current())
+        self.shared_reader.start(self._swap_shared)
+
+    def _swap_shared(self, arena: Arena):
+        start = time.perf_counter()
+        with self._write_lock:
+            old = self.state
+            store = arena.store()
+            rankings = self._new_rankings(store, degree_order=arena.get("degree_order"))
+            if arena.get("betweenness") is not None:
+                rankings.attach_betweenness(arena.get("betweenness"), arena.get("betweenness_order"))
+            recommender = self._new_recommender(store)
+            if arena.get("rec_ids") is not None:
+                recommender.attach_tables(arena.get("rec_ids"), arena.get("rec_scores"), arena.get("rec_ready"))
+            layout = self._new_layout(store)
+            if arena.get("layout_positions") is not None:
+                layout.attach(arena.get("layout_positions"), arena.get("layout_parents"),
+                              arena.get("layout_parent_offsets"))
+            new = GraphState(
+                store=store,
+                version=arena.version,
+                entity_matcher=SharedEntityMatcher(arena.arrays),
+                search_index=SharedEntitySearchIndex(arena.arrays),
+                rankings=rankings,
+                path_planner=self._new_path_planner(store),
+                recommender=recommender,
+                layout=layout,
+            )
+            # 同一版本的重新发布（后台计算完成）沿用已生成的响应
+            if arena.version == old.version:
+                new.snapshots, new.full_payload = old.snapshots, old.full_payload
+                new.full_payload_layout = old.full_payload_layout
+            self.state = new
+            self._G = None
+        self.answer_cache.set_version(self.graph_version)
+        print(f"已切换到共享图谱：版本 {arena.version}，{store.num_nodes} 个节点，{store.num_edges} 条边，"
+              f"耗时 {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    def compute_graph_version(self, store: Optional[GraphStore] = None) -> str:
+        """根据图谱内容计算版本号，内容不变则重启后版本不变"""
+        store = self.store if store is None else store
+        digest = hashlib.sha1()
+        # 关系编码与构建顺序有关，先换成按名称排序的规范编码（只计入仍被使用的关系）
+        used = np.unique(store.out_relations).tolist()
+        relation_order = sorted(used, key=store.relations.__getitem__)
+        canonical = np.zeros(len(store.relations), dtype=np.int64)
+        canonical[relation_order] = np.arange(len(relation_order))
+        digest.update("\n".join(store.nodes).encode("utf-8"))
+        digest.update(b"\0")
+        digest.update("\n".join(store.relations[i] for i in relation_order).encode("utf-8"))
+        for array in (store.out_indptr, store.out_indices, canonical[store.out_relations], store.out_weights):
+            digest.update(array.astype(np.int64).tobytes())
+        return digest.hexdigest()[:16]
+
+    def collect_metrics(self):
+        """抓取 /metrics 时计算的指标：图谱规模与版本、大模型并发与保护层计数、问答缓存命中率"""
+        state = self.state
+        guard = self.llm_guard.stats()
+        cache = self.answer_cache.stats()
+        circuit = guard["circuit"]["state"]
+        return [
+            ("graph_nodes", "gauge", "当前图谱版本的节点数", [({}, state.store.num_nodes)]),
+            ("graph_edges", "gauge", "当前图谱版本的边数", [({}, state.store.num_edges)]),
+            ("graph_info", "gauge", "当前图谱版本", [({"version": state.version}, 1)]),
+            ("graph_layout_ready", "gauge", "当前图谱版本的布局与聚类是否已算完", [({}, int(state.layout.is_ready()))]),
+            ("llm_in_flight", "gauge", "正在进行的大模型调用数", [({}, guard["in_flight"])]),
+            ("llm_max_concurrency", "gauge", "大模型调用并发上限", [({}, guard["max_concurrency"])]),
+            ("llm_guard_events_total", "counter", "大模型保护层计数（调用、合并、熔断拒绝、排队超时、失败）",
+             [({"event": name}, guard[name]) for name in ("calls", "coalesced", "rejected_open", "queue_timeouts", "failures")]),
+            ("llm_circuit_state", "gauge", "熔断器状态（当前状态为 1）",
+             [({"state": name}, int(name == circuit)) for name in ("closed", "open", "half_open")]),
+            ("answer_cache_requests_total", "counter", "问答 / 学习路径缓存的命中 / 未命中次数",
+             [({"result": name}, cache[name]) for name in ("memory_hits", "disk_hits", "misses")]),
+            ("answer_cache_hit_rate", "gauge", "问答 / 学习路径缓存的累计命中率", [({}, cache["hit_rate"])]),
+            ("answer_cache_entries", "gauge", "问答 / 学习路径缓存的内存条目数", [({}, cache["memory_size"])]),
+        ]
+
+    def extract_entities(self, text: str) -> List[Dict]:
+        """抽取文本中出现的实体及位置（不区分大小写，重叠时取最长匹配）"""
+        return self.entity_matcher.extract(text)
     
-    def get_top_graph_data(self, limit: int = 15) -> Dict:
-        HARD_LIMIT = 15
-        
-        # 2. 计算所有节点的度，按降序排序
-        sorted_nodes = sorted(self.G.degree, key=lambda x: x[1], reverse=True)
-        
-        # 3. 取前 15 个节点
-        top_nodes_list = [node for node, degree in sorted_nodes[:HARD_LIMIT]]
-        top_nodes_set = set(top_nodes_list)
+    def get_top_graph_data(self, limit: int = 15, rank_by: str = "degree",
+                           state: Optional[GraphState] = None) -> Dict:
+        """获取核心图谱：按 rank_by（degree / weighted_degree / pagerank / betweenness）取 Top N 节点及其之间的边"""
+        state = self.state if state is None else state
+        limit = max(1, min(int(limit), self.top_limit_cap))
+        view = state.rankings.top_view(
+            rank_by, limit, lambda method, ids, scores: self._build_top_view(state.store, method, ids, scores)
+        )
+        # 缓存的子图不含坐标，布局算完后再附上
+        if not state.layout.is_ready():
+            return view
+        store, layout = state.store, state.layout
+        return dict(view, nodes=[dict(node, **layout.coordinates(store.id_of(node["id"]))) for node in view["nodes"]])
+
+    def get_cluster_view(self, level: Optional[int] = None, parent: Optional[str] = None,
+                         max_edges: int = 2000, state: Optional[GraphState] = None) -> Dict:
+        """聚合视图：某一层的簇（超级节点）及其间的聚合边，或展开 parent 簇得到的下一层；均带坐标
+
+        布局在后台计算，最多等待 LAYOUT_WAIT 秒，仍未完成时抛出 TimeoutError。
+        """
+        state = self.state if state is None else state
+        if not state.layout.wait(self.layout_wait):
+            raise TimeoutError("图谱布局计算中，请稍后重试")
+        return state.layout.cluster_view(level=level, parent=parent, max_edges=max_edges)
+
+    def _build_top_view(self, store: GraphStore, rank_by: str, top_ids: np.ndarray, scores: np.ndarray) -> Dict:
+        top_ids = top_ids.tolist()
+        top_ids_set = set(top_ids)
         
-        # 4. 构建返回的节点列表
+        # 构建返回的节点列表
         nodes = []
-        for node in top_nodes_list:
+        for i, score in zip(top_ids, scores.tolist()):
             nodes.append({
-                "id": str(node),
-                "label": str(node),
+                "id": str(store.nodes[i]),
+                "label": str(store.nodes[i]),
                 "size": 35,  # 统一大尺寸
                 "color": {
                     "background": "#FF7675", # 统一红色
                     "border": "#2D3436"
                 },
-                "value": self.G.degree[node] 
+                "value": int(store.degree[i]),
+                "score": score
             })
             
-        # 5. 构建返回的边列表
+        # 构建返回的边列表：只扫描 Top 节点的出边
+        edges = []
+        for u in sorted(top_ids):
+            for v, r, w in zip(*store.out_edges(u)):
+                if v in top_ids_set:
+                    edges.append(self.edge_to_dict(store.nodes[u], store.nodes[v], store.relations[r], w))
+        return {"nodes": nodes, "edges": edges, "rank_by": rank_by}
+
+    @staticmethod
+    def node_to_dict(node, xy) -> Dict:
+        """带坐标的节点（坐标由服务端布局预先计算）"""
+        return {"id": str(node), "label": str(node), "x": round(xy[0], 1), "y": round(xy[1], 1)}
+
+    @staticmethod
+    def edge_to_dict(u, v, relation: str, weight: int) -> Dict:
+        """边转换为前端 vis-network 使用的格式"""
+        return {
+            "from": str(u),
+            "to": str(v),
+            "label": str(relation),
+            "weight": int(weight),
+            "relation": str(relation)
+        }
+
+    @staticmethod
+    def _edge_passes(relation: int, weight: int, relations, min_weight) -> bool:
+        if relations is not None and relation not in relations:
+            return False
+        if min_weight is not None and weight < min_weight:
+            return False
+        return True
+
+    def _iter_neighbors(self, store: GraphStore, node: int, direction: str, relations, min_weight):
+        """沿邻接表遍历一个节点的邻居，产出 (邻居编号, 边权重)"""
+        adjacency = []
+        if direction in ("out", "both"):
+            adjacency.append(store.out_edges(node))
+        if direction in ("in", "both"):
+            adjacency.append(store.in_edges(node))
+        for neighbors, rels, weights in adjacency:
+            for neighbor, r, w in zip(neighbors, rels, weights):
+                if self._edge_passes(r, w, relations, min_weight):
+                    yield neighbor, w
+
+    def get_neighborhood(self, entity: str, depth: int = 1, direction: str = "both",
+                         relations: Optional[Iterable[str]] = None, min_weight: Optional[int] = None,
+                         max_nodes: Optional[int] = None, max_edges: Optional[int] = None) -> Dict:
+        """查询实体的 k 跳邻域子图
+
+        只沿邻接表扩展，代价与邻域大小相关而与全图规模无关。
+        direction 为 out / in / both；relations、min_weight 同时作用于扩展和返回的边；
+        超过 max_nodes / max_edges 时按边权重从高到低截断。
+        """
+        if direction not in ("in", "out", "both"):
+            raise ValueError(f"不支持的方向：{direction}")
+        state = self.state
+        store = state.store
+        root = store.id_of(entity)
+        if root is None:
+            return {"nodes": [{"id": str(entity), "label": str(entity), "level": 0}], "edges": []}
+        relations = store.relation_codes(relations)
+
+        # 逐层 BFS，同一层内按连接边的最大权重排序，节点数超限时优先保留权重高的
+        levels = {root: 0}
+        frontier = [root]
+        for level in range(1, depth + 1):
+            if not frontier or (max_nodes is not None and len(levels) >= max_nodes):
+                break
+            candidates = {}
+            for node in frontier:
+                for neighbor, weight in self._iter_neighbors(store, node, direction, relations, min_weight):
+                    if neighbor not in levels and weight > candidates.get(neighbor, float("-inf")):
+                        candidates[neighbor] = weight
+            ranked = sorted(candidates, key=candidates.get, reverse=True)
+            if max_nodes is not None:
+                ranked = ranked[:max_nodes - len(levels)]
+            for neighbor in ranked:
+                levels[neighbor] = level
+            frontier = ranked
+
+        # 邻域内的诱导边：只扫描邻域节点的出边
         edges = []
-        for u, v, data in self.G.edges(data=True):
-            if u in top_nodes_set and v in top_nodes_set:
-                edges.append({
-                    "from": str(u),
-                    "to": str(v),
-                    "label": str(data.get('relation', '')),
-                    "weight": int(data.get('weight', 1)),
-                    "relation": str(data.get('relation', ''))
-                })        
-        return {"nodes": nodes, "edges": edges}       
+        for u in levels:
+            for v, r, w in zip(*store.out_edges(u)):
+                if v in levels and self._edge_passes(r, w, relations, min_weight):
+                    edges.append((u, v, r, w))
+        if max_edges is not None and len(edges) > max_edges:
+            edges.sort(key=lambda e: e[3], reverse=True)
+            edges = edges[:max_edges]
+
+        names, relation_names = store.nodes, store.relations
+        nodes = [{"id": str(names[i]), "label": str(names[i]), "level": level, **state.layout.coordinates(i)}
+                 for i, level in levels.items()]
+        return {
+            "nodes": nodes,
+            "edges": [self.edge_to_dict(names[u], names[v], relation_names[r], w) for u, v, r, w in edges]
+        }
+
+    def search_entities(self, keyword: str, limit: int = 20, offset: int = 0,
+                        state: Optional[GraphState] = None) -> Dict:
+        """按名称模糊搜索实体（分级排序、分页），只返回名称与得分"""
+        state = self.state if state is None else state
+        total, items = state.search_index.search(keyword, limit=limit, offset=offset)
+        return {"total": total, "items": items}
+
+    def fuzzy_search(self, keyword: str, limit: int = 20, offset: int = 0) -> Dict:
+        """模糊搜索实体，并沿邻接表带出命中实体的一跳关联"""
+        state = self.state
+        result = self.search_entities(keyword, limit=limit, offset=offset, state=state)
+        matched = [item["entity"] for item in result["items"]]
+        scores = {item["entity"]: item["score"] for item in result["items"]}
+
+        nodes = {}
+        for name in matched:
+            nodes[name] = {"id": str(name), "label": str(name), "score": scores[name]}
+        store = state.store
+        seen_edges = set()
+        edges = []
+        for name in matched:
+            i = store.id_of(name)
+            targets, rels, weights = store.out_edges(i)
+            incident = [(i, v, r, w) for v, r, w in zip(targets, rels, weights)]
+            sources, rels, weights = store.in_edges(i)
+            incident += [(u, i, r, w) for u, r, w in zip(sources, rels, weights)]
+            for u, v, r, w in incident:
+                if (u, v) in seen_edges:
+                    continue
+                seen_edges.add((u, v))
+                u, v = store.nodes[u], store.nodes[v]
+                edges.append(self.edge_to_dict(u, v, store.relations[r], w))
+                for node in (u, v):
+                    if node not in nodes:
+                        nodes[node] = {"id": str(node), "label": str(node)}
+        return {"nodes": list(nodes.values()), "edges": edges, "total": result["total"]}
 
     def query_relation(self, entity: str) -> List[Dict]:
         """查询实体相关关系"""
-        if entity not in self.G.nodes:
+        store = self.store
+        i = store.id_of(entity)
+        if i is None:
             return []
         
         results = []
+        names, relations = store.nodes, store.relations
         # 出边（实体作为源节点）
-        for neighbor in self.G.successors(entity):
-            edge_data = self.G[entity][neighbor]
+        for neighbor, r, w in zip(*store.out_edges(i)):
             results.append({
                 "source": entity,
-                "relation": edge_data['relation'],
-                "target": neighbor,
-                "weight": edge_data['weight']
+                "relation": relations[r],
+                "target": names[neighbor],
+                "weight": w
             })
         # 入边（实体作为目标节点）
-        for neighbor in self.G.predecessors(entity):
-            edge_data = self.G[neighbor][entity]
+        for neighbor, r, w in zip(*store.in_edges(i)):
             results.append({
-                "source": neighbor,
-                "relation": edge_data['relation'],
+                "source": names[neighbor],
+                "relation": relations[r],
                 "target": entity,
-                "weight": edge_data['weight']
+                "weight": w
             })
         return results
 
-    def answer_question(self, question: str, mode: str = "quick") -> Dict:
-        """使用DeepSeek大模型回答问题，结合知识图谱数据增强"""
-        # 提取问题中的核心实体
-        entities = [node for node in self.G.nodes if node in question]
-        related_data = []
-        if entities:
-            main_entity = max(entities, key=lambda x: len(x))
-            related_data = self.query_relation(main_entity)
-    
-        # 构建知识图谱上下文
-        kg_context = ""
-        if related_data:
-            kg_context = "根据知识图谱，我获取到以下相关信息：\n"
-            for item in related_data:
-                kg_context += f"- {item['source']} {item['relation']} {item['target']}（相关度：{item['weight']}/10）\n"
-    
+    def build_context(self, question: str, budget: Optional[int] = None, mode: str = "quick",
+                      state: Optional[GraphState] = None) -> Dict:
+        """问答的图谱上下文：问题中全部实体的多跳关系按相关度打分，在 token 预算内选取
+
+        budget 为空时使用 mode 对应的预算（CONTEXT_BUDGET_QUICK / CONTEXT_BUDGET_DEEP）。
+        返回 entities（问题中的实体）、facts（选中的关系）、text（提示词中的上下文）、tokens（估算 token 数）等。
+        """
+        state = self.state if state is None else state
+        with stage("entity_extraction"):
+            entities = list(dict.fromkeys(m["entity"] for m in state.entity_matcher.extract(question)))
+        if budget is None:
+            budget = self.context_budgets.get(mode, self.context_budgets["quick"])
+        with stage("context_retrieval"):
+            context = ContextRetriever(state.store, **self.context_options).retrieve(question, entities, budget)
+        context["entities"] = entities
+        return context
+
+    def _prepare_question(self, question: str, mode: str) -> Dict:
+        """问答前的图谱检索：实体、关联关系、上下文、提示词与缓存键"""
+        context = self.build_context(question, mode=mode)
+        entities = context["entities"]
+        # 推荐以问题中最长的实体为中心
+        main_entity = max(entities, key=len) if entities else None
+        related_data = context["facts"]
+        kg_context = context["text"]
+
         # 根据模式调整提示词和超时时间
         if mode == "quick":
             # 快速回答提示词
@@ -152,105 +608,207 @@ class FrontendKnowledgeGraph:
 问题：{question}
 """
             timeout = 200  # 深度回答超时时间（秒）
-    
-        # 调用DeepSeek API
-        try:
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {self.deepseek_api_key}"
-            }
-        
-            data = {
-                "model": "deepseek-chat",
-                "messages": [
-                    {"role": "system", "content": "你是一个前端技术专家，擅长解答各种前端技术问题。"},
-                    {"role": "user", "content": prompt}
-                ],
+
+        return {
+            "entities": entities,
+            "main_entity": main_entity,
+            "related_data": related_data,
+            "messages": [
+                {"role": "system", "content": "你是一个前端技术专家，擅长解答各种前端技术问题。"},
+                {"role": "user", "content": prompt}
+            ],
+            "options": {
+                "timeout": timeout,  # 使用根据模式设置的超时时间
                 "temperature": 0.7 if mode == "deep" else 0.3,  # 深度回答温度更高
                 "max_tokens": 3000 if mode == "deep" else 300   # 深度回答字数更多
-            }
-        
-            response = requests.post(
-                self.deepseek_api_url,
-                headers=headers,
-                json=data,
-                timeout=timeout  # 使用根据模式设置的超时时间
-            )
-        
-            response.raise_for_status()
-            answer_markdown = response.json()["choices"][0]["message"]["content"]
-            answer = markdown.markdown(
-                answer_markdown,
+            },
+            "cache_key": make_key("qa", normalize_question(question), mode, context_hash(kg_context)),
+        }
+
+    @staticmethod
+    def render_markdown(text: str) -> str:
+        """将大模型返回的 Markdown 渲染为 HTML"""
+        with stage("markdown"):
+            return markdown.markdown(
+                text,
                 extensions=[
                     'extra',
                     'codehilite'
                 ]
             )
-        
-        except Exception as e:
-            print(f"DeepSeek API调用失败: {str(e)}")
-            # fallback逻辑
-            answer = "抱歉，暂时无法获取回答。"
-            if related_data:
-                answer_parts = [f"<h4>关于「{main_entity}」的相关知识：</h4>"]
-                for item in related_data:
-                    answer_parts.append(f"<p>- {item['source']} <strong>{item['relation']}</strong> {item['target']}（相关度：{item['weight']}/10）</p>")
-                answer = "\n".join(answer_parts)
-            else:
-                answer = "<p>抱歉，暂时无法获取回答。</p>"
-    
-        # 生成推荐
-        recommendations = []
-        if related_data:
-            for item in sorted(related_data, key=lambda x: x['weight'], reverse=True)[:5]:
-                recommendations.append({
-                    "entity": item['target'] if item['source'] == main_entity else item['source'],
-                    "reason": f"{item['source']} {item['relation']} {item['target']}",
-                    "weight": int(item['weight'])
-                })
-    
+
+    def _cache_answer(self, ctx: Dict, answer_markdown: str) -> str:
+        """渲染答案并写入缓存，返回 HTML"""
+        answer = self.render_markdown(answer_markdown)
+        if answer_markdown:
+            self.answer_cache.set(ctx["cache_key"], {"markdown": answer_markdown, "html": answer})
+        return answer
+
+    @staticmethod
+    def _record_fallback(feature: str, error: BaseException):
+        """记录一次降级（改用图谱兜底结果）及其原因"""
+        if isinstance(error, CircuitOpenError):
+            reason = "circuit_open"
+        elif isinstance(error, QueueTimeoutError):
+            reason = "queue_timeout"
+        elif isinstance(error, ValueError):
+            reason = "invalid_response"
+        else:
+            reason = outcome_of(error)
+        LLM_FALLBACKS.inc(feature, reason)
+
+    @staticmethod
+    def _fallback_answer(ctx: Dict) -> str:
+        """大模型不可用时，仅用图谱数据拼出的兜底答案"""
+        related_data = ctx["related_data"]
+        if not related_data:
+            return "<p>抱歉，暂时无法获取回答。</p>"
+        answer_parts = [f"<h4>关于「{'、'.join(ctx['entities'])}」的相关知识：</h4>"]
+        for item in related_data:
+            answer_parts.append(f"<p>- {item['source']} <strong>{item['relation']}</strong> {item['target']}（相关度：{item['weight']}/10）</p>")
+        return "\n".join(answer_parts)
+
+    def _answer_recommendations(self, ctx: Dict) -> List[Dict]:
+        # 生成推荐（取推荐引擎的前 5 个）
+        main_entity = ctx["main_entity"]
+        if not main_entity:
+            return []
+        return [
+            {
+                "entity": item["entity"],
+                "reason": item["sentence"] or self._indirect_reason(main_entity, item),
+                "weight": item["weight"]
+            }
+            for item in self.recommender.recommend(main_entity, limit=5)
+        ]
+
+    @staticmethod
+    def _indirect_reason(entity: str, item: Dict) -> str:
+        if item["via"]:
+            return f"{entity} → {item['via']} → {item['entity']}"
+        return f"{entity} → … → {item['entity']}"
+
+    def _build_answer(self, ctx: Dict, answer: str) -> Dict:
         return {
             "answer": answer,
-            "related_entities": entities,
-            "recommendations": recommendations
+            "related_entities": ctx["entities"],
+            "recommendations": self._answer_recommendations(ctx)
         }
-    #基于图谱结构的快速推荐
-    def get_simple_recommendations(self, entity: str) -> List[Dict]:
-        if entity not in self.G.nodes:
-            return []
-        # 获取所有关联节点（出边和入边）
-        related_data = self.query_relation(entity)
-        recommendations = []
-        # 按权重降序排序，取前 8 个
-        for item in sorted(related_data, key=lambda x: x['weight'], reverse=True)[:8]:
-            # 确定推荐的目标节点名字
-            target_name = item['target'] if item['source'] == entity else item['source']
-            recommendations.append({
-                "entity": target_name,
-                "desc": f"与【{entity}】存在 {item['relation']} 关系",
-                "weight": int(item['weight']),
-                "reason": item['relation']
-            })
-            
-        return recommendations
-    def get_learning_path(self, entity: str) -> Dict:
-        """
-        利用 LLM 生成智能学习路径
+
+    def answer_question(self, question: str, mode: str = "quick") -> Dict:
+        """使用DeepSeek大模型回答问题，结合知识图谱数据增强"""
+        ctx = self._prepare_question(question, mode)
+        # 命中缓存则直接使用已渲染的答案，不再调用大模型
+        cached = self.answer_cache.get(ctx["cache_key"])
+        if cached is not None:
+            return self._build_answer(ctx, cached["html"])
+        try:
+            with stage("llm"):
+                answer_markdown = self.llm_guard.call(
+                    ctx["cache_key"], lambda: self.llm.chat(ctx["messages"], **ctx["options"])
+                )
+            answer = self._cache_answer(ctx, answer_markdown)
+        except Exception as e:
+            print(f"DeepSeek API调用失败: {str(e)}")
+            self._record_fallback("qa", e)
+            answer = self._fallback_answer(ctx)
+        return self._build_answer(ctx, answer)
+
+    async def answer_question_async(self, question: str, mode: str = "quick") -> Dict:
+        """answer_question 的异步版本，使用共享连接池，不占用线程池"""
+        # 实体匹配、上下文检索等 CPU 密集的准备工作放到线程池，不阻塞事件循环
+        ctx = await run_in_threadpool(self._prepare_question, question, mode)
+        cached = self.answer_cache.get(ctx["cache_key"])
+        if cached is not None:
+            return self._build_answer(ctx, cached["html"])
+        try:
+            with stage("llm"):
+                answer_markdown = await self.llm_guard.acall(
+                    ctx["cache_key"], lambda: self.llm.achat(ctx["messages"], **ctx["options"])
+                )
+            answer = self._cache_answer(ctx, answer_markdown)
+        except Exception as e:
+            print(f"DeepSeek API调用失败: {str(e)}")
+            self._record_fallback("qa", e)
+            answer = self._fallback_answer(ctx)
+        return self._build_answer(ctx, answer)
+
+    async def stream_answer(self, question: str, mode: str = "quick") -> AsyncIterator[Tuple[str, Dict]]:
+        """流式问答，依次产出 (事件名, 数据)：
+
+        - meta：相关实体与推荐（纯图谱数据，立即返回）
+        - token：大模型的增量文本（Markdown 原文）
+        - done：完整答案渲染后的 HTML（失败时为兜底答案）
         """
-        if not self.deepseek_api_key or not entity:
-            return None
+        # 实体匹配、上下文检索等 CPU 密集的准备工作放到线程池，不阻塞事件循环
+        ctx = await run_in_threadpool(self._prepare_question, question, mode)
+        yield "meta", {
+            "related_entities": ctx["entities"],
+            "recommendations": self._answer_recommendations(ctx)
+        }
+        cached = self.answer_cache.get(ctx["cache_key"])
+        if cached is not None:
+            yield "done", {"answer": cached["html"]}
+            return
+        parts = []
+        try:
+            with stage("llm"):
+                # 相同问题正在回答时不重复调用，等待完整答案后作为一段 token 返回
+                async for delta in self.llm_guard.astream(
+                    ctx["cache_key"], lambda: self.llm.astream(ctx["messages"], **ctx["options"])
+                ):
+                    parts.append(delta)
+                    yield "token", {"delta": delta}
+            answer = self._cache_answer(ctx, "".join(parts))
+        except Exception as e:
+            print(f"DeepSeek API流式调用失败: {str(e)}")
+            self._record_fallback("qa_stream", e)
+            answer = self._fallback_answer(ctx)
+        yield "done", {"answer": answer}
+
+    #基于图谱结构的快速推荐（预计算的个性化 PageRank 结果，直接查表）
+    def get_simple_recommendations(self, entity: str, limit: int = 8) -> List[Dict]:
+        return [self._format_recommendation(entity, item) for item in self.recommender.recommend(entity, limit)]
+
+    def get_batch_recommendations(self, entities: List[str], limit: int = 10) -> List[Dict]:
+        """多个实体（例如搜索历史）的合并推荐，已去重并排除输入实体"""
+        results = []
+        for item in self.recommender.recommend_many(entities, limit):
+            rec = self._format_recommendation(item["source"], item)
+            rec["sources"] = item["sources"]
+            results.append(rec)
+        return results
+
+    def _format_recommendation(self, entity: str, item: Dict) -> Dict:
+        if item["relation"] is not None:
+            desc = f"与【{entity}】存在 {item['relation']} 关系"
+            reason = item["relation"]
+        elif item["via"]:
+            desc = f"经由【{item['via']}】与【{entity}】间接关联"
+            reason = "间接关联"
+        else:
+            desc = f"与【{entity}】在图谱中相近"
+            reason = "多跳关联"
+        return {
+            "entity": item["entity"],
+            "desc": desc,
+            "weight": item["weight"],
+            "reason": reason,
+            "score": item["score"]
+        }
 
-        #  获取上下文：当前实体的邻居节点（作为参考）
-        neighbors = list(self.G.successors(entity)) + list(self.G.predecessors(entity))
-        # 限制数量防止 token 溢出
-        neighbors_str = ", ".join([str(n) for n in neighbors[:20]])
+    def _prepare_learning_path(self, entity: str, plan: Dict) -> Dict:
+        """大模型润色学习路径的提示词与缓存键（以图谱规划结果作为参考）"""
+        plan_str = json.dumps(
+            {k: plan[k] for k in ("prerequisites", "core", "next_steps")}, ensure_ascii=False
+        )
 
         #构建 Prompt：要求返回严格的 JSON 格式
         prompt = f"""
         你是一位计算机科学教育专家。用户当前正在学习前端技术知识点：「{entity}」。
-        图谱中与它相关的概念有：{neighbors_str}。
+        根据知识图谱的关系推导出的学习路径如下：{plan_str}。
 
-        请结合这些相关概念和你的专业知识，为用户规划一条科学的学习路径。
+        请在这条路径的基础上，结合你的专业知识调整顺序、补充说明，为用户规划一条科学的学习路径。
         
         【重要】请严格按照以下 JSON 格式直接返回数据，不要包含 Markdown 标记（如 ```json ... ```）：
         {{
@@ -266,69 +824,153 @@ class FrontendKnowledgeGraph:
             ]
         }}
         """
+        return {
+            "plan": plan,
+            "messages": [
+                {"role": "system", "content": "你是一个严谨的教育规划助手，只输出 JSON 数据。"},
+                {"role": "user", "content": prompt}
+            ],
+            "options": {
+                "timeout": 60,
+                "temperature": 0.3, # 降低温度保证格式稳定
+                "response_format": { "type": "json_object" } # 强制 JSON 模式 (如果 DeepSeek 支持)
+            },
+            # 同一实体、同一规划结果的润色结果直接复用
+            "cache_key": make_key("learning-path", entity, context_hash(plan_str)),
+        }
+
+    def _parse_learning_path(self, ctx: Dict, content: str) -> Dict:
+        # 清理一下可能存在的 Markdown 标记
+        content = re.sub(r'^```json\s*', '', content)
+        content = re.sub(r'^```\s*', '', content)
+        content = re.sub(r'\s*```$', '', content)
+
+        path_data = json.loads(content)
+        # 结构不对时不缓存，沿用图谱规划结果
+        if not (isinstance(path_data, dict) and isinstance(path_data.get("core"), dict)
+                and isinstance(path_data.get("prerequisites"), list)
+                and isinstance(path_data.get("next_steps"), list)):
+            raise ValueError("大模型返回的学习路径格式不正确")
+        path_data["source"] = "llm"
+        self.answer_cache.set(ctx["cache_key"], path_data)
+        return path_data
+
+    def get_learning_path(self, entity: str) -> Dict:
+        """
+        学习路径：优先返回已缓存的大模型润色结果，否则直接返回图谱规划结果（不等待大模型）
+        """
+        if not entity:
+            return None
+        state = self.state
+        plan = state.path_planner.plan(entity)
+        if entity not in state.store:
+            return plan
+        cached = self.answer_cache.get(self._prepare_learning_path(entity, plan)["cache_key"])
+        return cached if cached is not None else plan
+
+    def enrich_learning_path(self, entity: str) -> Dict:
+        """
+        利用 LLM 润色学习路径（可选步骤），失败时返回图谱规划结果
+        """
+        state = self.state
+        plan = state.path_planner.plan(entity)
+        if not self.deepseek_api_key or entity not in state.store:
+            return plan
+
+        ctx = self._prepare_learning_path(entity, plan)
+        cached = self.answer_cache.get(ctx["cache_key"])
+        if cached is not None:
+            return cached
 
         # 调用 DeepSeek
         try:
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {self.deepseek_api_key}"
-            }
-            data = {
-                "model": "deepseek-chat",
-                "messages": [
-                    {"role": "system", "content": "你是一个严谨的教育规划助手，只输出 JSON 数据。"},
-                    {"role": "user", "content": prompt}
-                ],
-                "temperature": 0.3, # 降低温度保证格式稳定
-                "response_format": { "type": "json_object" } # 强制 JSON 模式 (如果 DeepSeek 支持)
-            }
-            
-            response = requests.post(
-                self.deepseek_api_url,
-                headers=headers,
-                json=data,
-                timeout=60
+            content = self.llm_guard.call(
+                ctx["cache_key"], lambda: self.llm.chat(ctx["messages"], **ctx["options"])
             )
-            response.raise_for_status()
-            
-            content = response.json()["choices"][0]["message"]["content"]
-            
-            # 清理一下可能存在的 Markdown 标记
-            import re
-            import json
-            content = re.sub(r'^```json\s*', '', content)
-            content = re.sub(r'^```\s*', '', content)
-            content = re.sub(r'\s*```$', '', content)
-            
-            return json.loads(content)
+            return self._parse_learning_path(ctx, content)
+        except Exception as e:
+            print(f"学习路径润色失败: {e}")
+            self._record_fallback("learning_path", e)
+            return plan
+
+    async def enrich_learning_path_async(self, entity: str) -> Dict:
+        """enrich_learning_path 的异步版本"""
+        state = self.state
+        plan = await run_in_threadpool(state.path_planner.plan, entity)
+        if not self.deepseek_api_key or entity not in state.store:
+            return plan
 
+        ctx = self._prepare_learning_path(entity, plan)
+        cached = self.answer_cache.get(ctx["cache_key"])
+        if cached is not None:
+            return cached
+
+        try:
+            content = await self.llm_guard.acall(
+                ctx["cache_key"], lambda: self.llm.achat(ctx["messages"], **ctx["options"])
+            )
+            return self._parse_learning_path(ctx, content)
         except Exception as e:
-            print(f"学习路径生成失败: {e}")
-            # 失败时的兜底数据
-            return {
-                "prerequisites": [{"name": "HTML/CSS/JS", "desc": "前端基础三件套"}],
-                "core": {"name": entity, "desc": "当前选中知识点"},
-                "next_steps": [{"name": "Vue/React", "desc": "现代前端框架"}]
-            }
+            print(f"学习路径润色失败: {e}")
+            self._record_fallback("learning_path", e)
+            return plan
     
 
-    def get_graph_data(self) -> Dict:
+    def get_graph_data(self, state: Optional[GraphState] = None) -> Dict:
         """获取全部图谱可视化数据（用于全屏模式）"""
-        nodes = []
-        for node in self.G.nodes:
-            nodes.append({
-                "id": str(node),  # 确保id为字符串
-                "label": str(node)
-            })
+        state = self.state if state is None else state
+        store = state.store
+        # 确保id为字符串；布局算完后附带坐标，前端可以跳过物理模拟
+        positions = state.layout.positions
+        if positions is None:
+            nodes = [{"id": str(node), "label": str(node)} for node in store.nodes]
+        else:
+            nodes = [self.node_to_dict(node, xy) for node, xy in zip(store.nodes, positions.tolist())]
         
-        edges = []
-        for u, v, data in self.G.edges(data=True):
-            edges.append({
-                "from": str(u),   # 确保from/to为字符串
-                "to": str(v),
-                "label": str(data.get('relation', '')),
-                "weight": int(data.get('weight', 0)),
-                "relation": str(data.get('relation', ''))  # 兼容前端的relation字段
-            })
+        names, relations = store.nodes, store.relations
+        src, dst, rels, weights = store.edge_lists()
+        # 兼容前端的relation字段
+        edges = [
+            self.edge_to_dict(names[u], names[v], relations[r], w)
+            for u, v, r, w in zip(src, dst, rels, weights)
+        ]
         
-        return {"nodes": nodes, "edges": edges}
\ No newline at end of file
+        return {"nodes": nodes, "edges": edges}
+
+    def get_graph_payload(self, state: Optional[GraphState] = None) -> EncodedArrays:
+        """全量图谱数据的分片编码（每个版本生成一次），拼接结果与直接编码 get_graph_data() 相同"""
+        state = self.state if state is None else state
+        ready = state.layout.is_ready()
+        if state.full_payload is None:
+            state.full_payload = EncodedArrays.encode(self.get_graph_data(state))
+            state.full_payload_layout = ready
+        elif ready and not state.full_payload_layout:
+            # 布局刚算完：只重新编码节点，边的编码沿用
+            positions = state.layout.positions.tolist()
+            state.full_payload = state.full_payload.replace(
+                nodes=[dumps(self.node_to_dict(node, xy)) for node, xy in zip(state.store.nodes, positions)]
+            )
+            state.full_payload_layout = True
+        return state.full_payload
+
+    def _updated_full_payload(self, payload: Optional[EncodedArrays], update: EdgeUpdate,
+                              layout: GraphLayout) -> Optional[EncodedArrays]:
+        """增量更新后的全量图谱编码：沿用未变化节点与边的编码，只编码新增 / 变化的部分"""
+        if payload is None:
+            return None
+        store = update.store
+        names, relations = store.nodes, store.relations
+        added = range(update.old_num_nodes, store.num_nodes)
+        if layout.is_ready():
+            new_nodes = [self.node_to_dict(names[i], layout.positions[i].tolist()) for i in added]
+        else:
+            new_nodes = [{"id": str(names[i]), "label": str(names[i])} for i in added]
+        node_parts = payload.arrays["nodes"] + [dumps(node) for node in new_nodes]
+        old_edges = payload.arrays["edges"]
+        edge_parts = [old_edges[o] if o >= 0 else None for o in update.origin.tolist()]
+        for i in np.nonzero(update.origin < 0)[0].tolist():
+            u = int(np.searchsorted(store.out_indptr, i, side="right")) - 1
+            edge_parts[i] = dumps(self.edge_to_dict(
+                names[u], names[store.out_indices[i]], relations[store.out_relations[i]], store.out_weights[i]
+            ))
+        return payload.replace(nodes=node_parts, edges=edge_parts)
@@ -0,0 +1,178 @@
+import heapq
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from graph_store import GraphStore
+
+# 默认的关系分类（来自内置的前端知识图谱），可通过 LEARNING_PATH_PREREQUISITE / LEARNING_PATH_ASSOCIATIVE 覆盖
+# 「A 关系 B」表示 B 是 A 的前置知识的关系（例如：Vue 基于 JavaScript）
+PREREQUISITE_RELATIONS = frozenset({
+    "基于", "依赖", "服务于", "模板语言", "JSX语法", "操作对象", "修改样式", "编译目标",
+})
+# 没有先后顺序（或数据中两个方向都出现）的关系，规划时忽略
+ASSOCIATIVE_RELATIONS = frozenset({
+    "关联", "关联特性", "关联机制", "超集", "适配", "适配框架", "增强工具",
+})
+# 其余关系按「A 包含 / 延伸出 B」处理：先学 A，再学 B
+
+
+class LearningPathPlanner:
+    """基于图谱结构的学习路径规划（不依赖大模型）
+
+    按关系类型把边转换为「先学 → 后学」的方向，从当前实体出发做带跳数上限的加权最短路
+    （权重越高距离越短），前置知识取祖先集合、进阶方向取后代集合，再在各自集合内做拓扑排序。
+    结果按实体缓存，每个图谱版本一个规划器实例。
+
+    关系分类只认 prerequisite_relations（目标先于源）与 associative_relations（忽略）中列出的名称，
+    其余关系（包括通过增量接口或合成图谱新增的关系）一律按「源先于目标」处理。
+    """
+
+    def __init__(self, store: GraphStore, max_depth: int = 3, max_items: int = 5, cache_size: int = 4096,
+                 prerequisite_relations: Iterable[str] = PREREQUISITE_RELATIONS,
+                 associative_relations: Iterable[str] = ASSOCIATIVE_RELATIONS):
+        self.store = store
+        self.max_depth = max_depth
+        self.max_items = max_items
+        self.cache_size = cache_size
+        prerequisite_relations = frozenset(prerequisite_relations)
+        associative_relations = frozenset(associative_relations)
+        # 每种关系的方向：1 表示源先于目标，-1 表示目标先于源，0 表示忽略
+        self._direction = [
+            -1 if name in prerequisite_relations else 0 if name in associative_relations else 1
+            for name in store.relations
+        ]
+        self._cache: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _ordered_neighbors(self, node: int, forward: bool):
+        """产出 (邻居, 权重, 源, 关系编码, 目标)；forward 时邻居应在 node 之后学习，否则在之前"""
+        store, direction = self.store, self._direction
+        want = 1 if forward else -1
+        for v, r, w in zip(*store.out_edges(node)):
+            if direction[r] == want:
+                yield v, w, node, r, v
+        for u, r, w in zip(*store.in_edges(node)):
+            if direction[r] == -want:
+                yield u, w, u, r, node
+
+    def _search(self, root: int, forward: bool) -> Dict[int, Tuple[float, int, tuple]]:
+        """带跳数上限的 Dijkstra，返回 {节点: (距离, 跳数, 发现它的边)}
+
+        节点第一次出堆时距离最短；之后只有跳数更少的到达才会再次展开，
+        保证跳数上限内能到达的节点不会因为较短路径先用完跳数而漏掉。
+        """
+        settled = {}
+        # 节点已展开时的最少跳数
+        best_hops: Dict[int, int] = {}
+        heap = [(0.0, 0, root, None)]
+        while heap:
+            cost, hops, node, edge = heapq.heappop(heap)
+            if best_hops.get(node, self.max_depth + 1) <= hops:
+                continue
+            best_hops[node] = hops
+            if node not in settled:
+                settled[node] = (cost, hops, edge)
+            if hops >= self.max_depth:
+                continue
+            for neighbor, w, u, r, v in self._ordered_neighbors(node, forward):
+                if best_hops.get(neighbor, self.max_depth + 1) > hops + 1:
+                    heapq.heappush(heap, (cost + 1.0 / max(w, 1), hops + 1, neighbor, (u, r, v, node)))
+        del settled[root]
+        return settled
+
+    def _topological(self, nodes: List[int], priority: Dict[int, float]) -> List[int]:
+        """集合内按「先学 → 后学」拓扑排序，可选节点中 priority 小的优先；遇到环时取 priority 最小的节点"""
+        members = set(nodes)
+        successors = {n: set() for n in nodes}
+        indegree = {n: 0 for n in nodes}
+        for n in nodes:
+            for m, *_ in self._ordered_neighbors(n, forward=True):
+                if m in members and m != n and m not in successors[n]:
+                    successors[n].add(m)
+                    indegree[m] += 1
+        heap = [(priority[n], n) for n in nodes if indegree[n] == 0]
+        heapq.heapify(heap)
+        order, done = [], set()
+        while len(order) < len(nodes):
+            if not heap:
+                # 有环：从剩余节点中挑一个继续
+                rest = min((priority[n], n) for n in nodes if n not in done)
+                heap.append(rest)
+            _, n = heapq.heappop(heap)
+            if n in done:
+                continue
+            done.add(n)
+            order.append(n)
+            for m in successors[n]:
+                indegree[m] -= 1
+                if indegree[m] == 0 and m not in done:
+                    heapq.heappush(heap, (priority[m], m))
+        return order
+
+    def _describe(self, entity: str, found: Tuple[float, int, tuple], prerequisite: bool) -> str:
+        store = self.store
+        _, hops, (u, r, v, via) = found
+        sentence = f"{store.nodes[u]} {store.relations[r]} {store.nodes[v]}"
+        if hops == 1:
+            return f"学习「{entity}」的基础：{sentence}" if prerequisite else f"学完「{entity}」后可深入：{sentence}"
+        kind = "间接前置" if prerequisite else "进阶方向"
+        return f"{kind}（{hops} 跳，经由「{store.nodes[via]}」）：{sentence}"
+
+    def _plan(self, entity: str) -> Dict:
+        store = self.store
+        root = store.id_of(entity)
+        if root is None:
+            return {
+                "prerequisites": [],
+                "core": {"name": entity, "desc": "图谱中暂无该知识点的关联信息"},
+                "next_steps": [],
+                "source": "graph"
+            }
+        before = self._search(root, forward=False)
+        after = self._search(root, forward=True)
+        # 成环的节点只保留在距离更近的一侧
+        for node in set(before) & set(after):
+            if before[node][0] <= after[node][0]:
+                del after[node]
+            else:
+                del before[node]
+
+        closest = lambda found: sorted(found, key=lambda n: (found[n][0], n))[:self.max_items]
+        prerequisites = closest(before)
+        next_steps = closest(after)
+        # 前置知识：越基础（距离越远）越靠前；进阶方向：越近越靠前
+        prerequisites = self._topological(prerequisites, {n: -before[n][0] for n in prerequisites})
+        next_steps = self._topological(next_steps, {n: after[n][0] for n in next_steps})
+
+        direct = [n for n in next_steps if after[n][1] == 1][:3]
+        core_desc = f"重点掌握：{'、'.join(store.nodes[n] for n in direct)}" if direct else "当前选中知识点"
+        return {
+            "prerequisites": [
+                {"name": store.nodes[n], "desc": self._describe(entity, before[n], True)} for n in prerequisites
+            ],
+            "core": {"name": entity, "desc": core_desc},
+            "next_steps": [
+                {"name": store.nodes[n], "desc": self._describe(entity, after[n], False)} for n in next_steps
+            ],
+            "source": "graph"
+        }
+
+    def plan(self, entity: str) -> Dict:
+        """规划学习路径，返回与大模型版本相同的 JSON 结构（附加 source 字段）"""
+        with self._lock:
+            cached = self._cache.get(entity)
+            if cached is not None:
+                self._cache.move_to_end(entity)
+                return cached
+        result = self._plan(entity)
+        with self._lock:
+            self._cache[entity] = result
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    def precompute(self, entities: Optional[List[str]] = None):
+        """预先计算（默认全部实体），可在后台线程中调用"""
+        for entity in entities if entities is not None else self.store.nodes:
+            self.plan(entity)
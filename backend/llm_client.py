@@ -0,0 +1,159 @@
+import asyncio
+import json
+import os
+import time
+from contextlib import contextmanager
+from typing import AsyncIterator, Dict, List, Optional
+
+import httpx
+
+from metrics import LLM_SECONDS, LLM_TOKENS, LLM_TTFT_SECONDS
+
+
+def outcome_of(error: BaseException) -> str:
+    """失败原因的简短分类，用作指标标签"""
+    if isinstance(error, httpx.TimeoutException):
+        return "timeout"
+    if isinstance(error, httpx.HTTPStatusError):
+        return f"http_{error.response.status_code}"
+    if isinstance(error, httpx.TransportError):
+        return "connection"
+    return "error"
+
+
+@contextmanager
+def _timed(kind: str):
+    """记录一次调用的往返耗时与结果（ok / timeout / http_xxx / error）"""
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except (GeneratorExit, asyncio.CancelledError):
+        outcome = "cancelled"
+        raise
+    except Exception as e:
+        outcome = outcome_of(e)
+        raise
+    finally:
+        LLM_SECONDS.observe(time.perf_counter() - start, kind, outcome)
+
+
+class LLMClient:
+    """OpenAI 兼容接口（DeepSeek）的客户端
+
+    同步与异步各持有一个连接池，所有请求共享，复用 TCP/TLS 连接（keep-alive）。
+    """
+
+    def __init__(self, api_url: Optional[str], api_key: Optional[str],
+                 model: str = "deepseek-chat", max_connections: int = 20,
+                 max_keepalive: int = 10):
+        self.api_url = api_url
+        self.api_key = api_key
+        self.model = model
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+        )
+        self._headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {api_key}"
+        }
+        self._client: Optional[httpx.Client] = None
+        self._async_client: Optional[httpx.AsyncClient] = None
+
+    @classmethod
+    def from_env(cls) -> "LLMClient":
+        return cls(
+            api_url=os.getenv("DEEPSEEK_API_URL"),
+            api_key=os.getenv("DEEPSEEK_API_KEY"),
+            model=os.getenv("DEEPSEEK_MODEL", "deepseek-chat"),
+            max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "20")),
+            max_keepalive=int(os.getenv("LLM_MAX_KEEPALIVE", "10")),
+        )
+
+    @property
+    def client(self) -> httpx.Client:
+        if self._client is None:
+            self._client = httpx.Client(headers=self._headers, limits=self._limits)
+        return self._client
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        # 延迟创建，保证绑定到 uvicorn 的事件循环
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(headers=self._headers, limits=self._limits)
+        return self._async_client
+
+    def _payload(self, messages: List[Dict], stream: bool = False, **options) -> Dict:
+        payload = {"model": self.model, "messages": messages}
+        payload.update({k: v for k, v in options.items() if v is not None})
+        if stream:
+            payload["stream"] = True
+            # 流式响应的最后一块附带 usage，用于统计 token 数
+            payload["stream_options"] = {"include_usage": True}
+        return payload
+
+    @staticmethod
+    def _record_usage(body: Dict):
+        usage = body.get("usage") or {}
+        for kind in ("prompt_tokens", "completion_tokens"):
+            if usage.get(kind):
+                LLM_TOKENS.inc(kind.split("_")[0], amount=usage[kind])
+
+    @classmethod
+    def _content(cls, body: Dict) -> str:
+        cls._record_usage(body)
+        return body["choices"][0]["message"]["content"]
+
+    def chat(self, messages: List[Dict], timeout: float = 60, **options) -> str:
+        """同步调用，返回完整回复文本"""
+        with _timed("chat"):
+            response = self.client.post(self.api_url, json=self._payload(messages, **options), timeout=timeout)
+            response.raise_for_status()
+            return self._content(response.json())
+
+    async def achat(self, messages: List[Dict], timeout: float = 60, **options) -> str:
+        """异步调用，返回完整回复文本"""
+        with _timed("chat"):
+            response = await self.async_client.post(self.api_url, json=self._payload(messages, **options), timeout=timeout)
+            response.raise_for_status()
+            return self._content(response.json())
+
+    async def astream(self, messages: List[Dict], timeout: float = 60, **options) -> AsyncIterator[str]:
+        """异步流式调用，逐个产出增量文本（解析 SSE 的 data: 行）"""
+        payload = self._payload(messages, stream=True, **options)
+        start = time.perf_counter()
+        first = True
+        with _timed("stream"):
+            async with self.async_client.stream("POST", self.api_url, json=payload, timeout=timeout) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    if not data:
+                        continue
+                    body = json.loads(data)
+                    self._record_usage(body)
+                    choices = body.get("choices") or []
+                    if not choices:
+                        continue
+                    delta = choices[0].get("delta") or {}
+                    if delta.get("content"):
+                        if first:
+                            LLM_TTFT_SECONDS.observe(time.perf_counter() - start)
+                            first = False
+                        yield delta["content"]
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    async def aclose(self):
+        self.close()
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
@@ -0,0 +1,355 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+
+class CircuitOpenError(Exception):
+    """熔断器处于打开状态，跳过大模型调用"""
+
+
+class QueueTimeoutError(Exception):
+    """等待并发名额超时"""
+
+
+class CircuitBreaker:
+    """基于滑动窗口错误率的熔断器
+
+    closed：正常放行，窗口内错误率超过阈值后转为 open；
+    open：直接拒绝，reset_timeout 秒后转为 half_open；
+    half_open：只放行少量探测请求，成功则恢复 closed，失败则重新 open。
+    """
+
+    def __init__(self, threshold: float = 0.5, min_calls: int = 5, window: int = 20,
+                 reset_timeout: float = 30, half_open_max: int = 1):
+        self.threshold = threshold
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self.half_open_max = half_open_max
+        self.state = "closed"
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._half_opened_at = 0.0
+        self._probes = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "open":
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self._half_open()
+            if self.state == "half_open":
+                if self._probes >= self.half_open_max:
+                    # 探测请求迟迟没有结果（排队超时、被取消）时，允许重新探测
+                    if time.monotonic() - self._half_opened_at < self.reset_timeout:
+                        return False
+                    self._half_open()
+                self._probes += 1
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self.state == "half_open":
+                self.state = "closed"
+                self._outcomes.clear()
+            self._outcomes.append(True)
+
+    def record_failure(self):
+        with self._lock:
+            if self.state == "half_open":
+                self._trip()
+                return
+            self._outcomes.append(False)
+            failures = self._outcomes.count(False)
+            if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.threshold:
+                self._trip()
+
+    def _half_open(self):
+        self.state = "half_open"
+        self._half_opened_at = time.monotonic()
+        self._probes = 0
+
+    def _trip(self):
+        self.state = "open"
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = len(self._outcomes)
+            failures = self._outcomes.count(False)
+            return {
+                "state": self.state,
+                "window_calls": total,
+                "window_error_rate": round(failures / total, 4) if total else 0.0,
+            }
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class _Waiter:
+    def __init__(self, event: Optional[threading.Event] = None, future: Optional[asyncio.Future] = None,
+                 loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.event = event
+        self.future = future
+        self.loop = loop
+        self.granted = False
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(True)
+
+
+class _Slots:
+    """线程与事件循环共用的并发名额，等待者按先来先得排队
+
+    归还名额时直接交给队首的等待者（线程用 Event 唤醒，协程用 call_soon_threadsafe 唤醒），不需要轮询；
+    等待者超时或被取消时从队列中移除，若名额恰好已经交给它，超时的照常使用，被取消的立即归还。
+    """
+
+    def __init__(self, size: int):
+        self._free = size
+        self._waiters: deque = deque()
+        self._lock = threading.Lock()
+
+    def _try_acquire(self) -> bool:
+        if self._free > 0 and not self._waiters:
+            self._free -= 1
+            return True
+        return False
+
+    def _give_up(self, waiter: _Waiter) -> bool:
+        """等待结束但没有被唤醒：名额已交给它时返回 True，否则移出队列"""
+        with self._lock:
+            if waiter.granted:
+                return True
+            self._waiters.remove(waiter)
+            return False
+
+    def acquire(self, timeout: float) -> bool:
+        with self._lock:
+            if self._try_acquire():
+                return True
+            waiter = _Waiter(event=threading.Event())
+            self._waiters.append(waiter)
+        waiter.event.wait(timeout)
+        return self._give_up(waiter)
+
+    async def acquire_async(self, timeout: float) -> bool:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._try_acquire():
+                return True
+            waiter = _Waiter(future=loop.create_future(), loop=loop)
+            self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            if self._give_up(waiter):
+                self.release()
+            raise
+        return self._give_up(waiter)
+
+    def release(self):
+        with self._lock:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                if waiter.event is not None:
+                    waiter.granted = True
+                    waiter.event.set()
+                    return
+                try:
+                    waiter.loop.call_soon_threadsafe(_resolve, waiter.future)
+                except RuntimeError:
+                    # 事件循环已关闭，交给下一个等待者
+                    continue
+                waiter.granted = True
+                return
+            self._free += 1
+
+
+class LLMGuard:
+    """大模型调用的保护层：相同请求合并（single-flight）、并发上限与排队超时、熔断
+
+    同步调用（线程）与异步调用（事件循环）共用同一组并发名额，两者合计不超过 max_concurrency，
+    排队的请求不论同步异步都按先来先得获得名额。
+    """
+
+    def __init__(self, max_concurrency: int = 8, queue_timeout: float = 5,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self.breaker = breaker or CircuitBreaker()
+        self._slots = _Slots(max_concurrency)
+        self._sync_calls: Dict[str, _Call] = {}
+        self._async_calls: Dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self._stats = {"calls": 0, "coalesced": 0, "rejected_open": 0, "queue_timeouts": 0, "failures": 0}
+
+    @classmethod
+    def from_env(cls) -> "LLMGuard":
+        breaker = CircuitBreaker(
+            threshold=float(os.getenv("LLM_BREAKER_THRESHOLD", "0.5")),
+            min_calls=int(os.getenv("LLM_BREAKER_MIN_CALLS", "5")),
+            window=int(os.getenv("LLM_BREAKER_WINDOW", "20")),
+            reset_timeout=float(os.getenv("LLM_BREAKER_RESET", "30")),
+            half_open_max=int(os.getenv("LLM_BREAKER_HALF_OPEN", "1")),
+        )
+        return cls(
+            max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+            queue_timeout=float(os.getenv("LLM_QUEUE_TIMEOUT", "5")),
+            breaker=breaker,
+        )
+
+    def _count(self, name: str, delta: int = 1):
+        with self._lock:
+            self._stats[name] += delta
+
+    def _check_breaker(self):
+        if not self.breaker.allow():
+            self._count("rejected_open")
+            raise CircuitOpenError("大模型服务熔断中，直接使用兜底答案")
+
+    def _record(self, ok: bool):
+        if ok:
+            self.breaker.record_success()
+        else:
+            self._count("failures")
+            self.breaker.record_failure()
+
+    @contextmanager
+    def slot(self):
+        """同步调用占用一个并发名额，并把结果计入熔断器"""
+        self._check_breaker()
+        if not self._slots.acquire(self.queue_timeout):
+            self._count("queue_timeouts")
+            raise QueueTimeoutError("等待大模型并发名额超时")
+        self._count("calls")
+        self._count_in_flight(1)
+        try:
+            yield
+        except Exception:
+            self._record(False)
+            raise
+        else:
+            self._record(True)
+        finally:
+            self._count_in_flight(-1)
+            self._slots.release()
+
+    @asynccontextmanager
+    async def aslot(self):
+        """异步调用占用一个并发名额，并把结果计入熔断器（流式调用也使用它）"""
+        self._check_breaker()
+        if not await self._slots.acquire_async(self.queue_timeout):
+            self._count("queue_timeouts")
+            raise QueueTimeoutError("等待大模型并发名额超时")
+        self._count("calls")
+        self._count_in_flight(1)
+        try:
+            yield
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self._record(False)
+            raise
+        else:
+            self._record(True)
+        finally:
+            self._count_in_flight(-1)
+            self._slots.release()
+
+    def _count_in_flight(self, delta: int):
+        with self._lock:
+            self.in_flight += delta
+
+    def call(self, key: str, fn: Callable[[], Any]) -> Any:
+        """同步调用；相同 key 的并发请求只真正调用一次，其余等待并共享结果"""
+        with self._lock:
+            call = self._sync_calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._sync_calls[key] = _Call()
+            else:
+                self._stats["coalesced"] += 1
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            with self.slot():
+                call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._sync_calls[key]
+            call.event.set()
+
+    async def acall(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """异步调用；相同 key 的并发请求共享同一个任务"""
+        task = self._async_calls.get(key)
+        if task is not None:
+            self._count("coalesced")
+            return await asyncio.shield(task)
+
+        async def run():
+            async with self.aslot():
+                return await fn()
+
+        task = asyncio.ensure_future(run())
+        self._async_calls[key] = task
+        task.add_done_callback(lambda t: self._async_calls.pop(key) if self._async_calls.get(key) is t else None)
+        # shield：发起者断开时不取消共享任务，其他等待者仍能拿到结果
+        return await asyncio.shield(task)
+
+    async def astream(self, key: str, fn: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        """异步流式调用，逐段产出文本；相同 key 的调用（流式或 acall）正在进行时不再调用，
+        等待其完整结果后一次性产出，流式调用本身的完整结果也与后来的相同请求共享"""
+        task = self._async_calls.get(key)
+        if task is not None:
+            self._count("coalesced")
+            yield await asyncio.shield(task)
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._async_calls[key] = future
+        parts = []
+        try:
+            async with self.aslot():
+                async for delta in fn():
+                    parts.append(delta)
+                    yield delta
+            future.set_result("".join(parts))
+        except BaseException as e:
+            # 发起者断开（GeneratorExit / 取消）时等待者按失败处理，走兜底答案
+            future.set_exception(e if isinstance(e, Exception) else RuntimeError("流式调用已中断"))
+            # 没有等待者时不提示异常未被获取
+            future.exception()
+            raise
+        finally:
+            if self._async_calls.get(key) is future:
+                del self._async_calls[key]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = self.in_flight
+        stats["max_concurrency"] = self.max_concurrency
+        stats["circuit"] = self.breaker.stats()
+        return stats
@@ -1,14 +1,41 @@
 from dotenv import load_dotenv
 load_dotenv()  # 加载环境变量
 
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import BackgroundTasks, FastAPI, Header, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel
+from typing import List, Optional
 from knowledge_graph import FrontendKnowledgeGraph
-import re
+from graph_export import NODES, CursorError, GraphExporter, StaleCursorError
+from graph_snapshot import GraphSnapshot
+from graph_updates import parse_change
+from metrics import REGISTRY, MetricsMiddleware, stage
+from profiler import PROFILER
+from itertools import chain
+import json
+import os
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 监视增量文件，图谱变更无需重启
+    kg.start_delta_watcher()
+    yield
+    kg.stop_delta_watcher()
+    # 关闭大模型客户端的连接池
+    await kg.llm.aclose()
+
+class TimedJSONResponse(JSONResponse):
+    """默认响应类：记录 JSON 序列化耗时"""
+
+    def render(self, content) -> bytes:
+        with stage("json_serialize"):
+            return super().render(content)
 
 # 初始化FastAPI应用
-app = FastAPI(title="前端技术知识图谱问答API")
+app = FastAPI(title="前端技术知识图谱问答API", lifespan=lifespan, default_response_class=TimedJSONResponse)
 
 # 配置跨域
 app.add_middleware(
@@ -17,97 +44,229 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
+# 接口耗时统计与 Server-Timing 响应头（放在最外层，计入跨域处理）
+app.add_middleware(MetricsMiddleware)
 
-# 初始化知识图谱
-kg = FrontendKnowledgeGraph()
+# 初始化知识图谱（GRAPH_DATA_FILE 可指定其他 CSV，例如基准测试生成的合成图谱）
+kg = FrontendKnowledgeGraph(os.getenv("GRAPH_DATA_FILE", "data/frontend_knowledge.csv"))
+REGISTRY.register_collector(kg.collect_metrics)
 
 # 请求模型
 class QuestionRequest(BaseModel):
     question: str
     mode: str = "quick"  # 模式参数，默认快速回答
 
+def snapshot_response(request: Request, snapshot: GraphSnapshot) -> Response:
+    """返回预序列化的快照：支持 ETag / 304 与 gzip、br 压缩"""
+    encoding = snapshot.negotiate(request.headers.get("accept-encoding"))
+    headers = {
+        "ETag": snapshot.etag_for(encoding),
+        "Cache-Control": "no-cache",
+        "Vary": "Accept-Encoding",
+    }
+    if snapshot.matches(request.headers.get("if-none-match"), encoding):
+        return Response(status_code=304, headers=headers)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=snapshot.encoded(encoding), media_type="application/json", headers=headers)
+
+def layout_tag(state) -> str:
+    return "xy" if state.layout.is_ready() else "raw"
+
 # API接口
 @app.get("/api/graph-data")
-def get_graph_data(limit: int = 60):
-    """获取初始核心图谱数据（只返回Top N节点）"""
+def get_graph_data(
+    request: Request,
+    limit: int = Query(60, ge=1),
+    rank_by: str = Query("degree", pattern="^(degree|weighted_degree|pagerank|betweenness)$"),
+):
+    """获取初始核心图谱数据（只返回Top N节点，N 不超过 TOP_GRAPH_MAX_LIMIT）"""
     if not kg:
         raise HTTPException(status_code=500, detail="图谱未初始化，请检查后端日志")
     try:
-        data = kg.get_top_graph_data(limit=limit)
-        return {"code": 200, "data": data, "msg": "success"}
+        # 整个请求使用同一图谱版本；介数中心性尚未算完时会退回度排序，缓存键使用实际的排序方式
+        state = kg.state
+        rank_by = state.rankings.resolve(rank_by)
+        limit = min(limit, kg.top_limit_cap)
+        # 布局算完前后的响应不同（是否带坐标）；排名重算（例如介数中心性后台算完）后代数变化，也分别缓存
+        snapshot = state.snapshots.get(
+            f"top:{rank_by}:{limit}:{state.rankings.generation}:{layout_tag(state)}",
+            lambda: {"code": 200, "data": kg.get_top_graph_data(limit=limit, rank_by=rank_by, state=state), "msg": "success"}
+        )
+        return snapshot_response(request, snapshot)
     except Exception as e:
         print(f"获取图谱数据出错: {e}")
         raise HTTPException(status_code=500, detail=f"获取图谱数据失败：{str(e)}")
 
 # 问答接口
 @app.post("/api/qa")
-def qa(request: QuestionRequest):
+async def qa(request: QuestionRequest):
     """问答接口"""
     try:
-        result = kg.answer_question(request.question, request.mode)
+        result = await kg.answer_question_async(request.question, request.mode)
         return {"code": 200, "data": result, "msg": "success"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"问答处理失败：{str(e)}")
 
+# 流式问答接口（SSE）
+@app.post("/api/qa/stream")
+async def qa_stream(request: QuestionRequest):
+    """流式问答：依次推送 meta、token（Markdown 增量）、done（渲染后的 HTML）事件"""
+    async def event_stream():
+        try:
+            async for event, data in kg.stream_answer(request.question, request.mode):
+                yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'msg': f'问答处理失败：{str(e)}'}, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "2048"))
+
+def graph_exporter(relation, min_weight, max_weight, fields) -> GraphExporter:
+    """导出当前图谱版本；字段名非法时返回 400"""
+    try:
+        return GraphExporter(kg.state, relations=relation, min_weight=min_weight, max_weight=max_weight,
+                             fields=fields, chunk_size=EXPORT_CHUNK_SIZE)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def export_response(exporter: GraphExporter, format: str, cursor: Optional[str], limit: Optional[int],
+                    entities_only: bool = False):
+    """分页（limit）返回一页 JSON；ndjson 与不分页的 json 逐块流式输出"""
+    try:
+        if format == "ndjson":
+            lines = exporter.ndjson_lines(cursor, limit, entities_only=entities_only)
+            # 先取出 meta 行，游标错误在响应开始前就能返回 4xx
+            first = next(lines)
+            return StreamingResponse(chain([first], lines), media_type="application/x-ndjson")
+        if limit is not None or cursor:
+            if not entities_only:
+                return {"code": 200, "data": exporter.page(cursor, limit or EXPORT_CHUNK_SIZE), "msg": "success"}
+            page = exporter.page(cursor, limit or EXPORT_CHUNK_SIZE, sections=(NODES,))
+            page = {"items": [node["id"] for node in page["nodes"]], "next_cursor": page["next_cursor"],
+                    "version": page["version"]}
+            return {"code": 200, "data": page, "msg": "success"}
+        chunks = exporter.entity_json_chunks() if entities_only else exporter.json_chunks()
+        return StreamingResponse(chunks, media_type="application/json")
+    except StaleCursorError as e:
+        # 图谱在分页过程中更新过：游标失效，需要从头开始
+        raise HTTPException(status_code=409, detail=str(e))
+    except CursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.get("/api/graph-data/full")
-def get_full_graph_data():
+def get_full_graph_data(
+    request: Request,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    fields: Optional[str] = None,
+    relation: Optional[List[str]] = Query(None),
+    min_weight: Optional[int] = None,
+    max_weight: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, le=10000),
+    cursor: Optional[str] = None,
+):
+    """全量图谱数据；带导出参数时按游标分页或流式输出（ndjson），支持字段投影与关系、权重筛选"""
+    exporting = (format != "json" or fields or relation or min_weight is not None or max_weight is not None
+                 or limit is not None or cursor)
+    if exporting:
+        return export_response(graph_exporter(relation, min_weight, max_weight, fields), format, cursor, limit)
     try:
-        return {"code": 200, "data": kg.get_graph_data(), "msg": "success"}
+        state = kg.state
+        # 节点与边分别预编码，图谱增量更新后只需重新编码变化的部分
+        snapshot = state.snapshots.get(
+            f"full:{layout_tag(state)}",
+            lambda: b'{"code":200,"data":' + kg.get_graph_payload(state).dumps() + b',"msg":"success"}'
+        )
+        return snapshot_response(request, snapshot)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取全量数据失败：{str(e)}")
 
-@app.get("/api/entities")
-def get_entities():
-    """获取所有实体列表"""
+@app.get("/api/graph-data/clusters")
+def get_graph_clusters(
+    request: Request,
+    level: Optional[int] = Query(None, ge=0),
+    parent: Optional[str] = None,
+    max_edges: int = Query(2000, ge=0, le=20000),
+):
+    """聚合视图：默认返回顶层簇（超级节点，带成员数与坐标）及簇之间的聚合边；parent 为簇编号时返回展开后的下一层"""
+    state = kg.state
+    # 在快照锁之外等待后台布局，避免阻塞其他图谱接口
+    if not state.layout.wait(kg.layout_wait):
+        raise HTTPException(status_code=503, detail="图谱布局计算中，请稍后重试", headers={"Retry-After": "5"})
     try:
-        entities = list(kg.G.nodes)
-        return {"code": 200, "data": entities, "msg": "success"}
+        snapshot = state.snapshots.get(
+            f"clusters:{level}:{parent}:{max_edges}",
+            lambda: {"code": 200, "data": kg.get_cluster_view(level=level, parent=parent, max_edges=max_edges, state=state),
+                     "msg": "success"}
+        )
+        return snapshot_response(request, snapshot)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"簇不存在：{parent}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"获取实体列表失败：{str(e)}")
+        raise HTTPException(status_code=500, detail=f"获取聚合视图失败：{str(e)}")
+
+@app.get("/api/entities")
+def get_entities(
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    relation: Optional[List[str]] = Query(None),
+    min_weight: Optional[int] = None,
+    max_weight: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, le=10000),
+    cursor: Optional[str] = None,
+):
+    """获取所有实体列表（逐块流式输出；可按游标分页，按关系、权重筛选出有相应边的实体）"""
+    exporter = graph_exporter(relation, min_weight, max_weight, "id")
+    return export_response(exporter, format, cursor, limit, entities_only=True)
 
 # 按实体筛选图谱数据
 @app.get("/api/graph-data/entity/{entity}")
-def get_graph_data_by_entity(entity: str):
-    """根据实体获取相关的图谱数据"""
+def get_graph_data_by_entity(
+    entity: str,
+    depth: int = Query(1, ge=1, le=5),
+    direction: str = Query("both", pattern="^(in|out|both)$"),
+    relation: Optional[List[str]] = Query(None),
+    min_weight: Optional[int] = None,
+    max_nodes: Optional[int] = Query(None, ge=1),
+    max_edges: Optional[int] = Query(None, ge=0),
+):
+    """根据实体获取相关的图谱数据（k 跳邻域，可按方向、关系、权重筛选）"""
     try:
         # 过滤非法实体名称
         if not entity or entity.startswith('[object'):
             return {"code": 400, "data": {"nodes": [], "edges": []}, "msg": "无效的实体名称"}
-        # 获取该实体的所有相关关系
-        related_data = kg.query_relation(entity)
-        # 提取相关节点（源节点+目标节点）
-        related_nodes = {entity}
-        for item in related_data:
-            related_nodes.add(item['source'])
-            related_nodes.add(item['target'])
-        related_nodes = list(related_nodes)
-        
-        # 构建筛选后的节点和边
-        nodes = [{"id": str(node), "label": str(node)} for node in related_nodes]
-        edges = []
-        for u, v, data in kg.G.edges(data=True):
-            if u in related_nodes and v in related_nodes:
-                edges.append({
-                    "from": str(u),
-                    "to": str(v),
-                    "label": str(data.get('relation', '')),
-                    "weight": int(data.get('weight', 0)),
-                    "relation": str(data.get('relation', ''))
-                })
-        
-        return {"code": 200, "data": {"nodes": nodes, "edges": edges}, "msg": "success"}
+        data = kg.get_neighborhood(
+            entity,
+            depth=depth,
+            direction=direction,
+            relations=relation,
+            min_weight=min_weight,
+            max_nodes=max_nodes,
+            max_edges=max_edges,
+        )
+        return {"code": 200, "data": data, "msg": "success"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取实体图谱数据失败：{str(e)}")
 
 @app.get("/api/learning-path/{entity}")
-def get_learning_path(entity: str):
-    """获取智能学习路径规划"""
+def get_learning_path(entity: str, background_tasks: BackgroundTasks, enrich: bool = True):
+    """获取学习路径规划（立即返回图谱规划结果，大模型润色在后台进行）"""
     try:
         if not entity:
             return {"code": 400, "msg": "实体不能为空"}
             
         path_data = kg.get_learning_path(entity)
+        # 尚未润色过的路径交给后台，下次请求即可拿到大模型版本
+        if enrich and path_data.get("source") == "graph" and entity in kg.store:
+            background_tasks.add_task(kg.enrich_learning_path_async, entity)
         return {"code": 200, "data": path_data, "msg": "success"}
     except Exception as e:
         print(f"获取学习路径失败: {e}")
@@ -126,41 +285,120 @@ def get_recommendations(entity: str):
     except Exception as e:
         print(f"推荐获取失败: {e}")
         return {"code": 500, "msg": str(e), "data": []}
+# 批量推荐：传入多个实体（例如搜索历史），返回合并去重后的推荐
+class BatchRecommendRequest(BaseModel):
+    entities: List[str]
+    limit: int = 10
+
+@app.post("/api/recommendations/batch")
+def get_batch_recommendations(request: BatchRecommendRequest):
+    """多个实体的合并推荐"""
+    try:
+        if not request.entities:
+            return {"code": 400, "msg": "实体列表不能为空", "data": []}
+        limit = max(1, min(request.limit, 100))
+        recs = kg.get_batch_recommendations(request.entities, limit=limit)
+        return {"code": 200, "data": recs, "msg": "success"}
+    except Exception as e:
+        print(f"批量推荐获取失败: {e}")
+        return {"code": 500, "msg": str(e), "data": []}
 @app.get("/api/graph-data/entity/fuzzy/{keyword}")
-def fuzzy_search_entity(keyword: str):
-    """根据关键词模糊匹配实体"""
+def fuzzy_search_entity(
+    keyword: str,
+    limit: int = Query(20, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+):
+    """根据关键词模糊匹配实体（完全 > 前缀 > 子串 > 容错，分页返回）"""
     try:
         if not keyword:
             return {"code": 400, "data": {"nodes": [], "edges": []}, "msg": "关键词不能为空"}
-        
-        # 模糊匹配所有包含关键词的实体（不区分大小写）
-        pattern = re.compile(re.escape(keyword), re.IGNORECASE)
-        matched_entities = [
-            node for node in kg.G.nodes 
-            if pattern.search(str(node))  # 匹配节点名称
-        ]
-        
-        # 提取匹配实体的所有关联关系
-        related_nodes = set(matched_entities)
-        related_edges = []
-        for u, v, data in kg.G.edges(data=True):
-            if str(u) in related_nodes or str(v) in related_nodes:
-                related_nodes.add(str(u))
-                related_nodes.add(str(v))
-                related_edges.append({
-                    "from": str(u),
-                    "to": str(v),
-                    "label": str(data.get('relation', '')),
-                    "weight": int(data.get('weight', 0)),
-                    "relation": str(data.get('relation', ''))
-                })
-        
-        nodes = [{"id": node, "label": node} for node in related_nodes]
-        return {"code": 200, "data": {"nodes": nodes, "edges": related_edges}, "msg": "success"}
+        data = kg.fuzzy_search(keyword, limit=limit, offset=offset)
+        return {"code": 200, "data": data, "msg": "success"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"模糊搜索失败：{str(e)}")
 
+# 实体名称自动补全（只返回名称，不带关系）
+@app.get("/api/entities/autocomplete")
+def autocomplete_entities(q: str = "", limit: int = Query(10, ge=1, le=50)):
+    """实体名称自动补全"""
+    try:
+        if not q.strip():
+            return {"code": 200, "data": [], "msg": "success"}
+        result = kg.search_entities(q, limit=limit)
+        return {"code": 200, "data": [item["entity"] for item in result["items"]], "msg": "success"}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"自动补全失败：{str(e)}")
+
+# 缓存统计接口（运维查看命中率）
+@app.get("/api/cache/stats")
+def get_cache_stats():
+    """获取问答 / 学习路径缓存的命中统计"""
+    return {"code": 200, "data": kg.answer_cache.stats(), "msg": "success"}
+
+# 大模型调用状态（并发、合并、熔断）
+@app.get("/api/llm/stats")
+def get_llm_stats():
+    """获取大模型调用保护层的运行状态"""
+    return {"code": 200, "data": kg.llm_guard.stats(), "msg": "success"}
+
+# 图谱增量更新：批量增删边、修改权重，无需重启
+class GraphChangesRequest(BaseModel):
+    changes: List[dict]
+
+def check_admin_token(token: Optional[str]):
+    """写接口需要在 X-Admin-Token 请求头中携带 GRAPH_ADMIN_TOKEN；未配置该变量时写接口一律关闭"""
+    expected = os.getenv("GRAPH_ADMIN_TOKEN")
+    if not expected:
+        raise HTTPException(status_code=403, detail="未配置 GRAPH_ADMIN_TOKEN，写接口已关闭")
+    if token != expected:
+        raise HTTPException(status_code=403, detail="无权修改图谱")
+
+@app.post("/api/graph/changes")
+def apply_graph_changes(request: GraphChangesRequest, x_admin_token: Optional[str] = Header(None)):
+    """批量应用图谱变更：op 为 add / remove / reweight"""
+    check_admin_token(x_admin_token)
+    try:
+        changes = [parse_change(item) for item in request.changes]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"变更格式错误：{str(e)}")
+    try:
+        summary = kg.apply_changes(changes)
+        return {"code": 200, "data": summary, "msg": "success"}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"图谱更新失败：{str(e)}")
+
+@app.get("/api/graph/version")
+def get_graph_version():
+    """当前图谱版本与规模"""
+    state = kg.state
+    return {
+        "code": 200,
+        "data": {"version": state.version, "nodes": state.store.num_nodes, "edges": state.store.num_edges},
+        "msg": "success"
+    }
+
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus 文本格式的运行指标（多 worker 部署时为响应本次请求的进程的指标）"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/debug/profile")
+async def profile(
+    seconds: float = Query(10, gt=0, le=120),
+    interval: float = Query(0.005, ge=0.001, le=1),
+    x_admin_token: Optional[str] = Header(None),
+):
+    """采样分析：在接下来 seconds 秒内定时抓取各线程调用栈，返回折叠栈文本（需设置 PROFILER_ENABLED=1）"""
+    if os.getenv("PROFILER_ENABLED", "0") != "1":
+        raise HTTPException(status_code=404, detail="采样分析未开启")
+    check_admin_token(x_admin_token)
+    try:
+        stacks = await run_in_threadpool(PROFILER.profile, seconds, interval)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(stacks)
+
 # 启动服务
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
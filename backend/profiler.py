@@ -0,0 +1,64 @@
+"""按需开启的采样分析器：定时抓取所有线程的调用栈，汇总为折叠栈格式
+
+输出每行一个调用栈（由外到内，分号分隔）及其采样次数，可直接交给 flamegraph.pl 或 speedscope。
+只在采样期间运行一个后台线程，未开启时没有任何开销。
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """同一时间只允许一次采样"""
+
+    def __init__(self, max_depth: int = 64):
+        self.max_depth = max_depth
+        self._lock = threading.Lock()
+        self._running = False
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def _sample(self, stacks: Counter, own_thread: int):
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_thread:
+                continue
+            labels = []
+            while frame is not None and len(labels) < self.max_depth:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            if labels:
+                stacks[";".join(reversed(labels))] += 1
+
+    def profile(self, seconds: float, interval: float = 0.005, stop: Optional[threading.Event] = None) -> str:
+        """在当前线程中采样 seconds 秒（stop 被设置时提前结束），返回折叠栈文本（按次数降序）"""
+        with self._lock:
+            if self._running:
+                raise RuntimeError("已有采样正在进行")
+            self._running = True
+        stacks: Counter = Counter()
+        samples = 0
+        try:
+            own_thread = threading.get_ident()
+            deadline = time.monotonic() + seconds
+            stop = stop or threading.Event()
+            while time.monotonic() < deadline and not stop.wait(interval):
+                self._sample(stacks, own_thread)
+                samples += 1
+        finally:
+            self._running = False
+        lines = [f"{stack} {count}" for stack, count in stacks.most_common()]
+        print(f"采样分析完成：{samples} 次采样，{len(stacks)} 个不同调用栈")
+        return "\n".join(lines) + "\n"
+
+
+PROFILER = SamplingProfiler()
@@ -0,0 +1,219 @@
+import threading
+from typing import Dict, Iterable, List
+
+import numpy as np
+import scipy.sparse as sp
+
+from graph_store import GraphStore
+from graph_updates import neighborhood_ids
+
+
+class RecommendationEngine:
+    """基于个性化 PageRank（带重启的随机游走）的关联推荐
+
+    图按无向、边权加权处理，对一批种子节点同时做幂迭代（稀疏矩阵 × 稠密矩阵），
+    每个节点保留得分最高的 top_n 个推荐。节点数不超过 precompute_limit 时在后台线程全量预计算，
+    未算到的节点首次查询时单独计算；之后单个实体的推荐只是一次数组查表。
+    图谱增量更新时用 updated() 沿用旧结果，只重新计算变化附近的节点。
+    """
+
+    def __init__(self, store: GraphStore, top_n: int = 20, alpha: float = 0.15,
+                 max_iter: int = 50, tol: float = 1e-4, block_size: int = 256,
+                 precompute_limit: int = 20000):
+        self.store = store
+        self.top_n = top_n
+        self.alpha = alpha
+        self.max_iter = max_iter
+        self.tol = tol
+        self.block_size = block_size
+        self.precompute_limit = precompute_limit
+        n = store.num_nodes
+        self._top_ids = np.full((n, top_n), -1, dtype=np.int32)
+        self._top_scores = np.zeros((n, top_n), dtype=np.float32)
+        self._ready = np.zeros(n, dtype=bool)
+        self._lock = threading.Lock()
+        # 转移矩阵首次需要计算时才构建（推荐表来自共享内存时可能用不到）
+        self._transition = None
+        self._thread = None
+        # 被更新的版本取代后，后台预计算提前结束
+        self._superseded = threading.Event()
+
+    def start_precompute(self):
+        """节点数不超过 precompute_limit 时，在后台线程计算全部未就绪节点"""
+        if 0 < self.store.num_nodes <= self.precompute_limit:
+            self._thread = threading.Thread(target=self._precompute, daemon=True, name="recommendations")
+            self._thread.start()
+
+    def updated(self, store: GraphStore, touched: np.ndarray, radius: int = 2) -> "RecommendationEngine":
+        """图谱增量更新后的推荐表：沿用旧结果，变化节点 radius 跳以内的节点标记为待重新计算
+
+        个性化 PageRank 的得分随跳数按 (1 - alpha) 衰减，更远处节点的 Top-N 基本不受影响。
+        """
+        engine = RecommendationEngine(store, self.top_n, self.alpha, self.max_iter, self.tol,
+                                      self.block_size, self.precompute_limit)
+        n_old = self.store.num_nodes
+        self._superseded.set()
+        with self._lock:
+            engine._top_ids[:n_old] = self._top_ids
+            engine._top_scores[:n_old] = self._top_scores
+            engine._ready[:n_old] = self._ready
+        engine._ready[neighborhood_ids(store, touched, radius)] = False
+        engine.start_precompute()
+        return engine
+
+    def attach_tables(self, ids: np.ndarray, scores: np.ndarray, ready: np.ndarray):
+        """直接使用已算好的推荐表（例如映射自共享内存的只读数组），首次需要写入时才复制"""
+        with self._lock:
+            self._top_ids, self._top_scores, self._ready = ids, scores, ready
+
+    def shared_arrays(self) -> Dict[str, np.ndarray]:
+        """当前推荐表的副本，供发布到共享内存"""
+        with self._lock:
+            return {"rec_ids": self._top_ids.copy(), "rec_scores": self._top_scores.copy(),
+                    "rec_ready": self._ready.copy()}
+
+    def _build_transition(self) -> sp.csr_matrix:
+        """转移矩阵的转置 P^T：P[i, j] = w(i, j) / 节点 i 的加权度（无向）"""
+        store = self.store
+        n = store.num_nodes
+        src = np.repeat(np.arange(n, dtype=np.int32), store.out_degree)
+        dst = store.out_indices
+        weights = np.maximum(store.out_weights.astype(np.float64), 1e-9)
+        rows = np.concatenate([src, dst])
+        cols = np.concatenate([dst, src])
+        values = np.concatenate([weights, weights])
+        # 双向都有边时权重相加
+        adjacency = sp.csr_matrix((values, (rows, cols)), shape=(n, n))
+        strength = np.asarray(adjacency.sum(axis=1)).ravel()
+        inv = np.divide(1.0, strength, out=np.zeros(n), where=strength > 0)
+        return (sp.diags(inv) @ adjacency).T.tocsr().astype(np.float32)
+
+    def _personalized_pagerank(self, seeds: np.ndarray) -> np.ndarray:
+        """一批种子的个性化 PageRank，返回 n × len(seeds) 的得分矩阵"""
+        n = self.store.num_nodes
+        if self._transition is None:
+            self._transition = self._build_transition()
+        columns = np.arange(len(seeds))
+        x = np.zeros((n, len(seeds)), dtype=np.float32)
+        x[seeds, columns] = 1.0
+        for step in range(1, self.max_iter + 1):
+            x_new = self._transition @ x
+            x_new *= 1 - self.alpha
+            # 重启概率，加上孤立节点丢失的游走概率，全部回到起点
+            x_new[seeds, columns] += 1 - x_new.sum(axis=0)
+            # 收敛判断本身的开销与一次迭代相当，隔几轮检查一次
+            if step % 5 == 0 and np.abs(x_new - x).sum(axis=0).max() < self.tol:
+                return x_new
+            x = x_new
+        return x
+
+    def _store_block(self, seeds: np.ndarray):
+        scores = self._personalized_pagerank(seeds)
+        # 推荐中排除自身与得分为 0 的节点
+        scores[seeds, np.arange(len(seeds))] = 0
+        k = min(self.top_n, scores.shape[0])
+        top = np.argpartition(-scores, k - 1, axis=0)[:k]
+        top_scores = np.take_along_axis(scores, top, axis=0)
+        order = np.argsort(-top_scores, axis=0, kind="stable")
+        top = np.take_along_axis(top, order, axis=0).T
+        top_scores = np.take_along_axis(top_scores, order, axis=0).T
+        ids = np.where(top_scores > 0, top, -1)
+        with self._lock:
+            if not self._ready.flags.writeable:
+                self._top_ids, self._top_scores, self._ready = (
+                    self._top_ids.copy(), self._top_scores.copy(), self._ready.copy()
+                )
+            self._top_ids[seeds, :k] = ids
+            self._top_scores[seeds, :k] = np.where(top_scores > 0, top_scores, 0)
+            self._ready[seeds] = True
+
+    def _precompute(self):
+        n = self.store.num_nodes
+        for start in range(0, n, self.block_size):
+            if self._superseded.is_set():
+                return
+            seeds = np.arange(start, min(start + self.block_size, n))
+            seeds = seeds[~self._ready[seeds]]
+            if len(seeds):
+                self._store_block(seeds)
+
+    def is_ready(self) -> bool:
+        return bool(self._ready.all())
+
+    def top(self, node: int):
+        """某个节点的推荐：(节点编号列表, 得分列表)"""
+        if not self._ready[node]:
+            self._store_block(np.array([node]))
+        ids = self._top_ids[node]
+        mask = ids >= 0
+        return ids[mask].tolist(), self._top_scores[node][mask].tolist()
+
+    def _edge_map(self, node: int) -> Dict[int, tuple]:
+        """与 node 相邻的节点 -> (源, 关系编码, 目标, 权重)，双向都有边时取权重较大的一条"""
+        edges = {}
+        for v, r, w in zip(*self.store.out_edges(node)):
+            edges[v] = (node, r, v, w)
+        for u, r, w in zip(*self.store.in_edges(node)):
+            if u not in edges or edges[u][3] < w:
+                edges[u] = (u, r, node, w)
+        return edges
+
+    def _explain(self, node: int, neighbors: Dict[int, tuple], target: int) -> Dict:
+        """推荐理由：直接相连的给出关系，两跳的给出中间节点"""
+        store = self.store
+        if target in neighbors:
+            u, r, v, w = neighbors[target]
+            return {"relation": store.relations[r], "sentence": f"{store.nodes[u]} {store.relations[r]} {store.nodes[v]}",
+                    "via": None, "weight": int(w)}
+        target_neighbors = self._edge_map(target)
+        bridges = [(min(neighbors[m][3], edge[3]), m) for m, edge in target_neighbors.items() if m in neighbors]
+        if bridges:
+            weight, via = max(bridges)
+            return {"relation": None, "sentence": None, "via": store.nodes[via], "weight": int(weight)}
+        return {"relation": None, "sentence": None, "via": None, "weight": 1}
+
+    def recommend(self, entity: str, limit: int = 8) -> List[Dict]:
+        """单个实体的推荐：[{entity, score, weight, relation, sentence, via}]"""
+        node = self.store.id_of(entity)
+        if node is None:
+            return []
+        ids, scores = self.top(node)
+        neighbors = self._edge_map(node)
+        return [
+            {"entity": self.store.nodes[t], "score": round(s, 6), **self._explain(node, neighbors, t)}
+            for t, s in zip(ids[:limit], scores[:limit])
+        ]
+
+    def recommend_many(self, entities: Iterable[str], limit: int = 10) -> List[Dict]:
+        """多个实体（例如浏览历史）的合并推荐：得分累加、去重，并排除输入实体本身"""
+        seeds = list(dict.fromkeys(i for i in (self.store.id_of(e) for e in entities) if i is not None))
+        if not seeds:
+            return []
+        seed_set = set(seeds)
+        totals: Dict[int, float] = {}
+        sources: Dict[int, List[int]] = {}
+        for seed in seeds:
+            for t, s in zip(*self.top(seed)):
+                if t in seed_set:
+                    continue
+                # 个性化 PageRank 对种子是线性的，多个种子的结果等于各自得分之和（再归一化）
+                totals[t] = totals.get(t, 0.0) + s / len(seeds)
+                sources.setdefault(t, []).append(seed)
+        ranked = sorted(totals, key=lambda t: (-totals[t], t))[:limit]
+        results = []
+        for t in ranked:
+            # 理由取贡献最大的那个输入实体
+            best = max(sources[t], key=lambda seed: self._score_of(seed, t))
+            results.append({
+                "entity": self.store.nodes[t],
+                "score": round(totals[t], 6),
+                "sources": [self.store.nodes[seed] for seed in sources[t]],
+                "source": self.store.nodes[best],
+                **self._explain(best, self._edge_map(best), t),
+            })
+        return results
+
+    def _score_of(self, seed: int, target: int) -> float:
+        ids = self._top_ids[seed]
+        hit = np.nonzero(ids == target)[0]
+        return float(self._top_scores[seed][hit[0]]) if len(hit) else 0.0
@@ -0,0 +1,42 @@
+"""多进程启动入口：本进程构建图谱并发布到共享目录，再启动 N 个 uvicorn worker 映射同一份图谱
+
+    python run.py --workers 4 --port 8000
+
+构建进程负责加载 CSV、后台计算（介数中心性、推荐预计算）与增量文件，每次版本变化后重新发布；
+worker 只读映射共享图谱，收到的写入请求追加到增量文件，由构建进程统一应用。
+"""
+import argparse
+import os
+
+import uvicorn
+
+from knowledge_graph import FrontendKnowledgeGraph
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多 worker 启动知识图谱服务（共享内存图谱）")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "2")), help="worker 进程数")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--data", default=os.getenv("GRAPH_DATA_FILE") or "data/frontend_knowledge.csv",
+                        help="知识图谱 CSV")
+    parser.add_argument("--shared-dir", default=os.getenv("GRAPH_SHARED_DIR") or "data/.cache/shared",
+                        help="共享图谱目录（建议位于 /dev/shm 等内存文件系统）")
+    args = parser.parse_args()
+
+    # 构建进程自己加载图谱，不映射共享目录
+    kg = FrontendKnowledgeGraph(args.data, shared_dir="")
+    kg.start_delta_watcher()
+    kg.publish_shared(args.shared_dir)
+
+    # worker 由 uvicorn 以新进程启动，通过环境变量得知共享目录
+    os.environ["GRAPH_SHARED_DIR"] = os.path.abspath(args.shared_dir)
+    try:
+        uvicorn.run("main:app", host=args.host, port=args.port, workers=args.workers)
+    finally:
+        kg.shared_publisher.stop()
+        kg.stop_delta_watcher()
+
+
+if __name__ == "__main__":
+    main()
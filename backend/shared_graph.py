@@ -0,0 +1,335 @@
+"""多进程共享的只读图谱（内存映射 arena）
+
+构建进程把某一图谱版本写成一个 arena 文件：CSR 邻接数组、节点 / 关系字符串表、按哈希排序的名称查找表，
+以及实体匹配自动机、搜索倒排表、度排序、介数中心性、推荐表等派生数据，全部按 64 字节对齐。各 worker 进程以只读方式 mmap 该文件，
+数组直接建立在映射内存上，多个进程共用操作系统的同一份页缓存，不再各自复制。
+
+版本切换通过同目录下的控制块（control.bin，同样是共享映射）通知：构建进程写好新的 arena 后
+更新其中的代数与文件名（seqlock），worker 发现代数变化即切换到新 arena。
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from graph_loader import decode_strings, encode_strings
+from graph_store import GraphStore
+
+ARENA_MAGIC = b"KGARENA1"
+ARENA_ALIGN = 64
+CONTROL_FILE = "control.bin"
+# 控制块：seq (u64) + generation (u64) + arena 文件名（定长）
+CONTROL_STRUCT = struct.Struct("<QQ240s")
+
+
+def _align(offset: int) -> int:
+    return (offset + ARENA_ALIGN - 1) // ARENA_ALIGN * ARENA_ALIGN
+
+
+def hash_names(names: Iterable[str]) -> np.ndarray:
+    """名称的 64 位哈希（跨进程稳定，不受 PYTHONHASHSEED 影响）"""
+    return np.array(
+        [int.from_bytes(hashlib.blake2b(name.encode("utf-8"), digest_size=8).digest(), "little") for name in names],
+        dtype=np.uint64,
+    )
+
+
+class StringTable:
+    """只读字符串表：UTF-8 拼接的字节数组 + 偏移数组，按下标访问时才解码"""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self._blob = blob
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        return self._blob[self._offsets[i]:self._offsets[i + 1]].tobytes().decode("utf-8")
+
+    def __iter__(self):
+        return iter(decode_strings(self._blob, self._offsets))
+
+    def __add__(self, other):
+        return list(self) + list(other)
+
+
+class NameIndex:
+    """名称 -> 编号的只读查找表：哈希排序后二分查找，命中后再比对原名"""
+
+    def __init__(self, names: StringTable, hashes: np.ndarray, order: np.ndarray):
+        self._names = names
+        self._hashes = hashes
+        self._order = order
+
+    def get(self, name, default=None):
+        if not isinstance(name, str):
+            return default
+        h = hash_names([name])[0]
+        start = int(np.searchsorted(self._hashes, h, side="left"))
+        while start < len(self._hashes) and self._hashes[start] == h:
+            i = int(self._order[start])
+            if self._names[i] == name:
+                return i
+            start += 1
+        return default
+
+    def __contains__(self, name) -> bool:
+        return self.get(name) is not None
+
+    def __getitem__(self, name) -> int:
+        i = self.get(name)
+        if i is None:
+            raise KeyError(name)
+        return i
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+
+def write_arena(path: str, version: str, store: GraphStore, extras: Dict[str, np.ndarray]):
+    """把 GraphStore 与附加数组写成 arena 文件（先写临时文件再原子替换）"""
+    node_blob, node_offsets = encode_strings(list(store.nodes))
+    rel_blob, rel_offsets = encode_strings(list(store.relations))
+    hashes = hash_names(store.nodes)
+    order = np.argsort(hashes, kind="stable")
+    arrays = {
+        "node_blob": node_blob, "node_offsets": node_offsets,
+        "node_hashes": hashes[order], "node_order": order.astype(np.int64),
+        "rel_blob": rel_blob, "rel_offsets": rel_offsets,
+    }
+    for name in ("out_indptr", "out_indices", "out_relations", "out_weights",
+                 "in_indptr", "in_indices", "in_relations", "in_weights",
+                 "out_degree", "in_degree", "degree"):
+        arrays[name] = getattr(store, name)
+    arrays.update(extras)
+
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        arrays[name] = array
+        layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset = _align(offset + array.nbytes)
+    header = json.dumps({"version": version, "arrays": layout}).encode("utf-8")
+    data_start = _align(len(ARENA_MAGIC) + 8 + len(header))
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(ARENA_MAGIC + struct.pack("<Q", len(header)) + header)
+        for name, array in arrays.items():
+            f.seek(data_start + layout[name]["offset"])
+            f.write(array.tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+
+
+class Arena:
+    """以只读方式映射的 arena 文件，数组均为映射内存上的视图（不复制）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(ARENA_MAGIC)] != ARENA_MAGIC:
+            raise ValueError(f"不是有效的图谱 arena 文件：{path}")
+        (header_len,) = struct.unpack_from("<Q", self._mmap, len(ARENA_MAGIC))
+        start = len(ARENA_MAGIC) + 8
+        header = json.loads(self._mmap[start:start + header_len].decode("utf-8"))
+        self.version: str = header["version"]
+        data_start = _align(start + header_len)
+        self.arrays: Dict[str, np.ndarray] = {}
+        for name, spec in header["arrays"].items():
+            dtype = np.dtype(spec["dtype"])
+            count = int(np.prod(spec["shape"])) if spec["shape"] else 1
+            array = np.frombuffer(self._mmap, dtype=dtype, count=count, offset=data_start + spec["offset"])
+            self.arrays[name] = array.reshape(spec["shape"])
+
+    def get(self, name: str) -> Optional[np.ndarray]:
+        return self.arrays.get(name)
+
+    def store(self) -> GraphStore:
+        """直接建立在映射内存上的 GraphStore"""
+        a = self.arrays
+        nodes = StringTable(a["node_blob"], a["node_offsets"])
+        csr = {name: a[name] for name in (
+            "out_indptr", "out_indices", "out_relations", "out_weights",
+            "in_indptr", "in_indices", "in_relations", "in_weights",
+            "out_degree", "in_degree", "degree",
+        )}
+        return GraphStore.from_csr(
+            nodes, NameIndex(nodes, a["node_hashes"], a["node_order"]),
+            decode_strings(a["rel_blob"], a["rel_offsets"]), csr,
+        )
+
+
+class ArenaControl:
+    """控制块：记录当前 arena 的代数与文件名，单个写入者，多个读取者（seqlock）"""
+
+    def __init__(self, directory: str, create: bool = False):
+        self.directory = directory
+        path = os.path.join(directory, CONTROL_FILE)
+        if create:
+            os.makedirs(directory, exist_ok=True)
+            if not os.path.exists(path) or os.path.getsize(path) < CONTROL_STRUCT.size:
+                with open(path, "wb") as f:
+                    f.write(b"\0" * CONTROL_STRUCT.size)
+        self._file = open(path, "r+b" if create else "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), CONTROL_STRUCT.size,
+                               access=mmap.ACCESS_WRITE if create else mmap.ACCESS_READ)
+
+    def publish(self, filename: str) -> int:
+        seq, generation, _ = CONTROL_STRUCT.unpack_from(self._mmap, 0)
+        # seq 为奇数表示正在写入，读取方会重试
+        struct.pack_into("<Q", self._mmap, 0, seq + 1)
+        CONTROL_STRUCT.pack_into(self._mmap, 0, seq + 1, generation + 1, filename.encode("utf-8"))
+        struct.pack_into("<Q", self._mmap, 0, seq + 2)
+        return generation + 1
+
+    def read(self) -> Tuple[int, str]:
+        """(代数, arena 文件名)，尚未发布时代数为 0"""
+        while True:
+            seq, generation, name = CONTROL_STRUCT.unpack_from(self._mmap, 0)
+            if seq % 2 == 0 and struct.unpack_from("<Q", self._mmap, 0)[0] == seq:
+                return generation, name.rstrip(b"\0").decode("utf-8")
+            time.sleep(0.0001)
+
+    def generation(self) -> int:
+        return self.read()[0]
+
+
+class SharedGraphPublisher:
+    """构建进程一侧：图谱版本或预计算结果变化时写出新的 arena 并更新控制块
+
+    snapshot() 返回 (key, build)：key 为一组对象，其中任意一个与上次发布时不是同一对象即重新发布；
+    build() 返回 (版本号, GraphStore, 附加数组)。
+    """
+
+    def __init__(self, directory: str, snapshot: Callable[[], Tuple[tuple, Callable]], interval: float = 0.5,
+                 grace: float = 60):
+        self.directory = directory
+        self.snapshot = snapshot
+        self.interval = interval
+        # 旧 arena 至少保留这么久（秒），给刚读到旧文件名、还没打开文件的 worker 留出时间
+        self.grace = grace
+        self._current: Optional[str] = None
+        self._previous: Optional[str] = None
+        # 不再使用的 arena 文件名 -> 开始等待删除的时间
+        self._retired: Dict[str, float] = {}
+        self.control = ArenaControl(directory, create=True)
+        self._published: Optional[tuple] = None
+        self._stop = threading.Event()
+
+    def _changed(self, key: tuple) -> bool:
+        last = self._published
+        return last is None or len(last) != len(key) or any(a is not b for a, b in zip(last, key))
+
+    def publish_if_changed(self) -> bool:
+        key, build = self.snapshot()
+        if not self._changed(key):
+            return False
+        start = time.perf_counter()
+        version, store, extras = build()
+        generation = self.control.generation() + 1
+        filename = f"graph-{version}-{generation}.arena"
+        write_arena(os.path.join(self.directory, filename), version, store, extras)
+        self.control.publish(filename)
+        # 持有 key 中的对象，保证下次比较时不会出现同一对象被回收后复用的情况
+        self._published = key
+        self._previous, self._current = self._current, filename
+        self._cleanup()
+        print(f"共享图谱已发布：{filename}，耗时 {(time.perf_counter() - start) * 1000:.1f} ms")
+        return True
+
+    def _cleanup(self):
+        """删除更早的 arena：保留当前与上一代，其余文件不再使用超过 grace 秒后才删除
+
+        已映射旧文件的 worker 不受删除影响（映射在进程退出或切换前一直有效）。
+        """
+        now = time.monotonic()
+        keep = {self._current, self._previous}
+        for name in os.listdir(self.directory):
+            if not name.endswith(".arena") or name in keep:
+                continue
+            if now - self._retired.setdefault(name, now) < self.grace:
+                continue
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+            self._retired.pop(name, None)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.publish_if_changed()
+                self._cleanup()
+            except Exception as e:
+                print(f"共享图谱发布失败：{e}")
+
+    def start(self):
+        self.publish_if_changed()
+        threading.Thread(target=self._run, daemon=True, name="arena-publisher").start()
+
+    def stop(self):
+        self._stop.set()
+
+
+class SharedGraphReader:
+    """worker 一侧：映射当前 arena，发现控制块代数变化时回调 on_change(arena)"""
+
+    def __init__(self, directory: str, interval: float = 0.5, wait: float = 60):
+        self.directory = directory
+        self.interval = interval
+        # 等待构建进程创建控制块并发布第一个版本
+        deadline = time.monotonic() + wait
+        while True:
+            try:
+                self.control = ArenaControl(directory)
+                if self.control.generation() > 0:
+                    break
+            except (FileNotFoundError, ValueError):
+                pass
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"等待共享图谱超时：{directory}")
+            time.sleep(0.1)
+        self.generation = 0
+        self._stop = threading.Event()
+
+    def open_current(self, wait: float = 5) -> Arena:
+        """映射控制块指向的 arena；读到文件名后文件已被清理时重新读取控制块再试"""
+        deadline = time.monotonic() + wait
+        while True:
+            generation, filename = self.control.read()
+            try:
+                arena = Arena(os.path.join(self.directory, filename))
+            except FileNotFoundError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.05)
+                continue
+            self.generation = generation
+            return arena
+
+    def start(self, on_change: Callable[[Arena], None]):
+        def run():
+            while not self._stop.wait(self.interval):
+                try:
+                    if self.control.generation() != self.generation:
+                        on_change(self.open_current())
+                except Exception as e:
+                    print(f"切换共享图谱失败：{e}")
+        threading.Thread(target=run, daemon=True, name="arena-reader").start()
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,83 @@
+"""测试公共配置：把 backend 目录加入导入路径，并提供小规模的测试图谱"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+# 构建 FrontendKnowledgeGraph 需要的配置；测试中不监视增量文件、不发起大模型请求
+os.environ.setdefault("DEEPSEEK_API_KEY", "test")
+os.environ["GRAPH_DELTA_FILE"] = ""
+os.environ.setdefault("GRAPH_SHARED_DIR", "")
+
+from graph_store import GraphStore  # noqa: E402
+
+# (源, 关系, 目标, 权重)
+SAMPLE_EDGES = [
+    ("HTML", "关联", "CSS", 5),
+    ("HTML", "关联", "JavaScript", 5),
+    ("CSS", "核心概念", "选择器", 4),
+    ("CSS", "核心概念", "盒模型", 4),
+    ("JavaScript", "框架", "Vue", 5),
+    ("JavaScript", "框架", "React", 5),
+    ("JavaScript", "核心概念", "闭包", 3),
+    ("Vue", "版本", "Vue3", 4),
+    ("Vue3", "状态管理", "Pinia", 3),
+    ("Vue", "路由", "Vue Router", 3),
+    ("React", "状态管理", "Redux", 3),
+    ("TypeScript", "超集", "JavaScript", 4),
+]
+
+
+def build_store(edges) -> GraphStore:
+    """由 (源, 关系, 目标, 权重) 列表构建 GraphStore，节点按首次出现的顺序编号"""
+    nodes, node_index = [], {}
+    relations, relation_index = [], {}
+
+    def intern(name, names, index):
+        if name not in index:
+            index[name] = len(names)
+            names.append(name)
+        return index[name]
+
+    src, dst, codes, weights = [], [], [], []
+    for source, relation, target, weight in edges:
+        src.append(intern(source, nodes, node_index))
+        dst.append(intern(target, nodes, node_index))
+        codes.append(intern(relation, relations, relation_index))
+        weights.append(weight)
+    return GraphStore(nodes, np.array(src), np.array(dst), relations, np.array(codes), np.array(weights))
+
+
+def random_edges(num_nodes: int, num_edges: int, seed: int = 0):
+    """随机图（无自环、无重复边），节点名为 N0、N1 ……"""
+    rng = np.random.default_rng(seed)
+    seen = set()
+    edges = []
+    while len(edges) < num_edges:
+        u, v = (int(x) for x in rng.integers(0, num_nodes, size=2))
+        if u == v or (u, v) in seen:
+            continue
+        seen.add((u, v))
+        edges.append((f"N{u}", f"R{u % 3}", f"N{v}", int(rng.integers(1, 10))))
+    return edges
+
+
+@pytest.fixture
+def sample_store() -> GraphStore:
+    return build_store(SAMPLE_EDGES)
+
+
+@pytest.fixture
+def kg(tmp_path):
+    """基于临时 CSV 的 FrontendKnowledgeGraph（快照文件也写在临时目录）"""
+    from knowledge_graph import FrontendKnowledgeGraph
+
+    path = tmp_path / "graph.csv"
+    lines = ["source,relation,target,weight"] + [f"{s},{r},{t},{w}" for s, r, t, w in SAMPLE_EDGES]
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return FrontendKnowledgeGraph(data_path=str(path), shared_dir="")
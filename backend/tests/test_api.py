@@ -0,0 +1,69 @@
+import importlib
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from conftest import SAMPLE_EDGES
+
+
+@pytest.fixture(scope="module")
+def client(tmp_path_factory):
+    path = tmp_path_factory.mktemp("api") / "graph.csv"
+    lines = ["source,relation,target,weight"] + [f"{s},{r},{t},{w}" for s, r, t, w in SAMPLE_EDGES]
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    os.environ["GRAPH_DATA_FILE"] = str(path)
+    try:
+        main = importlib.import_module("main")
+    finally:
+        os.environ.pop("GRAPH_DATA_FILE", None)
+    return TestClient(main.app)
+
+
+def post_changes(client, changes, token="secret"):
+    headers = {"X-Admin-Token": token} if token is not None else {}
+    return client.post("/api/graph/changes", json={"changes": changes}, headers=headers)
+
+
+def test_etag_revalidation_per_encoding(client):
+    plain = client.get("/api/graph-data?limit=5", headers={"Accept-Encoding": "identity"})
+    assert plain.status_code == 200
+    etag = plain.headers["etag"]
+    assert client.get("/api/graph-data?limit=5", headers={
+        "Accept-Encoding": "identity", "If-None-Match": etag}).status_code == 304
+
+    # 未压缩表示的 ETag 不能让 gzip 请求得到 304
+    zipped = client.get("/api/graph-data?limit=5", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert zipped.status_code == 200
+    assert zipped.headers["content-encoding"] == "gzip"
+    assert zipped.headers["etag"] != etag
+    assert zipped.json() == plain.json()
+
+
+def test_writes_fail_closed_without_admin_token(client, monkeypatch):
+    monkeypatch.delenv("GRAPH_ADMIN_TOKEN", raising=False)
+    change = [{"op": "add", "source": "Vue", "target": "Nuxt", "relation": "框架", "weight": 3}]
+    assert post_changes(client, change).status_code == 403
+
+    monkeypatch.setenv("GRAPH_ADMIN_TOKEN", "secret")
+    assert post_changes(client, change, token=None).status_code == 403
+    assert post_changes(client, change, token="wrong").status_code == 403
+    assert post_changes(client, [{"op": "delete", "source": "a", "target": "b"}]).status_code == 400
+
+
+def test_update_changes_cached_views(client, monkeypatch):
+    monkeypatch.setenv("GRAPH_ADMIN_TOKEN", "secret")
+    before = client.get("/api/graph-data?limit=50")
+    version = client.get("/api/graph/version").json()["data"]["version"]
+
+    response = post_changes(client, [{"op": "add", "source": "JavaScript", "target": "Node.js",
+                                      "relation": "运行时", "weight": 5}])
+    assert response.status_code == 200
+    assert response.json()["data"]["added"] == 1
+    assert client.get("/api/graph/version").json()["data"]["version"] != version
+
+    after = client.get("/api/graph-data?limit=50", headers={"If-None-Match": before.headers["etag"]})
+    assert after.status_code == 200
+    assert "Node.js" in {node["id"] for node in after.json()["data"]["nodes"]}
+    entity = client.get("/api/graph-data/entity/Node.js").json()["data"]
+    assert {(e["from"], e["to"]) for e in entity["edges"]} == {("JavaScript", "Node.js")}
@@ -0,0 +1,35 @@
+from conftest import build_store
+from context_retrieval import HEADER, ContextRetriever, estimate_tokens
+
+
+def hub_store():
+    edges = [("JavaScript", "核心概念", f"概念{i}", 1 + i % 5) for i in range(200)]
+    edges += [("Vue", "基于", "JavaScript", 9), ("Vue", "状态管理", "Pinia", 8), ("Pinia", "替代", "Vuex", 7)]
+    edges += [("React", "基于", "JavaScript", 9), ("React", "状态管理", "Redux", 8)]
+    return build_store(edges)
+
+
+def test_context_stays_within_budget():
+    retriever = ContextRetriever(hub_store())
+    for budget in (30, 60, 120, 400):
+        result = retriever.retrieve("Vue 的状态管理", ["Vue"], budget)
+        # 逐行向上取整累计，不会低估整段文本
+        assert estimate_tokens(result["text"]) <= result["tokens"] <= budget
+    assert retriever.retrieve("Vue", ["Vue"], estimate_tokens(HEADER))["facts"] == []
+    assert retriever.retrieve("未知", ["未知"], 400)["facts"] == []
+
+
+def test_multi_hop_facts_come_with_their_chain():
+    result = ContextRetriever(hub_store(), max_hops=2).retrieve("Pinia 和 Vuex 有什么区别", ["Vue"], 400)
+    facts = [(f["source"], f["target"]) for f in result["facts"]]
+    assert ("Pinia", "Vuex") in facts
+    assert ("Vue", "Pinia") in facts
+    assert facts.index(("Vue", "Pinia")) < facts.index(("Pinia", "Vuex"))
+
+
+def test_every_mentioned_entity_gets_budget_despite_hub():
+    result = ContextRetriever(hub_store()).retrieve("Vue 和 React 对比 JavaScript", ["Vue", "React", "JavaScript"], 150)
+    sources = {f["source"] for f in result["facts"]} | {f["target"] for f in result["facts"]}
+    assert {"Vue", "React"} <= sources
+    assert result["truncated"]
+    assert sum(1 for f in result["facts"] if f["source"] == "JavaScript") < 200
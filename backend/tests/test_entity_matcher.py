@@ -0,0 +1,38 @@
+from entity_matcher import EntityMatcher, SharedEntityMatcher
+
+ENTITIES = ["Vue", "Vue3", "Vue Router", "React", "JavaScript", "Java", "Script", "ß"]
+
+
+def test_find_all_reports_overlapping_matches_with_original_offsets():
+    matcher = EntityMatcher(ENTITIES)
+    text = "学习 javascript 和 vue router"
+    found = sorted(matcher.find_all(text))
+    assert found == sorted([
+        (3, 7, "Java"), (3, 13, "JavaScript"), (7, 13, "Script"),
+        (16, 19, "Vue"), (16, 26, "Vue Router"),
+    ])
+    for start, end, entity in found:
+        assert text[start:end].casefold() == entity.casefold()
+
+
+def test_extract_prefers_longest_match():
+    matcher = EntityMatcher(ENTITIES)
+    result = matcher.extract("Vue3 和 JavaScript、React")
+    assert [m["entity"] for m in result] == ["Vue3", "JavaScript", "React"]
+    assert matcher.extract("") == [] and EntityMatcher().extract("Vue") == []
+
+
+def test_offsets_survive_case_folding_that_changes_length():
+    # "ß" 折叠为 "ss"：匹配位置仍以原文为准
+    matcher = EntityMatcher(["ss", "Vue"])
+    text = "ßVue"
+    assert sorted(matcher.find_all(text)) == [(0, 1, "ss"), (1, 4, "Vue")]
+
+
+def test_shared_matcher_matches_like_the_original():
+    matcher = EntityMatcher(ENTITIES)
+    shared = SharedEntityMatcher(matcher.shared_arrays())
+    assert len(shared) == len(matcher)
+    for text in ("学习 javascript 和 vue router", "Vue3 与 React", "ßss", "无关文本"):
+        assert sorted(shared.find_all(text)) == sorted(matcher.find_all(text))
+        assert shared.extract(text) == matcher.extract(text)
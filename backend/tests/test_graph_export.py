@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from graph_export import EDGES, CursorError, GraphExporter, StaleCursorError
+from graph_updates import EdgeChange
+
+
+def full_export(exporter):
+    return json.loads(b"".join(exporter.json_chunks()))["data"]
+
+
+@pytest.mark.parametrize("limit", [1, 3, 7, 100])
+def test_pages_cover_every_record_exactly_once(kg, limit):
+    exporter = GraphExporter(kg.state, chunk_size=4)
+    expected = full_export(exporter)
+    nodes, edges, cursor = [], [], None
+    while True:
+        page = exporter.page(cursor, limit)
+        assert len(page["nodes"]) + len(page["edges"]) <= limit
+        nodes += page["nodes"]
+        edges += page["edges"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert nodes == expected["nodes"]
+    assert edges == expected["edges"]
+
+
+def test_filtered_ndjson_pages(kg):
+    exporter = GraphExporter(kg.state, relations=["框架", "状态管理"], fields="label,weight", chunk_size=2)
+    expected = full_export(exporter)
+    assert {e["label"] for e in expected["edges"]} == {"框架", "状态管理"}
+    assert {n["id"] for n in expected["nodes"]} == {"JavaScript", "Vue", "React", "Vue3", "Pinia", "Redux"}
+
+    records, cursor = [], None
+    while True:
+        lines = [json.loads(line) for line in b"".join(exporter.ndjson_lines(cursor, limit=3)).splitlines()]
+        assert lines[0]["type"] == "meta" and lines[-1]["type"] == "end"
+        records += lines[1:-1]
+        cursor = lines[-1]["next_cursor"]
+        if cursor is None:
+            break
+    assert [r for r in records if r.pop("type") == "node"] == expected["nodes"]
+    assert [r for r in records if "from" in r] == expected["edges"]
+
+
+def test_cursor_is_bound_to_version_and_query(kg):
+    exporter = GraphExporter(kg.state)
+    cursor = exporter.page(None, 2)["next_cursor"]
+    assert exporter.decode_cursor(cursor) == (0, 2)
+    with pytest.raises(CursorError):
+        GraphExporter(kg.state, min_weight=4).page(cursor, 2)
+    with pytest.raises(CursorError):
+        exporter.page("不是游标", 2)
+    with pytest.raises(CursorError):
+        exporter.decode_cursor(exporter.encode_cursor(EDGES + 1, 0))
+
+    kg.apply_changes([EdgeChange("add", "Vue", "Nuxt", "框架", 3)])
+    with pytest.raises(StaleCursorError):
+        GraphExporter(kg.state).page(cursor, 2)
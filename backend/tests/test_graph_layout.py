@@ -0,0 +1,120 @@
+import numpy as np
+import pytest
+
+from conftest import build_store, random_edges
+from graph_layout import GraphLayout, cluster_hierarchy
+from graph_updates import EdgeChange, apply_edge_changes
+
+
+def computed_layout(store, **options):
+    layout = GraphLayout(store, iterations=5, max_cluster_size=8, top_clusters=3, **options)
+    layout.start()
+    assert layout.wait(60)
+    return layout
+
+
+@pytest.fixture(scope="module")
+def layout():
+    store = build_store(random_edges(400, 600, seed=5))
+    layout = computed_layout(store)
+    # 至少三层才能覆盖孤立新节点挂到上层簇的情况
+    assert layout.num_levels >= 2
+    return layout
+
+
+def check_hierarchy(layout):
+    """每一层的簇连续编号、没有空簇，且各层簇大小之和都等于节点数"""
+    n = layout.store.num_nodes
+    for level in range(layout.num_levels + 1):
+        view = layout.cluster_view(level=level, max_edges=0)
+        if level == 0:
+            assert len(view["nodes"]) == n
+            continue
+        sizes = [node["size"] for node in view["nodes"]]
+        assert min(sizes) > 0
+        assert sum(sizes) == n
+        ids = sorted(int(node["id"].split(":")[1]) for node in view["nodes"])
+        assert ids == list(range(len(ids)))
+        # 展开每个簇：下一层的成员数之和等于该簇的大小
+        for node in view["nodes"]:
+            children = layout.cluster_view(parent=node["id"], max_edges=0)["nodes"]
+            assert len(children) == node["children"]
+            child_sizes = [child.get("size", 1) for child in children]
+            assert sum(child_sizes) == node["size"]
+
+
+def test_hierarchy_is_consistent(layout):
+    check_hierarchy(layout)
+    top = layout.cluster_view()
+    assert top["level"] == layout.num_levels
+    assert len(top["nodes"]) <= layout.top_clusters or layout.num_levels == 0
+
+
+def test_cluster_hierarchy_packs_isolated_nodes():
+    edges = random_edges(40, 60, seed=6) + [(f"I{i}", "R", f"J{i}", 1) for i in range(60)]
+    store = build_store(edges)
+    parents = cluster_hierarchy(store, max_cluster_size=10, top_clusters=5)
+    assert len(parents[-1]) > 0 and int(parents[-1].max()) + 1 <= 5
+
+
+def test_update_keeps_existing_coordinates_and_clusters(layout):
+    store = layout.store
+    update = apply_edge_changes(store, [
+        EdgeChange("add", "N1", "NEW1", "R0", 9),
+        EdgeChange("add", "NEW1", "NEW2", "R0", 1),
+        EdgeChange("add", "LONE1", "LONE2", "R0", 1),
+        EdgeChange("remove", "N2", "N3"),
+    ])
+    updated = layout.updated(update.store, update.touched)
+    assert updated.is_ready()
+    n_old = store.num_nodes
+    assert np.array_equal(updated.positions[:n_old], layout.positions)
+    old_membership = layout._memberships()
+    new_membership = updated._memberships()
+    for level in range(1, layout.num_levels + 1):
+        assert np.array_equal(new_membership[level][:n_old], old_membership[level])
+
+    names = update.store.node_index
+    # 有已放置邻居的新节点加入权重最大的邻居所在的簇
+    assert new_membership[1][names["NEW1"]] == new_membership[1][names["N1"]]
+    assert new_membership[1][names["NEW2"]] == new_membership[1][names["NEW1"]]
+    # 孤立的新节点在第 1 层单独成簇，邻居随之加入；更高层的簇数不变
+    assert new_membership[1][names["LONE2"]] == new_membership[1][names["LONE1"]]
+    assert new_membership[1][names["LONE1"]] not in set(old_membership[1].tolist())
+    for level in range(2, layout.num_levels + 1):
+        assert new_membership[level].max() == old_membership[level].max()
+    check_hierarchy(updated)
+
+
+def test_repeated_isolated_additions_stay_consistent(layout):
+    current = layout
+    for i in range(3):
+        update = apply_edge_changes(current.store, [EdgeChange("add", f"ISO{i}", f"ISO{i}b", "R0", 1)])
+        current = current.updated(update.store, update.touched)
+    check_hierarchy(current)
+
+
+def test_update_before_layout_is_ready_recomputes():
+    store = build_store(random_edges(60, 100, seed=7))
+    layout = GraphLayout(store, iterations=3, max_cluster_size=8, top_clusters=3)
+    update = apply_edge_changes(store, [EdgeChange("add", "N0", "X", "R0", 1)])
+    updated = layout.updated(update.store, update.touched)
+    # 旧版本从未开始计算：新版本在后台从头计算
+    assert updated.wait(60)
+    assert len(updated.positions) == update.store.num_nodes
+    assert not layout.is_ready()
+
+
+def test_shared_arrays_round_trip(layout):
+    arrays = layout.shared_arrays()
+    attached = GraphLayout(layout.store)
+    attached.attach(arrays["layout_positions"], arrays["layout_parents"], arrays["layout_parent_offsets"])
+    assert attached.num_levels == layout.num_levels
+    assert attached.cluster_view(max_edges=50) == layout.cluster_view(max_edges=50)
+
+
+def test_cluster_view_rejects_unknown_parent(layout):
+    with pytest.raises(KeyError):
+        layout.cluster_view(parent=f"c{layout.num_levels + 1}:0")
+    with pytest.raises(KeyError):
+        layout.cluster_view(parent="c1:999999")
@@ -0,0 +1,107 @@
+import threading
+
+import numpy as np
+
+from conftest import build_store, random_edges
+from graph_rankings import GraphRankings, pagerank
+from graph_updates import EdgeChange, apply_edge_changes
+
+
+def build_view(method, ids, scores):
+    return {"method": method, "ids": ids.tolist()}
+
+
+def test_degree_order_after_update_matches_full_sort():
+    store = build_store(random_edges(200, 800, seed=1))
+    rankings = GraphRankings(store)
+    changes = [EdgeChange("add", "N1", f"NEW{i}", "R0", 1) for i in range(30)]
+    changes += [EdgeChange("remove", f"N{u}", f"N{v}") for u, v in ((3, 4), (5, 6), (7, 8))]
+    changes += [EdgeChange("add", f"N{i}", "N199", "R1", 2) for i in range(40, 90)]
+    update = apply_edge_changes(store, changes)
+
+    updated = rankings.updated(update.store, update.touched)
+    expected = np.argsort(-update.store.degree, kind="stable")
+    _, ids, scores = updated.top("degree", update.store.num_nodes)
+    assert np.array_equal(ids, expected)
+    assert np.array_equal(scores, update.store.degree[expected])
+
+
+def test_top_view_is_rebuilt_when_ranking_changes():
+    store = build_store(random_edges(50, 150, seed=2))
+    rankings = GraphRankings(store)
+    calls = []
+
+    def build(method, ids, scores):
+        calls.append(method)
+        return build_view(method, ids, scores)
+
+    # 介数中心性未算完时退回度排序
+    first = rankings.top_view("betweenness", 5, build)
+    assert first["method"] == "degree"
+    assert rankings.top_view("betweenness", 5, build) is first
+    generation = rankings.generation
+
+    scores = np.zeros(store.num_nodes)
+    scores[42] = 1.0
+    rankings.attach_betweenness(scores, np.argsort(-scores, kind="stable"))
+    assert rankings.generation > generation
+    view = rankings.top_view("betweenness", 5, build)
+    assert view["method"] == "betweenness" and view["ids"][0] == 42
+    assert calls == ["degree", "betweenness"]
+
+
+def test_view_built_during_a_ranking_change_is_not_cached():
+    store = build_store(random_edges(50, 150, seed=3))
+    rankings = GraphRankings(store)
+    scores = np.zeros(store.num_nodes)
+    scores[7] = 1.0
+
+    def build_and_change(method, ids, scores_):
+        # 构建期间后台算完了新的排名
+        rankings.attach_betweenness(scores, np.argsort(-scores, kind="stable"))
+        return build_view(method, ids, scores_)
+
+    stale = rankings.top_view("betweenness", 3, build_and_change)
+    assert stale["method"] == "degree"
+    fresh = rankings.top_view("betweenness", 3, build_view)
+    assert fresh["method"] == "betweenness" and fresh["ids"][0] == 7
+
+
+def test_betweenness_recomputed_after_update():
+    # 先让 HUB 之外的节点占据介数中心性的第一名，再通过更新让 HUB 成为唯一的中转节点
+    edges = [(f"S{i}", "R", "MID", 1) for i in range(20)] + [("MID", "R", f"T{i}", 1) for i in range(20)]
+    store = build_store(edges)
+    rankings = GraphRankings(store)
+    rankings.start_betweenness()
+    rankings._betweenness_thread.join(30)
+    assert store.nodes[rankings.top("betweenness", 1)[1][0]] == "MID"
+
+    changes = [EdgeChange("add", f"A{i}", "HUB", "R", 1) for i in range(300)]
+    changes += [EdgeChange("add", "HUB", f"B{i}", "R", 1) for i in range(100)]
+    update = apply_edge_changes(store, changes)
+    updated = rankings.updated(update.store, update.touched)
+    # 新版本先沿用旧值（新节点为 0），后台算完后排名与缓存的视图随之更新
+    assert updated.is_ready("betweenness")
+    updated._betweenness_thread.join(60)
+    view = updated.top_view("betweenness", 1, build_view)
+    assert update.store.nodes[view["ids"][0]] == "HUB"
+
+
+def test_superseded_rankings_skip_pending_betweenness():
+    store = build_store(random_edges(30, 60, seed=4))
+    gate = threading.Thread(target=lambda: None)
+    gate.start()
+    rankings = GraphRankings(store)
+    update = apply_edge_changes(store, [EdgeChange("add", "N0", "N1", "R0", 1)])
+    rankings.updated(update.store, update.touched)
+    # 被取代后才开始的计算直接放弃
+    rankings.start_betweenness(after=gate)
+    rankings._betweenness_thread.join(10)
+    assert not rankings.is_ready("betweenness")
+
+
+def test_pagerank_sums_to_one_and_favours_sinks():
+    store = build_store([("a", "r", "c", 1), ("b", "r", "c", 1), ("c", "r", "d", 1)])
+    scores = pagerank(store)
+    assert abs(scores.sum() - 1.0) < 1e-6
+    assert store.nodes[int(np.argmax(scores))] == "d"
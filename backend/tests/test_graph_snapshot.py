@@ -0,0 +1,115 @@
+import gzip
+import json
+import threading
+import time
+
+import pytest
+
+from graph_snapshot import EncodedArrays, GraphSnapshot, SnapshotStore, dumps
+from graph_updates import EdgeChange
+
+
+def test_concurrent_requests_build_a_snapshot_once():
+    store = SnapshotStore(version="v1")
+    calls = []
+    start = threading.Event()
+
+    def build():
+        calls.append(1)
+        time.sleep(0.05)
+        return {"code": 200, "data": [1, 2, 3]}
+
+    results = []
+
+    def worker():
+        start.wait()
+        results.append(store.get("full", build))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    start.set()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results)
+    assert json.loads(results[0].body) == {"code": 200, "data": [1, 2, 3]}
+
+
+def test_slow_build_does_not_block_other_snapshots():
+    store = SnapshotStore()
+    release = threading.Event()
+    slow = threading.Thread(target=lambda: store.get("slow", lambda: release.wait(5) and b"{}"))
+    slow.start()
+    time.sleep(0.05)
+    began = time.perf_counter()
+    store.get("fast", lambda: {"ok": True})
+    assert time.perf_counter() - began < 1
+    release.set()
+    slow.join()
+    assert store.get("slow", lambda: pytest.fail("应命中缓存")).body == b"{}"
+
+
+def test_failed_build_is_retried():
+    store = SnapshotStore()
+
+    def broken():
+        raise RuntimeError("构建失败")
+
+    with pytest.raises(RuntimeError):
+        store.get("x", broken)
+    assert store.get("x", lambda: [1]).body == b"[1]"
+
+
+def test_least_recently_used_snapshots_are_evicted():
+    store = SnapshotStore(max_entries=2)
+    a = store.get("a", lambda: 1)
+    store.get("b", lambda: 2)
+    store.get("a", lambda: pytest.fail("应命中缓存"))
+    store.get("c", lambda: 3)
+    assert store.get("a", lambda: pytest.fail("应命中缓存")) is a
+    assert store.get("b", lambda: 22).body == b"22"
+
+
+def test_each_encoding_has_its_own_etag():
+    snapshot = GraphSnapshot.from_payload("v1", {"a": 1})
+    identity, gz = snapshot.etag_for("identity"), snapshot.etag_for("gzip")
+    assert identity == snapshot.etag and gz != identity and gz.endswith('-gz"')
+    assert gzip.decompress(snapshot.encoded("gzip")) == snapshot.body
+    assert snapshot.encoded("gzip") is snapshot.encoded("gzip")
+
+    assert snapshot.matches(identity)
+    assert snapshot.matches(f"W/{identity}")
+    assert not snapshot.matches(identity, "gzip")
+    assert snapshot.matches(f'"other", {gz}', "gzip")
+    assert snapshot.matches("*", "gzip")
+    assert not snapshot.matches(None)
+
+
+def test_negotiate_respects_q_values():
+    snapshot = GraphSnapshot.from_payload("v1", {})
+    assert snapshot.negotiate("gzip, deflate") == "gzip"
+    assert snapshot.negotiate("gzip;q=0") == "identity"
+    assert snapshot.negotiate(None) == "identity"
+    assert snapshot.negotiate("*") in GraphSnapshot.available_encodings()
+    with pytest.raises(ValueError):
+        snapshot.encoded("deflate")
+
+
+def test_encoded_arrays_match_direct_encoding():
+    payload = {"nodes": [{"id": "Vue"}, {"id": "React"}], "edges": [{"from": "Vue", "to": "React"}]}
+    encoded = EncodedArrays.encode(payload)
+    assert encoded.dumps() == dumps(payload)
+    replaced = encoded.replace(edges=[])
+    assert json.loads(replaced.dumps()) == {"nodes": payload["nodes"], "edges": []}
+    assert replaced.arrays["nodes"] is encoded.arrays["nodes"]
+
+
+def test_graph_update_invalidates_cached_responses(kg):
+    old = kg.state
+    old.snapshots.get("top:degree:5", lambda: {"version": old.version})
+    kg.apply_changes([EdgeChange("add", "Vue3", "Vite", "构建工具", 4)])
+    new = kg.state
+    rebuilt = new.snapshots.get("top:degree:5", lambda: {"version": new.version})
+    assert json.loads(rebuilt.body) == {"version": new.version}
+    assert rebuilt.etag != old.snapshots.get("top:degree:5", lambda: None).etag
@@ -0,0 +1,196 @@
+import os
+
+import numpy as np
+import pytest
+
+from conftest import SAMPLE_EDGES, build_store
+from graph_updates import DeltaFileWatcher, EdgeChange, apply_edge_changes, parse_change
+
+
+def edge_set(store):
+    """{(源, 目标): (关系, 权重)}"""
+    result = {}
+    for u in range(store.num_nodes):
+        for v, r, w in zip(*store.out_edges(u)):
+            result[(store.nodes[u], store.nodes[v])] = (store.relations[r], int(w))
+    return result
+
+
+def test_apply_changes_leaves_old_store_untouched(sample_store):
+    before = edge_set(sample_store)
+    arrays = [a.copy() for a in (sample_store.out_indptr, sample_store.out_indices, sample_store.out_weights)]
+
+    update = apply_edge_changes(sample_store, [
+        EdgeChange("add", "Vue3", "Vite", "构建工具", 4),
+        EdgeChange("remove", "HTML", "CSS"),
+        EdgeChange("reweight", "JavaScript", "Vue", weight=9),
+    ])
+
+    assert edge_set(sample_store) == before
+    for old, now in zip(arrays, (sample_store.out_indptr, sample_store.out_indices, sample_store.out_weights)):
+        assert np.array_equal(old, now)
+
+    after = edge_set(update.store)
+    assert after[("Vue3", "Vite")] == ("构建工具", 4)
+    assert ("HTML", "CSS") not in after
+    assert after[("JavaScript", "Vue")] == ("框架", 9)
+    assert update.summary == {"added": 1, "updated": 1, "removed": 1, "ignored": 0, "nodes_added": 1}
+    assert update.old_num_nodes == sample_store.num_nodes
+    touched = {update.store.nodes[i] for i in update.touched}
+    assert touched == {"Vue3", "Vite", "HTML", "CSS", "JavaScript", "Vue"}
+
+
+def test_origin_maps_unchanged_edges_to_old_positions(sample_store):
+    update = apply_edge_changes(sample_store, [
+        EdgeChange("add", "闭包", "作用域", "核心概念", 3),
+        EdgeChange("reweight", "Vue", "Vue3", weight=1),
+    ])
+    store = update.store
+    src = np.repeat(np.arange(store.num_nodes), store.out_degree)
+    old_src = np.repeat(np.arange(sample_store.num_nodes), sample_store.out_degree)
+    for i, pos in enumerate(update.origin.tolist()):
+        u, v = store.nodes[src[i]], store.nodes[store.out_indices[i]]
+        if pos < 0:
+            assert (u, v) in {("闭包", "作用域"), ("Vue", "Vue3")}
+        else:
+            assert (sample_store.nodes[old_src[pos]], sample_store.nodes[sample_store.out_indices[pos]]) == (u, v)
+            assert store.out_weights[i] == sample_store.out_weights[pos]
+
+
+def test_changes_apply_in_order_within_a_batch(sample_store):
+    update = apply_edge_changes(sample_store, [
+        EdgeChange("add", "A", "B", "关联", 2),
+        EdgeChange("remove", "A", "B"),
+        EdgeChange("remove", "HTML", "JavaScript"),
+        EdgeChange("add", "HTML", "JavaScript", weight=7),
+        EdgeChange("reweight", "CSS", "不存在", weight=3),
+    ])
+    after = edge_set(update.store)
+    assert ("A", "B") not in after
+    # 先删后加：新边没有给出关系，取默认的空关系
+    assert after[("HTML", "JavaScript")] == ("", 7)
+    assert update.summary["ignored"] == 1
+
+
+def test_noop_changes_report_unchanged(sample_store):
+    update = apply_edge_changes(sample_store, [
+        EdgeChange("reweight", "HTML", "CSS", weight=5),
+        EdgeChange("remove", "CSS", "HTML"),
+    ])
+    assert not update.changed
+    assert update.summary["ignored"] == 1
+
+
+def test_parse_change_validation():
+    assert parse_change({"source": " Vue ", "target": "Pinia", "weight": "3"}) == EdgeChange("add", "Vue", "Pinia", None, 3)
+    with pytest.raises(ValueError):
+        parse_change({"op": "delete", "source": "a", "target": "b"})
+    with pytest.raises(ValueError):
+        parse_change({"op": "reweight", "source": "a", "target": "b"})
+    with pytest.raises(ValueError):
+        parse_change({"source": "a", "target": ""})
+    with pytest.raises(ValueError):
+        parse_change({"source": "a", "target": "b", "weight": "高"})
+
+
+class Recorder:
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, changes):
+        self.batches.append([(c.op, c.source, c.target) for c in changes])
+        return {"applied": len(changes)}
+
+
+HEADER = "op,source,target,relation,weight\n"
+
+
+def replace_file(path, text):
+    """写临时文件后原子替换（与日志轮转一样，inode 改变）"""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def test_delta_watcher_applies_only_complete_new_lines(tmp_path):
+    path = str(tmp_path / "delta.csv")
+    recorder = Recorder()
+    watcher = DeltaFileWatcher(path, recorder)
+    assert watcher.poll() is None
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(HEADER + "add,A,B,关联,1\nadd,B,C")
+    watcher.poll()
+    assert recorder.batches == [[("add", "A", "B")]]
+
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(",关联,2\n")
+    watcher.poll()
+    assert watcher.poll() is None
+    assert recorder.batches == [[("add", "A", "B")], [("add", "B", "C")]]
+
+
+def test_delta_watcher_skips_applied_prefix_after_replacement(tmp_path):
+    path = str(tmp_path / "delta.csv")
+    recorder = Recorder()
+    watcher = DeltaFileWatcher(path, recorder)
+    replace_file(path, HEADER + "add,A,B,关联,1\nremove,A,B,,\n")
+    watcher.poll()
+
+    # 替换为以已应用内容开头的新文件：只应用新增的记录
+    replace_file(path, HEADER + "add,A,B,关联,1\nremove,A,B,,\nadd,A,B,关联,5\n")
+    watcher.poll()
+    assert recorder.batches[1:] == [[("add", "A", "B")]]
+    assert watcher.poll() is None
+
+
+def test_delta_watcher_restarts_on_new_content(tmp_path):
+    path = str(tmp_path / "delta.csv")
+    recorder = Recorder()
+    watcher = DeltaFileWatcher(path, recorder)
+    replace_file(path, HEADER + "add,A,B,关联,1\nadd,B,C,关联,1\n")
+    watcher.poll()
+
+    # 内容不同的新日志：从头应用（包括重新读取表头）
+    replace_file(path, "source,target,op\nX,Y,add\n")
+    watcher.poll()
+    assert recorder.batches[1] == [("add", "X", "Y")]
+
+    # 截断后重新写入
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(HEADER)
+    watcher.poll()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("remove,X,Y,,\n")
+    watcher.poll()
+    assert recorder.batches[2] == [("remove", "X", "Y")]
+
+
+def test_kg_apply_changes_swaps_state(kg):
+    old = kg.state
+    old_edges = edge_set(old.store)
+    summary = kg.apply_changes([EdgeChange("add", "Pinia", "Vuex", "替代", 2)])
+    assert summary["added"] == 1 and summary["nodes_added"] == 1
+    new = kg.state
+    assert new is not old
+    assert new.version != old.version
+    assert edge_set(old.store) == old_edges
+    assert "Vuex" in new.store and "Vuex" not in old.store
+    # 新节点立即可以被匹配与搜索
+    assert [m["entity"] for m in new.entity_matcher.extract("Vuex 与 Pinia")] == ["Vuex", "Pinia"]
+
+    unchanged = kg.apply_changes([EdgeChange("remove", "不存在", "Vuex")])
+    assert unchanged["version"] == new.version
+    assert kg.state is new
+
+
+def test_kg_apply_changes_keeps_networkx_graph_in_sync(kg):
+    G = kg.G
+    kg.apply_changes([EdgeChange("add", "Vue3", "Vite", "构建工具", 4), EdgeChange("remove", "HTML", "CSS")])
+    assert G.has_edge("Vue3", "Vite") and G["Vue3"]["Vite"]["weight"] == 4
+    assert not G.has_edge("HTML", "CSS")
+    assert G.number_of_edges() == len(SAMPLE_EDGES)
+    assert edge_set(kg.store) == edge_set(build_store(
+        [(s, d["relation"], t, d["weight"]) for s, t, d in G.edges(data=True)]
+    ))
@@ -0,0 +1,41 @@
+from conftest import build_store
+from learning_path import LearningPathPlanner
+
+
+def names(items):
+    return [item["name"] for item in items]
+
+
+def test_prerequisites_and_next_steps_follow_relation_direction():
+    store = build_store([
+        ("Vue", "基于", "JavaScript", 5),
+        ("JavaScript", "基于", "HTML", 5),
+        ("Vue", "状态管理", "Pinia", 4),
+        ("Pinia", "插件", "pinia-plugin-persist", 2),
+        ("Vue", "关联", "React", 5),
+    ])
+    plan = LearningPathPlanner(store).plan("Vue")
+    # 越基础越靠前；关联关系不参与规划
+    assert names(plan["prerequisites"]) == ["HTML", "JavaScript"]
+    assert names(plan["next_steps"]) == ["Pinia", "pinia-plugin-persist"]
+    assert "经由「Pinia」" in plan["next_steps"][1]["desc"]
+    assert plan["core"]["desc"] == "重点掌握：Pinia"
+    assert LearningPathPlanner(store).plan("不存在")["next_steps"] == []
+
+
+def test_search_finds_nodes_behind_a_cheaper_but_longer_path():
+    # 经由高权重长链到达 X 的距离更短，但用完了跳数；经由低权重短链仍能在跳数上限内到达 Y
+    store = build_store([
+        ("A", "包含", "B", 10), ("B", "包含", "C", 10), ("C", "包含", "X", 10),
+        ("A", "包含", "X", 1), ("X", "包含", "Y", 10),
+    ])
+    plan = LearningPathPlanner(store, max_depth=3, max_items=10).plan("A")
+    assert set(names(plan["next_steps"])) == {"B", "C", "X", "Y"}
+    assert LearningPathPlanner(store, max_depth=1).plan("A")["next_steps"][-1]["name"] == "X"
+
+
+def test_custom_relation_sets():
+    store = build_store([("Vue", "需要", "JavaScript", 5)])
+    planner = LearningPathPlanner(store, prerequisite_relations={"需要"}, associative_relations=())
+    assert names(planner.plan("Vue")["prerequisites"]) == ["JavaScript"]
+    assert names(LearningPathPlanner(store).plan("Vue")["next_steps"]) == ["JavaScript"]
@@ -0,0 +1,205 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from llm_guard import CircuitBreaker, CircuitOpenError, LLMGuard, QueueTimeoutError
+
+
+def test_breaker_opens_on_error_rate_and_recovers_after_probe():
+    breaker = CircuitBreaker(threshold=0.5, min_calls=4, window=10, reset_timeout=0.05)
+    for _ in range(2):
+        breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    # 探测请求还没有结果时不再放行
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.stats()["window_calls"] == 1
+
+
+def test_failed_probe_reopens_breaker():
+    breaker = CircuitBreaker(min_calls=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_stuck_probe_is_retried_after_reset_timeout():
+    breaker = CircuitBreaker(min_calls=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+
+
+def test_open_breaker_rejects_calls():
+    guard = LLMGuard(breaker=CircuitBreaker(min_calls=1, reset_timeout=60))
+    with pytest.raises(ValueError):
+        guard.call("k", lambda: (_ for _ in ()).throw(ValueError("失败")))
+    with pytest.raises(CircuitOpenError):
+        guard.call("k", lambda: "不会调用")
+    assert guard.stats()["rejected_open"] == 1
+
+
+def test_concurrent_identical_calls_are_coalesced():
+    guard = LLMGuard()
+    calls = []
+    start = threading.Event()
+
+    def fn():
+        calls.append(1)
+        time.sleep(0.1)
+        return "答案"
+
+    results = []
+
+    def worker():
+        start.wait()
+        results.append(guard.call("同一个问题", fn))
+
+    threads = [threading.Thread(target=worker) for _ in range(5)]
+    for t in threads:
+        t.start()
+    start.set()
+    for t in threads:
+        t.join()
+    assert results == ["答案"] * 5
+    assert len(calls) == 1
+    assert guard.stats()["coalesced"] == 4
+
+
+def test_sync_and_async_callers_share_slots_in_fifo_order():
+    # 只有一个名额时进入顺序即获得名额的顺序
+    guard = LLMGuard(max_concurrency=1, queue_timeout=5)
+    order, active, peak = [], [0], [0]
+    lock = threading.Lock()
+
+    def enter(name):
+        with lock:
+            order.append(name)
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+
+    def leave():
+        with lock:
+            active[0] -= 1
+
+    def sync_call(name):
+        with guard.slot():
+            enter(name)
+            time.sleep(0.05)
+            leave()
+
+    async def async_call(name):
+        async with guard.aslot():
+            enter(name)
+            await asyncio.sleep(0.05)
+            leave()
+
+    async def main():
+        holder = threading.Thread(target=sync_call, args=("hold",))
+        holder.start()
+        await asyncio.sleep(0.01)
+        waiters, tasks = [], []
+        # 同步与异步调用交替排队
+        for i in range(3):
+            t = threading.Thread(target=sync_call, args=(f"s{i}",))
+            t.start()
+            waiters.append(t)
+            await asyncio.sleep(0.005)
+            tasks.append(asyncio.ensure_future(async_call(f"a{i}")))
+            await asyncio.sleep(0.005)
+        await asyncio.gather(*tasks)
+        await asyncio.to_thread(lambda: [t.join() for t in [holder] + waiters])
+
+    asyncio.run(main())
+    assert order == ["hold", "s0", "a0", "s1", "a1", "s2", "a2"]
+    assert peak[0] == 1
+    assert guard.stats()["in_flight"] == 0
+
+
+def test_queue_timeout_and_cancelled_waiters_do_not_leak_slots():
+    guard = LLMGuard(max_concurrency=1, queue_timeout=0.05)
+
+    async def main():
+        async with guard.aslot():
+            with pytest.raises(QueueTimeoutError):
+                async with guard.aslot():
+                    pass
+            waiter = asyncio.ensure_future(guard.aslot().__aenter__())
+            await asyncio.sleep(0.01)
+            waiter.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiter
+        # 名额仍然可用
+        async with guard.aslot():
+            pass
+
+    asyncio.run(main())
+    with guard.slot():
+        pass
+    stats = guard.stats()
+    assert stats["queue_timeouts"] == 1
+    assert stats["in_flight"] == 0
+
+
+def test_astream_shares_result_with_concurrent_callers():
+    guard = LLMGuard()
+    calls = []
+
+    async def stream():
+        calls.append(1)
+        for part in ("图谱", "问答"):
+            await asyncio.sleep(0.02)
+            yield part
+
+    async def consume():
+        return [part async for part in guard.astream("k", stream)]
+
+    async def main():
+        first = asyncio.ensure_future(consume())
+        await asyncio.sleep(0.005)
+        second = asyncio.ensure_future(consume())
+        return await first, await second
+
+    first, second = asyncio.run(main())
+    assert first == ["图谱", "问答"]
+    assert second == ["图谱问答"]
+    assert len(calls) == 1
+
+
+def test_concurrency_never_exceeds_limit():
+    guard = LLMGuard(max_concurrency=2, queue_timeout=5)
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def fn():
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+
+    threads = [threading.Thread(target=guard.call, args=(f"k{i}", fn)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert peak[0] == 2
+    assert guard.stats()["calls"] == 8
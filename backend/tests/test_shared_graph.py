@@ -0,0 +1,83 @@
+import os
+
+import numpy as np
+import pytest
+
+from conftest import SAMPLE_EDGES, build_store
+from shared_graph import Arena, ArenaControl, SharedGraphPublisher, SharedGraphReader, write_arena
+
+
+def test_arena_round_trips_store_and_extras(tmp_path, sample_store):
+    path = str(tmp_path / "g.arena")
+    extras = {"degree_order": np.argsort(-sample_store.degree, kind="stable")}
+    write_arena(path, "v1", sample_store, extras)
+    arena = Arena(path)
+    store = arena.store()
+    assert arena.version == "v1"
+    assert list(store.nodes) == sample_store.nodes
+    assert store.relations == sample_store.relations
+    for name in ("out_indptr", "out_indices", "out_weights", "in_indptr", "in_indices", "degree"):
+        assert np.array_equal(getattr(store, name), getattr(sample_store, name))
+    assert np.array_equal(arena.get("degree_order"), extras["degree_order"])
+    for name in sample_store.nodes:
+        assert store.id_of(name) == sample_store.id_of(name)
+    assert store.id_of("不存在") is None
+    # 数组直接建立在只读映射上
+    assert not store.out_indices.flags.writeable
+
+
+def test_control_block_generations(tmp_path):
+    control = ArenaControl(str(tmp_path), create=True)
+    assert control.read() == (0, "")
+    assert control.publish("a.arena") == 1
+    assert control.publish("b.arena") == 2
+    assert ArenaControl(str(tmp_path)).read() == (2, "b.arena")
+
+
+def test_publisher_republishes_only_on_change_and_reader_follows(tmp_path):
+    stores = {"current": build_store(SAMPLE_EDGES)}
+
+    def snapshot():
+        store = stores["current"]
+        return (store,), lambda: (f"v{store.num_edges}", store, {})
+
+    publisher = SharedGraphPublisher(str(tmp_path), snapshot, grace=0)
+    assert publisher.publish_if_changed()
+    assert not publisher.publish_if_changed()
+    reader = SharedGraphReader(str(tmp_path), wait=1)
+    first = reader.open_current()
+    assert first.store().num_edges == len(SAMPLE_EDGES)
+
+    stores["current"] = build_store(SAMPLE_EDGES + [("Vue", "框架", "Nuxt", 3)])
+    assert publisher.publish_if_changed()
+    assert reader.control.generation() != reader.generation
+    second = reader.open_current()
+    assert second.store().num_edges == len(SAMPLE_EDGES) + 1
+    # 已映射的旧 arena 仍然可用
+    assert first.store().num_edges == len(SAMPLE_EDGES)
+
+
+def test_old_arenas_are_kept_for_the_grace_period(tmp_path):
+    stores = [build_store(SAMPLE_EDGES[:i]) for i in (3, 4, 5, 6)]
+    index = [0]
+    publisher = SharedGraphPublisher(str(tmp_path), lambda: ((stores[index[0]],),
+                                     lambda: (f"v{index[0]}", stores[index[0]], {})), grace=60)
+    for i in range(4):
+        index[0] = i
+        publisher.publish_if_changed()
+    # 宽限期内不删除任何 arena
+    assert len([n for n in os.listdir(tmp_path) if n.endswith(".arena")]) == 4
+    publisher.grace = 0
+    publisher._cleanup()
+    assert sorted(n for n in os.listdir(tmp_path) if n.endswith(".arena")) == ["graph-v2-3.arena", "graph-v3-4.arena"]
+
+
+def test_reader_retries_until_published_file_appears(tmp_path):
+    control = ArenaControl(str(tmp_path), create=True)
+    control.publish("missing.arena")
+    reader = SharedGraphReader(str(tmp_path), wait=1)
+    with pytest.raises(FileNotFoundError):
+        reader.open_current(wait=0.1)
+    write_arena(str(tmp_path / "missing.arena"), "v1", build_store(SAMPLE_EDGES), {})
+    assert reader.open_current(wait=0.1).version == "v1"
+    assert reader.generation == 1
@@ -46,6 +46,10 @@ export const api = {
   getFullGraphData() {
     return service.get('/graph-data/full');
   },
+  // 获取聚类视图（顶层簇；parent 为簇编号时返回展开后的下一层）
+  getGraphClusters(params = {}) {
+    return service.get('/graph-data/clusters', { params });
+  },
   // 根据实体获取相关图谱数据
   getGraphDataByEntity(entity) {
     return service.get(`/graph-data/entity/${encodeURIComponent(entity)}`);
@@ -58,11 +62,49 @@ export const api = {
   qa(data, config = {}) {
     return service.post('/qa', data, config);
   },
+  // 流式问答接口（SSE），onEvent(event, data) 依次收到 meta / token / done / error 事件
+  async qaStream(data, onEvent, signal) {
+    const response = await fetch(`${service.defaults.baseURL}/qa/stream`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(data),
+      signal
+    });
+    if (!response.ok) {
+      throw new Error(`请求失败：${response.status}`);
+    }
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder('utf-8');
+    let buffer = '';
+    for (;;) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      let index;
+      while ((index = buffer.indexOf('\n\n')) !== -1) {
+        const block = buffer.slice(0, index);
+        buffer = buffer.slice(index + 2);
+        let event = 'message';
+        let payload = '';
+        block.split('\n').forEach(line => {
+          if (line.startsWith('event:')) event = line.slice(6).trim();
+          else if (line.startsWith('data:')) payload += line.slice(5).trim();
+        });
+        if (payload) onEvent(event, JSON.parse(payload));
+      }
+    }
+  },
   getLearningPath: (entity) => service.get(`/learning-path/${encodeURIComponent(entity)}`),
   //关联推荐
   getRecommendations: (entity) => service.get(`/recommendations/${encodeURIComponent(entity)}`),
+  // 批量推荐（例如根据搜索历史）
+  getBatchRecommendations: (entities, limit = 10) => service.post('/recommendations/batch', { entities, limit }),
   // 获取所有实体
   getEntities() {
     return service.get('/entities');
+  },
+  // 实体名称自动补全（只返回名称）
+  autocompleteEntities(q, limit = 10) {
+    return service.get('/entities/autocomplete', { params: { q, limit } });
   }
 };
\ No newline at end of file